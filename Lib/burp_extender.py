@@ -30,11 +30,16 @@ sys.path.append(os.path.dirname(os.path.abspath(
     inspect.getfile(inspect.currentframe()))))
 
 from gds.burp import HttpRequest
+from gds.burp.models import CompactHttpRequest
+from gds.burp.archive import Archive
 from gds.burp.config import Configuration, ConfigSection
 from gds.burp.core import Component, ComponentManager
 from gds.burp.decorators import callback
 from gds.burp.dispatchers import NewScanIssueDispatcher, PluginDispatcher
+from gds.burp.export import HAR, export
+from gds.burp.history import HistoryIndex, ProxyHistory
 from gds.burp.monitor import PluginMonitorThread
+from gds.burp.stats import DispatchStats
 
 import gds.burp.settings as settings
 
@@ -338,7 +343,64 @@ class BurpExtender(IBurpExtender, ComponentManager):
             for request in self._check_and_callback(self.getProxyHistory):
                 yield HttpRequest(request, _burp=self)
 
-    history = property(lambda burp: list(burp.getProxyHistory()))
+    history = property(lambda burp: ProxyHistory(burp))
+
+    stats = property(lambda burp: DispatchStats(burp))
+
+    archive = property(lambda burp: Archive(burp))
+
+    compact_history = property(lambda burp: [
+        CompactHttpRequest(item, _burp=burp)
+        for item in burp._check_and_callback(burp.getProxyHistory)])
+
+    def exportProxyHistory(self, filename, format=HAR, start=0,
+                           progress=None, compress=None):
+        '''
+        This method writes the proxy history to `filename`, one item at a
+        time, as HAR or JSON Lines. Returns the number of items exported
+        so far, from which an interrupted export can be resumed.
+
+        :param format: Either `har` or `jsonl`.
+        :param start: Index of the first item to export. Items that
+        cannot be parsed are logged and skipped. A HAR export resumed
+        to an existing `filename` is written next to it, see
+        :func:`gds.burp.export.part_filename`.
+        :param progress: Called with the number of items exported so far
+        and the size of the proxy history, every thousand items.
+        :param compress: Gzip compress the file, by default if
+        `filename` ends with `.gz`.
+        '''
+        return self._export(self._check_and_callback(self.getProxyHistory),
+                            filename, format, start, progress, compress)
+
+    def exportSiteMap(self, filename, urlPrefix=None, format=HAR, start=0,
+                      progress=None, compress=None):
+        '''
+        This method writes the site map, or the items whose URL begins
+        with `urlPrefix`, to `filename`. See :meth:`exportProxyHistory`.
+        '''
+        return self._export(self._check_and_callback(self.getSiteMap,
+                                                     urlPrefix),
+                            filename, format, start, progress, compress)
+
+    def _export(self, items, filename, format, start, progress, compress):
+        total = len(items)
+        state = {'position': start}
+
+        def iterate():
+            for idx in xrange(start, total):
+                yield items[idx]
+                # asked for the next item, so this one was written
+                state['position'] = idx + 1
+
+        try:
+            return export(iterate(), filename, format, start, total,
+                          progress, compress, _burp=self, log=self.log)
+        except Exception:
+            self.log.exception('Export to %s stopped after %d items, '
+                               'resume with start=%d', filename,
+                               state['position'], state['position'])
+            raise
 
     @callback
     def addToSiteMap(self, item):
@@ -386,7 +448,10 @@ class BurpExtender(IBurpExtender, ComponentManager):
 
         :param filename: The filename containing Burp's saved state.
         '''
-        return self._check_and_callback(self.restoreState, File(filename))
+        try:
+            return self._check_and_callback(self.restoreState, File(filename))
+        finally:
+            HistoryIndex(self).reset()
 
     def saveState(self, filename):
         '''
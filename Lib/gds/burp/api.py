@@ -14,20 +14,28 @@ from .core import Interface
 
 __all__ = [
     'INewScanIssueHandler',
+    'IObserveOnlyHandler',
+    'IBatchHandler',
     'IExtenderRequestHandler',
     'IExtenderResponseHandler',
     'IIntruderRequestHandler',
     'IIntruderResponseHandler',
+    'IIntruderRequestBatchHandler',
+    'IIntruderResponseBatchHandler',
     'IProxyRequestHandler',
     'IProxyResponseHandler',
     'IRepeaterRequestHandler',
     'IRepeaterResponseHandler',
     'IScannerRequestHandler',
     'IScannerResponseHandler',
+    'IScannerRequestBatchHandler',
+    'IScannerResponseBatchHandler',
     'ISequencerRequestHandler',
     'ISequencerResponseHandler',
     'ISpiderRequestHandler',
     'ISpiderResponseHandler',
+    'ISpiderRequestBatchHandler',
+    'ISpiderResponseBatchHandler',
     'ITargetRequestHandler',
     'ITargetResponseHandler',
 ]
@@ -52,6 +60,46 @@ class INewScanIssueHandler(Interface):
         '''
 
 
+class IObserveOnlyHandler(Interface):
+    '''
+    Marker interface for request and response handlers that only
+    observe messages, i.e., for logging or passive analysis.
+
+    Components that implement this interface alongside any of the
+    tool handler interfaces below are not called on the Burp thread
+    that delivered the message. Their :meth:`processRequest` or
+    :meth:`processResponse` method is instead called from a worker
+    pool, after the inline handlers have run, with a snapshot of the
+    message. Changes made to the snapshot are not seen by Burp.
+
+    The size of the pool is set in the `[dispatch]` section of the
+    configuration.
+    '''
+
+
+class IBatchHandler(Interface):
+    '''
+    Base of the batch handler interfaces, for the high-volume tools.
+
+    Batch handlers are called with a list of the messages seen since
+    they were last called, rather than once per message, so they can
+    work on many messages at once, i.e., search all the bodies with a
+    single regular expression or write them out in bulk.
+
+    Like observe-only handlers they are called from a worker pool,
+    after the inline handlers have run, with snapshots of the messages,
+    and changes made to them are not seen by Burp. A batch holds at
+    most `batch_size` messages and is handed over at least every
+    `batch_window` milliseconds, both set in the `[dispatch]` section of
+    the configuration or as class attributes of the component. Batches
+    may be handled concurrently by different workers.
+
+    Batch handlers are enabled in the `[handlers]` section, i.e.,
+    `intruder.response.batch = GrepErrors`, and may declare traffic
+    predicates like any other handler.
+    '''
+
+
 class IExtenderRequestHandler(Interface):
     '''
     Extension point interface for components to perform actions on
@@ -124,6 +172,44 @@ class IIntruderResponseHandler(Interface):
         '''
 
 
+class IIntruderRequestBatchHandler(IBatchHandler):
+    '''
+    Extension point interface for components to observe, in batches,
+    the requests Burp Intruder sends on the wire.
+
+    Classes that implement this interface must implement the
+    :meth:`processRequests` method.
+    '''
+
+    def processRequests(batch):
+        '''
+        This method is invoked with the requests Burp Intruder sent since
+        it was last invoked.
+
+        :param batch: A list of :class:`HttpRequest <HttpRequest>`
+        objects.
+        '''
+
+
+class IIntruderResponseBatchHandler(IBatchHandler):
+    '''
+    Extension point interface for components to observe, in batches,
+    the responses Burp Intruder receives off the wire.
+
+    Classes that implement this interface must implement the
+    :meth:`processResponses` method.
+    '''
+
+    def processResponses(batch):
+        '''
+        This method is invoked with the responses Burp Intruder received
+        since it was last invoked.
+
+        :param batch: A list of :class:`HttpRequest <HttpRequest>`
+        objects.
+        '''
+
+
 class IProxyRequestHandler(Interface):
     '''
     Extension point interface for components to perform actions on
@@ -232,6 +318,44 @@ class IScannerResponseHandler(Interface):
         '''
 
 
+class IScannerRequestBatchHandler(IBatchHandler):
+    '''
+    Extension point interface for components to observe, in batches,
+    the requests Burp Scanner sends on the wire.
+
+    Classes that implement this interface must implement the
+    :meth:`processRequests` method.
+    '''
+
+    def processRequests(batch):
+        '''
+        This method is invoked with the requests Burp Scanner sent since
+        it was last invoked.
+
+        :param batch: A list of :class:`HttpRequest <HttpRequest>`
+        objects.
+        '''
+
+
+class IScannerResponseBatchHandler(IBatchHandler):
+    '''
+    Extension point interface for components to observe, in batches,
+    the responses Burp Scanner receives off the wire.
+
+    Classes that implement this interface must implement the
+    :meth:`processResponses` method.
+    '''
+
+    def processResponses(batch):
+        '''
+        This method is invoked with the responses Burp Scanner received
+        since it was last invoked.
+
+        :param batch: A list of :class:`HttpRequest <HttpRequest>`
+        objects.
+        '''
+
+
 class ISequencerRequestHandler(Interface):
     '''
     Extension point interface for components to perform actions on
@@ -304,6 +428,44 @@ class ISpiderResponseHandler(Interface):
         '''
 
 
+class ISpiderRequestBatchHandler(IBatchHandler):
+    '''
+    Extension point interface for components to observe, in batches,
+    the requests Burp Spider sends on the wire.
+
+    Classes that implement this interface must implement the
+    :meth:`processRequests` method.
+    '''
+
+    def processRequests(batch):
+        '''
+        This method is invoked with the requests Burp Spider sent since
+        it was last invoked.
+
+        :param batch: A list of :class:`HttpRequest <HttpRequest>`
+        objects.
+        '''
+
+
+class ISpiderResponseBatchHandler(IBatchHandler):
+    '''
+    Extension point interface for components to observe, in batches,
+    the responses Burp Spider receives off the wire.
+
+    Classes that implement this interface must implement the
+    :meth:`processResponses` method.
+    '''
+
+    def processResponses(batch):
+        '''
+        This method is invoked with the responses Burp Spider received
+        since it was last invoked.
+
+        :param batch: A list of :class:`HttpRequest <HttpRequest>`
+        objects.
+        '''
+
+
 class ITargetRequestHandler(Interface):
     '''
     Extension point interface for components to perform actions on
@@ -0,0 +1,709 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.archive
+~~~~~~~~~~~~~~~~
+
+This module contains an optional archive of the traffic seen by Burp,
+kept in a SQLite database outside of the Burp project, so it can be
+searched across Burp restarts and projects.
+
+Messages are handed over by the HTTP listener as their responses
+arrive, and written in batches, one transaction per batch, by a
+background thread. Request bodies and decoded response bodies of
+textual content types are indexed for full-text search.
+
+The archive is enabled in the `[archive]` section of the configuration.
+It needs either the `sqlite3` module, or Jython's `zxJDBC` and a SQLite
+JDBC driver (i.e., `sqlite-jdbc.jar`) on Burp's classpath.
+
+From the console::
+
+    >>> burp.archive.search('password NOT reset')
+    >>> burp.archive.where(host='*.example.com', status=(500, 599))
+
+Queries return :class:`ArchivedRequest`'s, which only load and parse
+their request and response once an attribute other than the columns
+of the archive is accessed. The columns go by the names and types of
+the same attributes of :class:`~gds.burp.models.HttpRequest`, along
+the lines of :class:`~gds.burp.models.CompactHttpRequest`.
+
+Bodies are stored once, keyed by their SHA-1 digest, however many
+messages carry them, so the same static asset fetched thousands of
+times takes the room of one. :meth:`Archive.stats` tells how much this
+saved. Messages read back share their bodies too, through
+:attr:`Archive.bodies`.
+'''
+try:
+    from com.ziclix.python.sql import zxJDBC
+except ImportError:
+    zxJDBC = None
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from array import array
+from fnmatch import fnmatch
+from threading import Lock
+from urlparse import urlparse
+
+from .batches import Batcher
+from .bodies import MIN_SIZE, BodyStore, digest, split
+from .config import BoolOption, IntOption, ListOption, Option
+from .core import Component
+from .models import HttpRequest, HttpRequestResponse, _get_service
+from .workers import BLOCK, DeliveryQueue
+
+import os
+import time
+
+JDBC_DRIVER = 'org.sqlite.JDBC'
+
+# path of an archive held in memory, and lost once closed
+MEMORY = ':memory:'
+
+# response bodies of these content types are indexed for search
+TEXT_TYPES = ('text/*', '*json*', '*xml*', '*javascript*', '*ecmascript*',
+              'application/x-www-form-urlencoded', '')
+
+COLUMNS = ('id', 'time', 'tool', 'protocol', 'host', 'port', 'method',
+           'url', 'status', 'mime')
+
+# the attributes of an ArchivedRequest the columns are read into
+_ATTRIBUTES = ('id', 'time', 'tool', 'protocol', 'host', 'port', 'method',
+               '_url', 'status_code', 'mime')
+
+_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        time REAL NOT NULL,
+        tool TEXT NOT NULL,
+        protocol TEXT NOT NULL,
+        host TEXT NOT NULL,
+        port INTEGER NOT NULL,
+        method TEXT,
+        url TEXT,
+        status INTEGER,
+        mime TEXT,
+        request BLOB,
+        response BLOB,
+        request_hash TEXT,
+        response_hash TEXT)''',
+    # bodies shared between messages, request and response hold the head
+    # of the message alone when its body is here
+    '''CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        refs INTEGER NOT NULL)''',
+    'CREATE INDEX IF NOT EXISTS messages_host ON messages (host)',
+    'CREATE INDEX IF NOT EXISTS messages_time ON messages (time)',
+    # docid is the id of the message
+    'CREATE VIRTUAL TABLE IF NOT EXISTS bodies USING fts4(request, response)',
+)
+
+# columns added since the first version of the schema, along with the
+# name they went by before, added to older archives as they are opened
+_MIGRATIONS = (
+    ('request_hash', 'request_body'),
+    ('response_hash', 'response_body'),
+)
+
+_INSERT_MESSAGE = 'INSERT INTO messages (%s, request, response, ' \
+    'request_hash, response_hash) VALUES (%s)' % (
+        ', '.join(COLUMNS), ', '.join('?' * (len(COLUMNS) + 4)))
+
+_INSERT_BLOB = 'INSERT OR IGNORE INTO blobs (hash, data, refs) ' \
+    'VALUES (?, ?, 0)'
+
+_REFERENCE_BLOB = 'UPDATE blobs SET refs = refs + ? WHERE hash = ?'
+
+_GET = 'SELECT m.protocol, m.host, m.port, m.request, m.response, ' \
+    'm.request_hash, m.response_hash, q.data, r.data FROM messages m ' \
+    'LEFT JOIN blobs q ON q.hash = m.request_hash ' \
+    'LEFT JOIN blobs r ON r.hash = m.response_hash WHERE m.id = ?'
+
+_STATS = 'SELECT count(*), coalesce(sum(length(data)), 0), ' \
+    'coalesce(sum(refs), 0), coalesce(sum(length(data) * refs), 0) ' \
+    'FROM blobs'
+
+_INSERT_BODIES = 'INSERT INTO bodies (docid, request, response) ' \
+    'VALUES (?, ?, ?)'
+
+_SELECT = 'SELECT %s FROM messages' % (', '.join(COLUMNS), )
+
+_SEARCH = 'SELECT %s FROM messages JOIN bodies ' \
+    'ON bodies.docid = messages.id WHERE bodies MATCH ? ' \
+    'ORDER BY messages.id DESC LIMIT ?' % (
+        ', '.join('messages.' + column for column in COLUMNS), )
+
+
+def connect(path, driver=JDBC_DRIVER):
+    '''
+    Returns a DB-API connection to the SQLite database at `path`, using
+    the `sqlite3` module if there is one, else zxJDBC and the JDBC
+    `driver`. Raises an :class:`ImportError` if neither is available.
+    '''
+    if sqlite3 is not None:
+        return sqlite3.connect(path, check_same_thread=False)
+
+    if zxJDBC is not None:
+        return zxJDBC.connect('jdbc:sqlite:%s' % (path, ), None, None, driver)
+
+    raise ImportError('The archive needs the sqlite3 module, or zxJDBC and '
+                      'a SQLite JDBC driver')
+
+
+def prepare(conn):
+    '''
+    Creates the tables of the archive in the database of `conn`, if they
+    are not there yet, and brings the tables of an older archive up to
+    date.
+    '''
+    cursor = conn.cursor()
+
+    try:
+        for statement in _SCHEMA:
+            cursor.execute(statement)
+
+        cursor.execute('PRAGMA table_info(messages)')
+        columns = set(row[1] for row in cursor.fetchall())
+
+        for column, former in _MIGRATIONS:
+            if column in columns:
+                continue
+
+            cursor.execute('ALTER TABLE messages ADD COLUMN %s TEXT' % (
+                           column, ))
+
+            if former in columns:
+                cursor.execute('UPDATE messages SET %s = %s' % (column,
+                                                                former))
+
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+class ArchivedRequest(object):
+    '''A lazy stand-in for an :class:`HttpRequest` read from the
+    archive.
+
+    The columns of the archive are available right away, as the
+    `protocol`, `host`, `port`, `method` and `url` of an
+    :class:`HttpRequest`, and the `status_code` of its response (None
+    if there was no response), like a
+    :class:`~gds.burp.models.CompactHttpRequest`. The `id` in the
+    archive, the `time` the message was archived, the name of the
+    `tool` and the `mime` type of the response are kept too. Accessing
+    anything else loads the message from the archive and parses it,
+    see :meth:`expand`.
+    '''
+    __slots__ = _ATTRIBUTES + ('_archive', '_request', )
+
+    def __init__(self, archive, row):
+        for name, value in zip(_ATTRIBUTES, row):
+            setattr(self, name, value)
+
+        self._archive = archive
+        self._request = None
+
+    def __repr__(self):
+        return '<ArchivedRequest [%s %s] %s>' % (self.method, self._url,
+                                                 self.status_code)
+
+    @property
+    def url(self):
+        '''
+        The URL requested in this HTTP request.
+
+        Note: This is a **read-only** attribute.
+
+        :returns: :class:`~urlparse.ParseResult` object.
+        '''
+        if self._url is None:
+            return None
+
+        return urlparse(self._url)
+
+    def __getattr__(self, name):
+        return getattr(self.expand(), name)
+
+    def expand(self):
+        '''
+        Returns the full :class:`HttpRequest` for this message, loading
+        it from the archive on first use.
+        '''
+        if self._request is None:
+            self._request = self._archive.get(self.id)
+
+        return self._request
+
+
+class Archive(Component):
+    '''The traffic archive, also available as `burp.archive`.
+    '''
+    enabled = BoolOption('archive', 'enabled', False,
+        '''Write the messages of the `tools` to the archive.''')
+
+    path = Option('archive', 'path', 'burp-archive.db',
+        '''Path of the SQLite database, relative to the directory of the
+        configuration file, or `:memory:` for an archive that is lost
+        once the extension is unloaded.''')
+
+    tools = ListOption('archive', 'tools', 'Proxy',
+        doc='''Names of the tools whose messages are archived, i.e.,
+        `Proxy, Repeater`.''')
+
+    batchSize = IntOption('archive', 'batch_size', 200,
+        '''Maximum number of messages written in one transaction.''')
+
+    batchWindow = IntOption('archive', 'batch_window', 1000,
+        '''Maximum time, in milliseconds, a message waits to be written.''')
+
+    queueSize = IntOption('archive', 'queue_size', 50,
+        '''Maximum number of batches waiting to be written. Past this,
+        Burp waits for the writer to catch up.''')
+
+    maxIndexedSize = IntOption('archive', 'max_indexed_size', 1024 * 1024,
+        '''Bodies larger than this many bytes are archived, but not
+        indexed for search.''')
+
+    bodyCacheSize = IntOption('archive', 'body_cache_size',
+        16 * 1024 * 1024,
+        '''Maximum number of bytes of distinct bodies kept, so that the
+        messages read from the archive share them.''')
+
+    jdbcDriver = Option('archive', 'jdbc_driver', JDBC_DRIVER,
+        '''Class name of the SQLite JDBC driver, used when the sqlite3
+        module is not available.''')
+
+    def __init__(self):
+        self._settings = (None, frozenset())
+        self._lock = Lock()
+        self._batcher = None
+        self._queue = None
+        self._writer = None
+        self._nextId = None
+        self._reader = None
+        self._readLock = Lock()
+        self._bodies = None
+
+        self.written = 0
+
+    def __repr__(self):
+        return '<Archive %s, %d written>' % (self.filename, self.written)
+
+    @property
+    def filename(self):
+        '''
+        Absolute path of the SQLite database, or `:memory:`.
+
+        Note: This is a **read-only** attribute.
+        '''
+        if self.path == MEMORY:
+            return MEMORY
+
+        path = os.path.expanduser(self.path)
+
+        if self.config.filename:
+            path = os.path.join(os.path.dirname(self.config.filename), path)
+
+        return os.path.abspath(path)
+
+    @property
+    def bodies(self):
+        '''
+        The :class:`~gds.burp.bodies.BodyStore` through which the messages
+        read from the archive share their bodies.
+
+        Note: This is a **read-only** attribute.
+        '''
+        if self._bodies is None:
+            self._bodies = BodyStore(self.bodyCacheSize)
+
+        return self._bodies
+
+    def record(self, toolName, messageIsRequest, messageInfo):
+        '''
+        Queues a message to be archived, once its response has arrived,
+        if the archive is enabled for `toolName`. Called by the HTTP
+        listener for every message.
+        '''
+        if messageIsRequest:
+            return
+
+        generation, tools = self._settings
+
+        if generation != self.config._generation:
+            tools = frozenset(self.tools) if self.enabled else frozenset()
+            self._settings = (self.config._generation, tools)
+
+        if toolName not in tools:
+            return
+
+        try:
+            message = HttpRequestResponse.copy(messageInfo)
+        except Exception:
+            self.log.exception('Could not copy object: %r', messageInfo)
+            return
+
+        self._getBatcher().add((time.time(), toolName, message))
+
+    def _getBatcher(self):
+        if self._batcher is None:
+            with self._lock:
+                if self._batcher is None:
+                    self._queue = DeliveryQueue(
+                        self._write, 1, self.queueSize, BLOCK,
+                        name='archive-writer', log=self.log)
+                    self._batcher = Batcher(
+                        self._queue.put, self.batchSize, self.batchWindow,
+                        'archive-batcher', self.log)
+
+        return self._batcher
+
+    def flush(self, timeout=None):
+        '''
+        Writes the messages queued so far. Returns False if `timeout`
+        seconds passed first.
+        '''
+        if self._batcher is None:
+            return True
+
+        self._batcher.flush()
+        return self._queue.flush(timeout)
+
+    def close(self, timeout=None):
+        '''
+        Writes the messages queued so far, waiting for up to `timeout`
+        seconds, and closes the database.
+        '''
+        with self._lock:
+            batcher, self._batcher = self._batcher, None
+            queue, self._queue = self._queue, None
+
+        if batcher is not None:
+            batcher.close()
+
+            if queue.shutdown(timeout):
+                self.log.error('Messages were left unarchived after %ss',
+                               timeout)
+
+        for conn in set((self._writer, self._reader)):
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    self.log.exception('Error closing the archive')
+
+        self._writer = self._reader = None
+
+    def _open(self):
+        filename = self.filename
+
+        if filename == MEMORY:
+            # every connection would have a database of its own
+            with self._lock:
+                conn = self._writer or self._reader
+
+                if conn is None:
+                    conn = connect(filename, self.jdbcDriver)
+                    prepare(conn)
+
+            return conn
+
+        conn = connect(filename, self.jdbcDriver)
+        prepare(conn)
+        return conn
+
+    def _write(self, batch):
+        if self._writer is None:
+            self._writer = self._open()
+            self._nextId = (self._scalar(self._writer,
+                                         'SELECT max(id) FROM messages')
+                            or 0) + 1
+
+        messages, bodies, blobs, refs = [], [], {}, {}
+
+        for when, toolName, message in batch:
+            try:
+                row, body, shared = self._row(when, toolName, message)
+            except Exception:
+                self.log.exception('Could not archive %r', message)
+                continue
+
+            messages.append((self._nextId, ) + row)
+
+            if body is not None:
+                bodies.append((self._nextId, ) + body)
+
+            for key, data in shared:
+                blobs[key] = data
+                refs[key] = refs.get(key, 0) + 1
+
+            self._nextId += 1
+
+        cursor = self._writer.cursor()
+
+        try:
+            if blobs:
+                cursor.executemany(_INSERT_BLOB, [
+                    (key, _blob(data)) for key, data in blobs.iteritems()])
+                cursor.executemany(_REFERENCE_BLOB, [
+                    (count, key) for key, count in refs.iteritems()])
+
+            cursor.executemany(_INSERT_MESSAGE, messages)
+
+            if bodies:
+                cursor.executemany(_INSERT_BODIES, bodies)
+
+            self._writer.commit()
+        except Exception:
+            self._writer.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        self.written += len(messages)
+
+    def _row(self, when, toolName, message):
+        request = HttpRequest(message, _burp=self.burp)
+        response = request.response
+        service = message.getHttpService()
+
+        status, mime = None, None
+        requestText, responseText = _text(request.body), None
+
+        if response:
+            status = response.status_code
+            mime = (response.headers.get('content-type') or '') \
+                .split(';', 1)[0].strip().lower()
+
+            if any(fnmatch(mime, pattern) for pattern in TEXT_TYPES):
+                try:
+                    responseText = _text(
+                        response.decode_body(self.maxIndexedSize))
+                except ValueError:
+                    pass
+
+        if requestText and len(requestText) > self.maxIndexedSize:
+            requestText = None
+
+        shared = []
+        requestHead, requestKey = _store(message.request_parts, shared)
+        responseHead, responseKey = _store(message.response_parts, shared)
+
+        row = (when, toolName, service.getProtocol(),
+               service.getHost().lower(), service.getPort(), request.method,
+               request.url.geturl(), status, mime,
+               _blob(requestHead), _blob(responseHead),
+               requestKey, responseKey)
+
+        body = None
+
+        if requestText or responseText:
+            body = (requestText, responseText)
+
+        return row, body, shared
+
+    def _query(self, sql, params=()):
+        self.flush()
+
+        with self._readLock:
+            if self._reader is None:
+                self._reader = self._open()
+
+            cursor = self._reader.cursor()
+
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def _scalar(self, conn, sql):
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def count(self):
+        '''
+        Returns the number of messages in the archive.
+        '''
+        return self._query('SELECT count(*) FROM messages')[0][0]
+
+    def get(self, id):
+        '''
+        Returns the :class:`HttpRequest` archived with `id`.
+        '''
+        rows = self._query(_GET, (id, ))
+
+        if not rows:
+            raise KeyError(id)
+
+        protocol, host, port, request, response, requestKey, responseKey, \
+            requestBody, responseBody = rows[0]
+
+        return HttpRequest(
+            HttpRequestResponse.from_parts(
+                self._parts(request, requestKey, requestBody),
+                self._parts(response, responseKey, responseBody),
+                _get_service(host, port, protocol)),
+            _burp=self.burp)
+
+    def _parts(self, message, key, body):
+        message = _bytes(message)
+
+        if message is None:
+            return None
+
+        if key is None:
+            # stored whole
+            return split(message)
+
+        return message, self.bodies.intern(_bytes(body), key)
+
+    def stats(self):
+        '''
+        Returns a dictionary of the number of distinct shared `bodies`,
+        their `size`, the number of `references` made to them by archived
+        messages and the `referenced` bytes, the bytes `saved` by storing
+        each body once, and the dedup `ratio`, referenced over stored
+        bytes. Bodies smaller than :data:`~gds.burp.bodies.MIN_SIZE` are
+        stored with their messages and not counted.
+        '''
+        bodies, size, references, referenced = self._query(_STATS)[0]
+
+        return {
+            'bodies': bodies,
+            'size': size,
+            'references': references,
+            'referenced': referenced,
+            'saved': referenced - size,
+            'ratio': float(referenced) / size if size else 1.0,
+        }
+
+    def search(self, query, limit=100):
+        '''
+        Returns the :class:`ArchivedRequest`'s whose request body or
+        decoded response body match the full-text `query`, most recent
+        first. See SQLite's FTS4 documentation for the query syntax,
+        i.e., `password`, `"access denied"`, `token NOT csrf`.
+
+        :param limit: Maximum number of requests returned.
+        '''
+        rows = self._query(_SEARCH, (query, limit))
+        return [ArchivedRequest(self, row) for row in rows]
+
+    def where(self, host=None, method=None, status=None, url=None,
+              tool=None, since=None, until=None, limit=None):
+        '''
+        Returns the :class:`ArchivedRequest`'s matching all of the
+        arguments given, in the order they were archived.
+
+        :param host: A glob, i.e., `*.example.com`.
+        :param method: A method, i.e., `POST`.
+        :param status: A status code, or an inclusive `(low, high)` tuple.
+        :param url: A string the URL contains.
+        :param tool: The name of a tool, i.e., `Proxy`.
+        :param since: Archived at or after this time, in seconds since
+        the epoch.
+        :param until: Archived before this time.
+        :param limit: Maximum number of requests returned, the most
+        recent ones.
+        '''
+        clauses, params = [], []
+
+        if host is not None:
+            clauses.append('host GLOB ?')
+            params.append(host.lower())
+
+        if method is not None:
+            clauses.append('method = ?')
+            params.append(method.upper())
+
+        if isinstance(status, tuple):
+            clauses.append('status BETWEEN ? AND ?')
+            params.extend(status)
+        elif status is not None:
+            clauses.append('status = ?')
+            params.append(status)
+
+        if url is not None:
+            clauses.append('instr(url, ?) > 0')
+            params.append(url)
+
+        if tool is not None:
+            clauses.append('tool = ?')
+            params.append(tool)
+
+        if since is not None:
+            clauses.append('time >= ?')
+            params.append(since)
+
+        if until is not None:
+            clauses.append('time < ?')
+            params.append(until)
+
+        sql = _SELECT
+
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+
+        if limit is not None:
+            sql = 'SELECT * FROM (%s ORDER BY id DESC LIMIT ?) ' % (sql, )
+            params.append(limit)
+
+        rows = self._query(sql + ' ORDER BY id', params)
+        return [ArchivedRequest(self, row) for row in rows]
+
+
+def _text(body):
+    if not body:
+        return None
+
+    return body.decode('utf-8', 'replace')
+
+
+def _store(parts, shared):
+    '''
+    Returns the head of a message and the key of its body, appending
+    the body to `shared`, or the whole message and None if its body is
+    too small to be worth sharing.
+    '''
+    if parts is None:
+        return None, None
+
+    head, body = parts
+
+    if len(body) < MIN_SIZE:
+        return head + body, None
+
+    key = digest(body).encode('hex')
+    shared.append((key, body))
+    return head, key
+
+
+def _blob(data):
+    if data is None:
+        return None
+
+    if sqlite3 is not None:
+        return buffer(data)
+
+    return array('b', data)
+
+
+def _bytes(value):
+    if value is None:
+        return None
+
+    if isinstance(value, array):
+        return value.tostring()
+
+    return str(value)
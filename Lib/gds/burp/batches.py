@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.batches
+~~~~~~~~~~~~~~~~
+
+This module accumulates messages for the batch handlers, i.e., the
+:class:`~gds.burp.api.IIntruderResponseBatchHandler`, so they are
+called once per batch rather than once per message.
+
+A batch is handed over once it holds `batch_size` messages, or once
+its oldest message has waited `batch_window` milliseconds, whichever
+comes first. Both default to the `[dispatch]` section of the
+configuration, and can be set per handler as class attributes::
+
+    class GrepErrors(Component):
+        implements(IIntruderResponseBatchHandler)
+
+        batch_size = 500
+        batch_window = 2000
+
+        def processResponses(self, batch):
+            ...
+'''
+from threading import Condition, Lock, Thread
+
+from .budgets import clock
+
+import logging
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BATCH_WINDOW = 1000
+
+
+class Batcher(object):
+    '''Collects items and hands them to `deliver` in lists of at most
+    `size` items, at least every `window` milliseconds while any are
+    waiting.
+
+    Full batches are handed over on the thread that added the last
+    item, the others on a daemon thread of the batcher's own, so
+    `deliver` should return quickly, i.e., by queueing the batch.
+
+    :param deliver: Called with each batch, a list.
+    :param size: Maximum number of items in a batch.
+    :param window: Maximum time, in milliseconds, an item waits.
+    :param name: Name of the thread.
+    :param log: Logger that exceptions raised by `deliver` are written
+    to.
+    '''
+    def __init__(self, deliver, size=DEFAULT_BATCH_SIZE,
+                 window=DEFAULT_BATCH_WINDOW, name='gds-burp-batcher',
+                 log=None):
+        self.deliver = deliver
+        self.size = max(size, 1)
+        self.window = max(window, 1)
+        self.name = name
+        self.log = log or logging.getLogger(__name__)
+
+        self.batches = 0
+        self.items = 0
+
+        self._items = []
+        self._since = None
+        self._cond = Condition(Lock())
+        self._closed = False
+
+        self._thread = Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return '<Batcher [%s] %d/%d pending, %d batches>' % (
+            self.name, len(self), self.size, self.batches)
+
+    @property
+    def closed(self):
+        '''
+        True once :meth:`close` has been called.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._closed
+
+    def add(self, item):
+        '''
+        Adds `item` to the current batch, handing the batch over if it
+        is full. Once the batcher is closed, `item` is handed over on
+        its own.
+        '''
+        with self._cond:
+            if self._closed:
+                batch = [item]
+            else:
+                if not self._items:
+                    self._since = clock()
+                    self._cond.notify()
+
+                self._items.append(item)
+
+                if len(self._items) < self.size:
+                    return
+
+                batch = self._take()
+
+        self._deliver(batch)
+
+    def flush(self):
+        '''
+        Hands over the current batch, if there is one.
+        '''
+        with self._cond:
+            batch = self._take()
+
+        if batch:
+            self._deliver(batch)
+
+    def close(self):
+        '''
+        Hands over the current batch and stops the batcher's thread.
+        '''
+        with self._cond:
+            self._closed = True
+            batch = self._take()
+            self._cond.notify()
+
+        if batch:
+            self._deliver(batch)
+
+    def _take(self):
+        batch, self._items = self._items, []
+        self._since = None
+        return batch
+
+    def _deliver(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            self.deliver(batch)
+        except Exception:
+            self.log.exception('Error delivering a batch of %d from %s',
+                               len(batch), self.name)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._since is None:
+                        self._cond.wait()
+                        continue
+
+                    remaining = self._since + self.window - clock()
+
+                    if remaining <= 0:
+                        break
+
+                    self._cond.wait(remaining / 1000.0)
+
+                if self._closed:
+                    return
+
+                batch = self._take()
+
+            if batch:
+                self._deliver(batch)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.bodies
+~~~~~~~~~~~~~~~
+
+This module contains a content-addressed store of message bodies, so
+that identical bodies (i.e., the same static asset fetched thousands of
+times) are held once and shared by reference.
+
+Bodies are keyed by their SHA-1 digest. The archive and the serializers
+write each distinct body once, referring to it by its digest
+afterwards, and the messages read back from them share their bodies.
+Messages are only hashed there, copying Burp's messages is a plain copy.
+
+The archive shares the bodies of the messages it reads through a
+:class:`BodyStore` sized by its `body_cache_size` option. From the
+console::
+
+    >>> burp.archive.bodies.stats()
+'''
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+
+# bodies smaller than this are not worth hashing
+MIN_SIZE = 64
+
+# bytes of distinct bodies held, the least recently used are dropped
+# past this, which only means later copies of them are not shared
+DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+
+DIGEST_SIZE = 20
+
+
+def digest(body):
+    '''
+    Returns the key of `body` in a :class:`BodyStore`, its binary SHA-1
+    digest.
+    '''
+    return sha1(body).digest()
+
+
+class BodyStore(object):
+    '''A bounded, content-addressed store of bodies.
+
+    :param max_size: Maximum number of bytes of distinct bodies held.
+    Larger bodies are passed through as they are.
+    :param min_size: Bodies smaller than this are passed through as they
+    are.
+    '''
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, min_size=MIN_SIZE):
+        self.max_size = max_size
+        self.min_size = min_size
+        self._bodies = OrderedDict()
+        self._lock = Lock()
+        self.reset()
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def __contains__(self, key):
+        return key in self._bodies
+
+    def __repr__(self):
+        return '<BodyStore %d bodies, %d bytes, %d bytes saved>' % (
+            len(self), self.size, self.saved)
+
+    def reset(self):
+        '''
+        Drops every body and clears the stats.
+        '''
+        with self._lock:
+            self._bodies.clear()
+            self.size = 0
+            self.references = 0
+            self.referenced = 0
+            self.evicted = 0
+
+    @property
+    def saved(self):
+        '''
+        Number of bytes not held thanks to sharing, the total size of the
+        bodies referenced less the size of the bodies stored.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return max(self.referenced - self.size, 0)
+
+    @property
+    def ratio(self):
+        '''
+        Size of the bodies referenced over the size of the bodies held,
+        1.0 when nothing is shared.
+
+        Note: This is a **read-only** attribute.
+        '''
+        if not self.size:
+            return 1.0
+
+        return float(self.referenced) / self.size
+
+    def intern(self, body, key=None):
+        '''
+        Returns the stored body identical to `body`, storing it first if
+        there is none, so that every caller holds the same string.
+
+        :param key: The key of `body`, if known, by default its
+        :func:`digest`.
+        '''
+        if body is None or len(body) < self.min_size:
+            return body
+
+        return self.put(body, key)[1]
+
+    def put(self, body, key=None):
+        '''
+        Stores `body`, unless an identical body is already stored.
+        Returns a `(key, body)` tuple, where `body` is the stored one.
+        Bodies larger than `max_size` are not stored, and returned as
+        they are.
+        '''
+        if key is None:
+            key = digest(body)
+
+        if len(body) > self.max_size:
+            return key, body
+
+        with self._lock:
+            stored = self._bodies.pop(key, None)
+
+            if stored is None:
+                stored = body
+                self.size += len(body)
+
+            # most recently used last
+            self._bodies[key] = stored
+            self.references += 1
+            self.referenced += len(body)
+
+            while self.size > self.max_size and self._bodies:
+                _, dropped = self._bodies.popitem(last=False)
+                self.size -= len(dropped)
+                self.evicted += 1
+
+        return key, stored
+
+    def get(self, key, default=None):
+        '''
+        Returns the body stored under `key`, or `default`.
+        '''
+        return self._bodies.get(key, default)
+
+    def stats(self):
+        '''
+        Returns a dictionary of the number of distinct `bodies`, their
+        `size`, the number of `references` made and the `referenced`
+        bytes, the bytes `saved`, the dedup `ratio` and the number of
+        bodies `evicted`.
+        '''
+        with self._lock:
+            return {
+                'bodies': len(self._bodies),
+                'size': self.size,
+                'references': self.references,
+                'referenced': self.referenced,
+                'saved': self.saved,
+                'ratio': self.ratio,
+                'evicted': self.evicted,
+            }
+
+
+def split(message):
+    '''
+    Returns a `(head, body)` tuple for a raw HTTP message, the head
+    holding the start-line, headers and the blank line after them.
+    '''
+    idx = message.find('\r\n\r\n')
+
+    if idx == -1:
+        return message, ''
+
+    return message[:idx + 4], message[idx + 4:]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.budgets
+~~~~~~~~~~~~~~~~
+
+This module contains per-handler time budgets.
+
+Each handler with a budget gets a :class:`CircuitBreaker`, which keeps
+the outcome of its last few calls. When too many of them ran over the
+budget the breaker trips, and the handler is not called again until a
+cool-down period has passed.
+
+Calls still running count as over budget as soon as their budget
+has passed, so a handler that hangs trips its breaker once `threshold`
+of its calls are stuck, rather than never. A call that is already
+running cannot be interrupted though, so a breaker only protects Burp
+from the calls that would have followed it, and the threads of the
+calls that hung stay with them.
+
+Budgets are set in the `[budgets]` section of the configuration, as
+`budget.<class name>` options, or as a `budget` class attribute of the
+component.
+'''
+from collections import deque
+from threading import Lock
+
+from java.lang import System
+
+SKIP = 'skip'
+DISABLE = 'disable'
+MODES = (SKIP, DISABLE)
+
+
+def clock():
+    '''
+    Returns a monotonic time in milliseconds, for measuring elapsed
+    time only.
+    '''
+    return System.nanoTime() / 1000000.0
+
+
+class CircuitBreaker(object):
+    '''Tracks the latency of a single handler against its budget.
+
+    :param budget: Time budget of a single call, in milliseconds.
+    :param threshold: Number of calls over budget, out of the last
+    `window` calls, that trips the breaker.
+    :param window: Number of recent calls kept.
+    :param cooldown: Seconds after tripping before the handler is
+    called again.
+    '''
+    def __init__(self, budget, threshold=5, window=20, cooldown=60):
+        self.settings = (budget, threshold, window, cooldown)
+        self.budget = budget
+        self.threshold = max(threshold, 1)
+        self.window = max(window, self.threshold)
+        self.cooldown = cooldown
+
+        self.average = 0.0
+        self.calls = 0
+        self.trips = 0
+
+        self._overruns = deque(maxlen=self.window)
+        self._overrunCount = 0
+        self._openedAt = None
+        self._running = []
+        self._lock = Lock()
+
+    def __repr__(self):
+        return '<CircuitBreaker %.1fms/%dms %s>' % (
+            self.average, self.budget, 'open' if self.isOpen else 'closed')
+
+    @property
+    def isOpen(self):
+        '''
+        True while the breaker is tripped and the handler is not to be
+        called.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._openedAt is not None
+
+    def allow(self, now=None):
+        '''
+        Returns True if the handler may be called. Once the cool-down
+        has passed, an open breaker is closed again.
+
+        :param now: The current :func:`clock` time.
+        '''
+        if self._openedAt is None:
+            return True
+
+        if now is None:
+            now = clock()
+
+        with self._lock:
+            if self._openedAt is not None and \
+                    now - self._openedAt < self.cooldown * 1000:
+                return False
+
+            self.reset()
+
+        return True
+
+    def begin(self, now=None):
+        '''
+        Records the start of a call, once :meth:`allow` returned True,
+        and returns its start time, to be handed to :meth:`end`. Returns
+        None instead if the calls still running over budget tripped the
+        breaker, in which case the handler is not to be called.
+
+        :param now: The current :func:`clock` time.
+        '''
+        if now is None:
+            now = clock()
+
+        with self._lock:
+            if self._running and self._openedAt is None:
+                stuck = sum(1 for start in self._running
+                            if now - start > self.budget)
+
+                if stuck and self._overrunCount + stuck >= self.threshold:
+                    self._openedAt = now
+                    self.trips += 1
+                    return None
+
+            self._running.append(now)
+
+        return now
+
+    def end(self, start):
+        '''
+        Records that the call started at `start`, as returned by
+        :meth:`begin`, is no longer running. Its latency is recorded
+        with :meth:`record`.
+        '''
+        with self._lock:
+            self._running.remove(start)
+
+    def record(self, elapsed, now=None):
+        '''
+        Records the latency of a call. Returns True if this call tripped
+        the breaker.
+
+        :param elapsed: Time taken by the call, in milliseconds.
+        :param now: The current :func:`clock` time.
+        '''
+        overrun = elapsed > self.budget
+
+        with self._lock:
+            self.calls += 1
+            # exponentially weighted, so recent calls count the most
+            self.average += (elapsed - self.average) * 0.2
+
+            if len(self._overruns) == self.window:
+                self._overrunCount -= self._overruns[0]
+
+            self._overruns.append(overrun)
+            self._overrunCount += overrun
+
+            if self._openedAt is not None or \
+                    self._overrunCount < self.threshold:
+                return False
+
+            self._openedAt = clock() if now is None else now
+            self.trips += 1
+
+        return True
+
+    def reset(self):
+        '''
+        Closes the breaker and forgets the calls seen so far.
+        '''
+        self._overruns.clear()
+        self._overrunCount = 0
+        self._openedAt = None
@@ -91,6 +91,7 @@ class Configuration(object):
         self.parents = []
         self._lastmtime = 0
         self._sections = {}
+        self._generation = 0
         self.parser.read(filename)
 
     def __contains__(self, name):
@@ -246,6 +247,7 @@ class Configuration(object):
 
         if changed:
             self._cache = {}
+            self._generation += 1
         return changed
 
 
@@ -57,6 +57,7 @@ class ComponentMeta(type):
     """
     _components = []
     _registry = {}
+    _generation = 0
 
     def __new__(mcs, name, bases, d):
         """Create the component class."""
@@ -78,6 +79,9 @@ class ComponentMeta(type):
                 if new_class not in classes:
                     classes.append(new_class)
 
+        # let anyone caching lookups in the registry know it changed
+        ComponentMeta._generation += 1
+
         return new_class
 
     def __call__(cls, *args, **kwargs):
@@ -143,6 +147,7 @@ class ComponentManager(object):
         """Initialize the component manager."""
         self.components = {}
         self.enabled = {}
+        self._generation = 0
         if isinstance(self, Component):
             self.components[self.__class__] = self
 
@@ -184,6 +189,23 @@ class ComponentManager(object):
             component = component.__class__
         self.enabled[component] = False
         self.components[component] = None
+        self._generation += 1
+
+    def enableComponent(self, component):
+        """Enable a component that was disabled with `disableComponent`.
+
+        :param component: can be a class or an instance. If an instance
+            is given, it is activated again instead of a new one being
+            created on next use.
+        """
+        if isinstance(component, type):
+            cls = component
+        else:
+            cls = component.__class__
+            self.components[cls] = component
+        # let isComponentEnabled() decide again
+        self.enabled.pop(cls, None)
+        self._generation += 1
 
     def componentActivated(self, component):
         """Can be overridden by sub-classes so that special
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.decoders
+~~~~~~~~~~~~~~~~~
+
+This module contains streaming decoders for the transfer codings
+(chunked) and content codings (gzip, deflate) of HTTP message bodies.
+
+Decoders never produce more than `chunk_size` bytes at a time, and
+raise a :class:`ValueError` once their output grows past `max_size`,
+so that a compression bomb cannot exhaust Burp's heap.
+'''
+import struct
+import zlib
+
+CRLF = '\r\n'
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_DECODED_SIZE = 32 * 1024 * 1024
+
+_GZIP_MAGIC = '\x1f\x8b'
+_FHCRC, _FEXTRA, _FNAME, _FCOMMENT = 2, 4, 8, 16
+
+
+def iter_decoded(body, transfer_encoding='', content_encoding='',
+                 max_size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Returns a generator of the pieces of `body` after removing the
+    codings listed in the `Transfer-Encoding` and `Content-Encoding`
+    header values given.
+
+    :param body: The raw message body.
+    :param transfer_encoding: Value of the Transfer-Encoding header.
+    :param content_encoding: Value of the Content-Encoding header.
+    :param max_size: Maximum size of the decoded body, defaults to
+    :data:`MAX_DECODED_SIZE`.
+    :param chunk_size: Maximum size of each piece generated.
+    '''
+    if max_size is None:
+        max_size = MAX_DECODED_SIZE
+
+    # codings are listed in the order they were applied, so they
+    # are removed in reverse, transfer codings first
+    codings = _codings(content_encoding) + _codings(transfer_encoding)
+
+    if codings and codings[-1] == 'chunked':
+        codings.pop()
+        pieces = iter_dechunked(body)
+    else:
+        pieces = iter([body or ''])
+
+    for coding in reversed(codings):
+        if coding in ('gzip', 'x-gzip'):
+            pieces = _iter_inflated(pieces, _GzipDecompressor(),
+                                    max_size, chunk_size)
+        elif coding == 'deflate':
+            pieces = _iter_inflated(pieces, _DeflateDecompressor(),
+                                    max_size, chunk_size)
+        elif coding != 'identity':
+            raise ValueError('Unsupported coding: %r' % (coding, ))
+
+    return pieces
+
+
+def iter_dechunked(body):
+    '''
+    Returns a generator of the chunks in a body sent with the chunked
+    transfer coding. Chunk extensions and trailers are ignored.
+
+    :param body: The raw message body.
+    '''
+    pos = 0
+
+    while True:
+        idx = body.find(CRLF, pos)
+
+        if idx == -1:
+            raise ValueError('Could not parse chunk size at offset %d' % (
+                             pos, ))
+
+        size = body[pos:idx].split(';', 1)[0].strip()
+
+        try:
+            size = int(size, 16)
+        except ValueError:
+            raise ValueError('Invalid chunk size: %r' % (size, ))
+
+        if size == 0:
+            return
+
+        pos = idx + 2
+        chunk = body[pos:pos + size]
+
+        if chunk:
+            yield chunk
+
+        if len(chunk) < size:
+            # the body was truncated, hand back what we have
+            return
+
+        pos += size + 2
+
+
+def _codings(header):
+    return [coding.strip().lower()
+            for coding in (header or '').split(',') if coding.strip()]
+
+
+def _iter_inflated(pieces, decompressor, max_size, chunk_size):
+    total = 0
+
+    for piece in pieces:
+        data = decompressor.decompress(piece, chunk_size)
+
+        while data:
+            total += len(data)
+            if total > max_size:
+                raise ValueError('Decoded body exceeds %d bytes' % (
+                                 max_size, ))
+
+            yield data
+
+            data = decompressor.decompress('', chunk_size)
+
+    data = decompressor.flush()
+
+    if data:
+        total += len(data)
+        if total > max_size:
+            raise ValueError('Decoded body exceeds %d bytes' % (max_size, ))
+
+        yield data
+
+
+class _DeflateDecompressor(object):
+    '''
+    Servers disagree on whether "deflate" means a zlib stream or a raw
+    deflate stream, so we try the former and fall back to the latter.
+    '''
+    def __init__(self):
+        self._obj = zlib.decompressobj()
+        self._started = False
+
+    def decompress(self, data, max_length):
+        data = self._obj.unconsumed_tail + data
+
+        if not self._started and data:
+            self._started = True
+
+            try:
+                return self._obj.decompress(data, max_length)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+
+        return self._obj.decompress(data, max_length)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _GzipDecompressor(object):
+    '''
+    Strips the gzip member header and inflates the raw deflate stream
+    that follows it. The trailer is left unchecked.
+    '''
+    def __init__(self):
+        self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._header = ''
+
+    def decompress(self, data, max_length):
+        if self._header is not None:
+            self._header += data
+            length = _gzip_header_length(self._header)
+
+            if length is None:
+                return ''
+
+            data, self._header = self._header[length:], None
+        else:
+            data = self._obj.unconsumed_tail + data
+
+        return self._obj.decompress(data, max_length)
+
+    def flush(self):
+        if self._header:
+            raise ValueError('Truncated gzip header')
+
+        return self._obj.flush()
+
+
+def _gzip_header_length(data):
+    '''
+    Returns the length of the gzip member header at the start of
+    `data`, or None if `data` does not hold all of it yet.
+    '''
+    if len(data) < 10:
+        return
+
+    if data[:2] != _GZIP_MAGIC or data[2] != '\x08':
+        raise ValueError('Not a gzip stream')
+
+    flags = ord(data[3])
+    pos = 10
+
+    if flags & _FEXTRA:
+        if len(data) < pos + 2:
+            return
+        pos += 2 + struct.unpack('<H', data[pos:pos + 2])[0]
+
+    for flag in (_FNAME, _FCOMMENT):
+        if flags & flag:
+            pos = data.find('\x00', pos)
+            if pos == -1:
+                return
+            pos += 1
+
+    if flags & _FHCRC:
+        pos += 2
+
+    if len(data) < pos:
+        return
+
+    return pos
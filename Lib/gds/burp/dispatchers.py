@@ -4,20 +4,35 @@ gds.burp.dispatchers
 ~~~~~~~~~~~~~~~~~~~~
 
 '''
-from .api import INewScanIssueHandler, \
+from java.lang import System
+from java.util.concurrent.atomic import AtomicLong
+
+from .api import INewScanIssueHandler, IObserveOnlyHandler, \
     IExtenderRequestHandler, IExtenderResponseHandler, \
     IIntruderRequestHandler, IIntruderResponseHandler, \
+    IIntruderRequestBatchHandler, IIntruderResponseBatchHandler, \
     IProxyRequestHandler, IProxyResponseHandler, \
     IRepeaterRequestHandler, IRepeaterResponseHandler, \
     IScannerRequestHandler, IScannerResponseHandler, \
+    IScannerRequestBatchHandler, IScannerResponseBatchHandler, \
     ISequencerRequestHandler, ISequencerResponseHandler, \
     ISpiderRequestHandler, ISpiderResponseHandler, \
+    ISpiderRequestBatchHandler, ISpiderResponseBatchHandler, \
     ITargetRequestHandler, ITargetResponseHandler
 
-from .config import OrderedExtensionsOption
-from .core import Component, ExtensionPoint
-from .models import HttpRequest
-
+from .batches import DEFAULT_BATCH_SIZE, DEFAULT_BATCH_WINDOW, Batcher
+from .budgets import DISABLE, MODES, SKIP, CircuitBreaker, clock
+from .config import BoolOption, IntOption, Option, OrderedExtensionsOption
+from .core import Component, ComponentMeta, ExtensionPoint
+from .models import HttpRequest, HttpRequestResponse
+from .predicates import Matcher, declares_predicates
+from .stats import DispatchStats
+from .serializers import dumps_issue, loads_issue
+from .workers import BLOCK, DEFAULT_QUEUE_SIZE, DEFAULT_WORKERS, POLICIES, \
+    DeliveryQueue, WorkerPool
+
+from collections import OrderedDict
+from threading import Lock
 import logging
 
 
@@ -25,13 +40,132 @@ class NewScanIssueDispatcher(Component):
 
     dispatchers = ExtensionPoint(INewScanIssueHandler)
 
+    collectStats = BoolOption('dispatch', 'stats', False,
+        '''Keep call counts, errors and latencies of every handler,
+        shown by `burp.stats` in the console. Calls are counted without
+        locking and only one in `stats_sample` is timed, but it is still
+        off by default, as it adds to the cost of dispatching.''')
+
+    asyncDelivery = BoolOption('issues', 'async', False,
+        '''Hand new scan issues to the `INewScanIssueHandler`'s from a
+        queue, on their own threads, rather than on Burp Scanner's
+        thread. Read when the first issue is queued.''')
+
+    workers = IntOption('issues', 'workers', 1,
+        '''Number of threads delivering queued scan issues. With more
+        than one, issues may be handled out of order.''')
+
+    queueSize = IntOption('issues', 'queue_size', DEFAULT_QUEUE_SIZE,
+        '''Maximum number of scan issues held in memory, waiting to be
+        delivered.''')
+
+    policy = Option('issues', 'policy', BLOCK,
+        '''What to do with a new scan issue once the queue is full.
+        `block` makes Burp Scanner wait for room, `drop-oldest` drops
+        the oldest queued issue, and `spill` writes the issue to a
+        temporary file until the issues before it are delivered.''')
+
+    spillDirectory = Option('issues', 'spill_directory', '',
+        '''Directory the spill file is created in, defaults to the
+        system temporary directory.''')
+
+    flushTimeout = IntOption('issues', 'flush_timeout', 30,
+        '''Seconds to wait, when the extension is unloaded, for queued
+        scan issues to be delivered.''')
+
+    def __init__(self):
+        self._queue = None
+        self._closed = False
+        self._lock = Lock()
+
+    @property
+    def queue(self):
+        '''
+        The :class:`~gds.burp.workers.DeliveryQueue` scan issues are
+        delivered from, started on first use.
+        '''
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    policy = self.policy
+
+                    if policy not in POLICIES:
+                        self.log.error('Unknown scan issue policy %r, using '
+                                       '%r', policy, BLOCK)
+                        policy = BLOCK
+
+                    self._queue = DeliveryQueue(
+                        self._deliver, self.workers, self.queueSize, policy,
+                        self.spillDirectory, dumps_issue,
+                        lambda data: loads_issue(data, self.burp),
+                        'scan-issues', self.log)
+
+        return self._queue
+
+    def shutdown(self):
+        '''
+        Delivers the scan issues still queued, waiting for up to
+        `flush_timeout` seconds, then stops the delivery threads.
+        '''
+        with self._lock:
+            queue, self._queue = self._queue, None
+            self._closed = True
+
+        if queue is None:
+            return
+
+        left = queue.shutdown(self.flushTimeout)
+
+        if left:
+            self.log.error('%d scan issues were not delivered within %ds',
+                           left, self.flushTimeout)
+
     def newScanIssue(self, issue):
+        if self.asyncDelivery and not self._closed:
+            try:
+                self.queue.put(issue)
+                return
+            except Exception:
+                # shut down while unloading, or the issue could not be
+                # spilled, deliver it here instead
+                if not self._closed:
+                    self.log.exception('Could not queue new scan issue, '
+                                       'delivering it on the scanner thread')
+
+        self._deliver(issue)
+
+    def _deliver(self, issue):
+        collectStats = self.collectStats
+
         for dispatch in self.dispatchers:
             if self.log.isEnabledFor(logging.DEBUG):
                 self.log.debug('Dispatching new scan issue details via %s',
                                dispatch.__class__.__name__)
 
-            dispatch.newScanIssue(issue)
+            if not collectStats:
+                dispatch.newScanIssue(issue)
+                continue
+
+            stats = DispatchStats(self.compmgr).get('NewScanIssue', dispatch)
+
+            if not stats.begin():
+                try:
+                    dispatch.newScanIssue(issue)
+                except Exception:
+                    stats.end(None, True)
+                    raise
+
+                continue
+
+            start = clock()
+
+            try:
+                dispatch.newScanIssue(issue)
+            except Exception:
+                stats.end(clock() - start, True)
+                raise
+
+            stats.end(clock() - start)
 
         return
 
@@ -66,6 +200,20 @@ class PluginDispatcher(Component):
          handle processing of HTTP responses directly after Burp Intruder
          receives if off the wire.''')
 
+    intruderRequestBatch = OrderedExtensionsOption('handlers',
+        'intruder.request.batch', IIntruderRequestBatchHandler, None, False,
+         '''List of components implementing the
+         `IIntruderRequestBatchHandler`, in the order in which they will
+         be applied. These components observe, in batches, the HTTP
+         requests Burp Intruder sends on the wire.''')
+
+    intruderResponseBatch = OrderedExtensionsOption('handlers',
+        'intruder.response.batch', IIntruderResponseBatchHandler, None, False,
+         '''List of components implementing the
+         `IIntruderResponseBatchHandler`, in the order in which they will
+         be applied. These components observe, in batches, the HTTP
+         responses Burp Intruder receives off the wire.''')
+
     proxyRequest = OrderedExtensionsOption('handlers', 'proxy.request',
          IProxyRequestHandler, None, False,
          '''List of components implementing the `IProxyRequestHandler`,
@@ -108,6 +256,20 @@ class PluginDispatcher(Component):
          handle processing of HTTP responses directly after Burp Scanner
          receives if off the wire.''')
 
+    scannerRequestBatch = OrderedExtensionsOption('handlers',
+        'scanner.request.batch', IScannerRequestBatchHandler, None, False,
+         '''List of components implementing the
+         `IScannerRequestBatchHandler`, in the order in which they will
+         be applied. These components observe, in batches, the HTTP
+         requests Burp Scanner sends on the wire.''')
+
+    scannerResponseBatch = OrderedExtensionsOption('handlers',
+        'scanner.response.batch', IScannerResponseBatchHandler, None, False,
+         '''List of components implementing the
+         `IScannerResponseBatchHandler`, in the order in which they will
+         be applied. These components observe, in batches, the HTTP
+         responses Burp Scanner receives off the wire.''')
+
     sequencerRequest = OrderedExtensionsOption('handlers', 'sequencer.request',
          ISequencerRequestHandler, None, False,
          '''List of components implementing the `ISequencerRequestHandler`,
@@ -136,6 +298,20 @@ class PluginDispatcher(Component):
          handle processing of HTTP responses directly after Burp Spider
          receives if off the wire.''')
 
+    spiderRequestBatch = OrderedExtensionsOption('handlers',
+        'spider.request.batch', ISpiderRequestBatchHandler, None, False,
+         '''List of components implementing the
+         `ISpiderRequestBatchHandler`, in the order in which they will
+         be applied. These components observe, in batches, the HTTP
+         requests Burp Spider sends on the wire.''')
+
+    spiderResponseBatch = OrderedExtensionsOption('handlers',
+        'spider.response.batch', ISpiderResponseBatchHandler, None, False,
+         '''List of components implementing the
+         `ISpiderResponseBatchHandler`, in the order in which they will
+         be applied. These components observe, in batches, the HTTP
+         responses Burp Spider receives off the wire.''')
+
     targetRequest = OrderedExtensionsOption('handlers', 'target.request',
          ITargetRequestHandler, None, False,
          '''List of components implementing the `ITargetRequestHandler`,
@@ -150,30 +326,501 @@ class PluginDispatcher(Component):
          handle processing of HTTP responses directly after Burp Target
          receives if off the wire.''')
 
-    def processHttpMessage(self, toolName, messageIsRequest, messageInfo):
-        handlers = ''.join([toolName.lower(),
-                            'Request' if messageIsRequest else 'Response'])
+    workers = IntOption('dispatch', 'workers', DEFAULT_WORKERS,
+        '''Number of threads that run handlers implementing
+        `IObserveOnlyHandler`. Read once, when the first observe-only
+        handler is called.''')
+
+    queueSize = IntOption('dispatch', 'queue_size', DEFAULT_QUEUE_SIZE,
+        '''Maximum number of messages waiting for an observe-only
+        handler. Past this, handlers run on the Burp thread that
+        delivered the message until the workers catch up.''')
+
+    batchSize = IntOption('dispatch', 'batch_size', DEFAULT_BATCH_SIZE,
+        '''Maximum number of messages handed to a batch handler at
+        once, unless it sets a `batch_size` of its own.''')
+
+    batchWindow = IntOption('dispatch', 'batch_window', DEFAULT_BATCH_WINDOW,
+        '''Maximum time, in milliseconds, a message waits for its batch
+        to be handed to a batch handler, unless it sets a `batch_window`
+        of its own.''')
+
+    flushTimeout = IntOption('dispatch', 'flush_timeout', 30,
+        '''Seconds to wait, when the extension is unloaded, for the
+        messages queued for observe-only handlers to be handled.''')
+
+    collectStats = NewScanIssueDispatcher.collectStats
+
+    exchangeCacheSize = IntOption('dispatch', 'exchange_cache_size', 256,
+        '''Maximum number of requests kept, once their request handlers
+        have run, to be reused by the response handlers when the
+        response arrives. 0 disables reuse.''')
+
+    defaultBudget = IntOption('budgets', 'default', 0,
+        '''Time budget, in milliseconds, of a single call to a handler
+        that has no budget of its own. Budgets of individual handlers
+        are set with `budget.` and the class name as the option name,
+        i.e., `budget.LogResponsePlugin = 50`, or as a `budget` class
+        attribute of the component. 0 means no budget.''')
+
+    budgetThreshold = IntOption('budgets', 'threshold', 5,
+        '''Number of calls over budget, out of the last `window` calls
+        to a handler, that trips its circuit breaker.''')
+
+    budgetWindow = IntOption('budgets', 'window', 20,
+        '''Number of recent calls to a handler kept to decide whether
+        to trip its circuit breaker.''')
+
+    budgetCooldown = IntOption('budgets', 'cooldown', 60,
+        '''Seconds after a circuit breaker trips before its handler
+        is called again.''')
+
+    budgetMode = Option('budgets', 'mode', SKIP,
+        '''What to do with a handler whose circuit breaker tripped.
+        `skip` passes over it until the cool-down has passed, `disable`
+        also disables the component, and enables it again afterwards.''')
+
+    def __init__(self):
+        self._table = (None, {})
+        self._fastPathCount = AtomicLong()
+        self._pool = None
+        self._closed = False
+        self._lock = Lock()
+        self._breakers = {}
+        self._disabled = {}
+        self._exchanges = OrderedDict()
+        self._exchangeLock = Lock()
+        self._batchers = {}
+        self._batchEntries = {}
+
+    @property
+    def breakers(self):
+        '''
+        A dictionary of handler classes to their
+        :class:`~gds.burp.budgets.CircuitBreaker`, for the handlers that
+        have a time budget.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return dict(self._breakers)
+
+    @property
+    def fastPathCount(self):
+        '''
+        Number of messages that were passed over without being parsed,
+        because no handlers are configured for their tool and direction,
+        or none of the handlers' predicates match them.
+        '''
+        return self._fastPathCount.get()
+
+    @property
+    def pool(self):
+        '''
+        The :class:`~gds.burp.workers.WorkerPool` that observe-only
+        handlers run on, started on first use, or None once the
+        dispatcher is shut down.
+        '''
+        if self._pool is None and not self._closed:
+            with self._lock:
+                if self._pool is None and not self._closed:
+                    self._pool = WorkerPool(self.workers, self.queueSize,
+                                            'observe-only', self.log)
+
+        return self._pool
+
+    @property
+    def batchers(self):
+        '''
+        A dictionary of `(toolName, method, handler class)` tuples to
+        the :class:`~gds.burp.batches.Batcher` collecting messages for
+        that batch handler.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return dict(self._batchers)
+
+    def shutdown(self, wait=True, timeout=None):
+        '''
+        Hands the pending batches over, then stops the observe-only
+        worker pool after the messages already queued have been
+        handled. Observe-only handlers called afterwards, while
+        unloading, run on the calling thread.
+
+        :param wait: If true, block until the workers have stopped.
+        :param timeout: Maximum number of seconds to wait for them,
+        defaults to `flush_timeout`.
+        '''
+        with self._lock:
+            batchers, self._batchers = self._batchers, {}
+            self._closed = True
+
+        for batcher in batchers.values():
+            batcher.close()
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is None:
+            return
+
+        if timeout is None:
+            timeout = self.flushTimeout
+
+        busy = pool.shutdown(wait, timeout)
+
+        if busy:
+            self.log.error('%d observe-only workers were still busy after '
+                           '%ds', busy, timeout)
+
+    def _generation(self):
+        return (self.config._generation, ComponentMeta._generation,
+                self.compmgr._generation)
+
+    def getHandlers(self, toolName, messageIsRequest):
+        '''
+        Returns three lists of `(handler, method, breaker, stats)` tuples,
+        the components configured for the given tool and direction along
+        with their bound `processRequest` or `processResponse` method,
+        their circuit breaker if they have a time budget, and their
+        :class:`~gds.burp.stats.HandlerStats` if stats are kept. The first
+        list holds the handlers that run inline, the second the ones
+        implementing :class:`~gds.burp.api.IObserveOnlyHandler`, and the
+        third the batch handlers, with their `processRequests` or
+        `processResponses` method. The fourth item returned is a
+        :class:`~gds.burp.predicates.Matcher` for the traffic predicates
+        of the handlers, or None if none of them declare any.
+
+        The lists are compiled on first use and reused until the
+        configuration is reloaded, or a component is registered or
+        disabled.
+        '''
+        generation, table = self._table
+        current = self._generation()
+
+        if generation != current:
+            table = {}
+            self._table = (current, table)
+
+        handlers = table.get((toolName, messageIsRequest))
+
+        if handlers is None:
+            handlers = table[(toolName, messageIsRequest)] = \
+                self._compileHandlers(toolName, messageIsRequest)
+
+        return handlers
+
+    def _compileHandlers(self, toolName, messageIsRequest):
+        option = ''.join([toolName.lower(),
+                          'Request' if messageIsRequest else 'Response'])
 
         method = ''.join(['process',
                           'Request' if messageIsRequest else 'Response'])
 
-        try:
-            request = HttpRequest(messageInfo, _burp=self.burp)
-        except Exception:
-            self.log.exception('Could not parse object: %r', messageInfo)
+        if not isinstance(getattr(PluginDispatcher, option, None),
+                          OrderedExtensionsOption):
+            return [], [], [], None
+
+        observeOnly = ComponentMeta._registry.get(IObserveOnlyHandler, ())
+        handlers, observers, batched = [], [], []
+
+        for entry in self._compileEntries(toolName, option, method):
+            if entry[0].__class__ in observeOnly:
+                observers.append(entry)
+            else:
+                handlers.append(entry)
+
+        if isinstance(getattr(PluginDispatcher, option + 'Batch', None),
+                      OrderedExtensionsOption):
+            batched = self._compileEntries(toolName, option + 'Batch',
+                                           method + 's')
+
+        components = [entry[0] for entry in handlers + observers + batched]
+        matcher = None
+
+        if any(declares_predicates(handler) for handler in components):
+            matcher = Matcher(components)
+
+        self.log.debug('Compiled handlers for %s: %r, observe-only: %r, '
+                       'batched: %r, matcher: %r', option, handlers,
+                       observers, batched, matcher)
+        return handlers, observers, batched, matcher
+
+    def _compileEntries(self, toolName, option, method):
+        stats = DispatchStats(self.compmgr) if self.collectStats else None
+        entries = []
+
+        for handler in getattr(self, option):
+            try:
+                process = getattr(handler, method)
+            except AttributeError:
+                self.log.error('%s does not implement %s, not dispatching '
+                               'to it via %s', handler.__class__.__name__,
+                               method, toolName)
+                continue
+
+            if declares_predicates(handler):
+                try:
+                    Matcher([handler])
+                except Exception:
+                    self.log.exception('Invalid predicates on %s, not '
+                                       'dispatching to it via %s',
+                                       handler.__class__.__name__, toolName)
+                    continue
+
+            entries.append((handler, process, self._getBreaker(handler),
+                            stats.get(toolName, handler) if stats is not None
+                            else None))
+
+        return entries
+
+    def _getBreaker(self, handler):
+        cls = handler.__class__
+        budget = self.config['budgets'].getint(
+            'budget.' + cls.__name__,
+            getattr(handler, 'budget', None) or self.defaultBudget)
+
+        if budget <= 0:
+            self._breakers.pop(cls, None)
             return
 
-        for handler in getattr(self, handlers):
-            if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('Dispatching handler via %s: %s.%s(%r)',
-                               toolName, handler.__class__.__name__,
-                               method, request)
+        settings = (budget, self.budgetThreshold, self.budgetWindow,
+                    self.budgetCooldown)
+
+        breaker = self._breakers.get(cls)
+
+        # keep the history of a breaker unless its settings changed
+        if breaker is None or breaker.settings != settings:
+            breaker = self._breakers[cls] = CircuitBreaker(*settings)
 
+        return breaker
+
+    def processHttpMessage(self, toolName, messageIsRequest, messageInfo):
+        if self._disabled:
+            self._enableCooledDown()
+
+        handlers, observers, batched, matcher = self.getHandlers(
+            toolName, messageIsRequest)
+
+        if matcher is not None and (handlers or observers or batched):
+            handlers, observers, batched = matcher.select(
+                messageInfo, messageIsRequest, handlers, observers, batched)
+
+        if not handlers and not observers and not batched:
+            self._fastPathCount.incrementAndGet()
+            return
+
+        method = 'processRequest' if messageIsRequest else 'processResponse'
+
+        if handlers:
+            request = None
+
+            if not messageIsRequest:
+                request = self._recallExchange(messageInfo)
+
+            if request is None:
+                try:
+                    request = HttpRequest(messageInfo, _burp=self.burp,
+                                          deferred=True)
+                except Exception:
+                    self.log.exception('Could not parse object: %r',
+                                       messageInfo)
+                    return
+
+            for entry in handlers:
+                self._dispatch(toolName, method, entry, request)
+
+            # handlers share one parsed message, and their edits are
+            # written back to Burp once, after the last of them
             try:
-                getattr(handler, method)(request)
+                request.commit()
             except Exception:
-                self.log.exception('Error calling handler via %s: %s.%s(%r)',
-                                   toolName, handler.__class__.__name__,
-                                   method, request)
+                self.log.exception('Could not write back changes via %s: '
+                                   '%r', toolName, request)
+
+            if messageIsRequest and self.getHandlers(toolName, False)[0]:
+                self._rememberExchange(messageInfo, request)
+
+        if observers or batched:
+            # observers see the message as the inline handlers left it
+            try:
+                detached = HttpRequestResponse.copy(messageInfo)
+            except Exception:
+                self.log.exception('Could not copy object: %r', messageInfo)
+                return
+
+            # observers and batch handlers run concurrently, each gets
+            # its own copy to parse and edit
+            for entry in observers:
+                self._submit(toolName, method, entry,
+                             self._snapshot(detached))
+
+            for entry in batched:
+                snapshot = self._snapshot(detached)
+                batcher = self._getBatcher(toolName, method + 's', entry)
+
+                if batcher is None:
+                    # shut down while unloading
+                    self._dispatch(toolName, method + 's', entry, [snapshot])
+                else:
+                    batcher.add(snapshot)
 
         return
+
+    def _getBatcher(self, toolName, method, entry):
+        handler = entry[0]
+        key = (toolName, method, handler.__class__)
+
+        # the entry is compiled again when the configuration changes,
+        # batches go to the latest one
+        self._batchEntries[key] = entry
+        batcher = self._batchers.get(key)
+
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(key)
+
+                if batcher is None and not self._closed:
+                    batcher = self._batchers[key] = Batcher(
+                        lambda batch: self._submitBatch(key, batch),
+                        getattr(handler, 'batch_size', None) or
+                        self.batchSize,
+                        getattr(handler, 'batch_window', None) or
+                        self.batchWindow,
+                        '%s-%s-batcher' % (toolName.lower(),
+                                           handler.__class__.__name__),
+                        self.log)
+
+        return batcher
+
+    def _submitBatch(self, key, batch):
+        toolName, method, _ = key
+        self._submit(toolName, method, self._batchEntries[key], batch)
+
+    def _submit(self, toolName, method, entry, request):
+        pool = self.pool
+
+        if pool is None:
+            # shut down while unloading
+            self._dispatch(toolName, method, entry, request)
+        else:
+            pool.submit(self._dispatch, toolName, method, entry, request)
+
+    def _snapshot(self, detached):
+        # detached copies share their strings, so this is cheap
+        return HttpRequest(HttpRequestResponse.copy(detached),
+                           _burp=self.burp)
+
+    def _rememberExchange(self, messageInfo, request):
+        size = self.exchangeCacheSize
+
+        if size <= 0:
+            return
+
+        key = System.identityHashCode(messageInfo)
+
+        with self._exchangeLock:
+            self._exchanges.pop(key, None)
+            self._exchanges[key] = (messageInfo, request)
+
+            while len(self._exchanges) > size:
+                # the oldest exchanges never got a response
+                self._exchanges.popitem(last=False)
+
+    def _recallExchange(self, messageInfo):
+        key = System.identityHashCode(messageInfo)
+
+        with self._exchangeLock:
+            entry = self._exchanges.get(key)
+
+            # hash codes are not unique, make sure it is the same message
+            if entry is None or not (entry[0] is messageInfo or
+                                     entry[0] == messageInfo):
+                return
+
+            del self._exchanges[key]
+
+        request = entry[1]
+        request.refresh()
+        return request
+
+    def _dispatch(self, toolName, method, entry, request):
+        handler, process, breaker, stats = entry
+
+        if breaker is not None:
+            if not breaker.allow():
+                return
+
+            start = breaker.begin()
+
+            if start is None:
+                # tripped by the calls still running over budget
+                self._trip(handler, breaker)
+                return
+
+        # only a sample of the calls are timed for the stats
+        timed = stats is not None and stats.begin()
+
+        if timed and breaker is None:
+            start = clock()
+
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Dispatching handler via %s: %s.%s(%r)',
+                           toolName, handler.__class__.__name__,
+                           method, request)
+
+        error = False
+
+        try:
+            process(request)
+        except Exception:
+            error = True
+            self.log.exception('Error calling handler via %s: %s.%s(%r)',
+                               toolName, handler.__class__.__name__,
+                               method, request)
+        finally:
+            if breaker is not None:
+                breaker.end(start)
+
+        if breaker is None and not timed:
+            if error and stats is not None:
+                stats.end(None, error)
+            return
+
+        elapsed = clock() - start
+
+        if stats is not None:
+            stats.end(elapsed if timed else None, error)
+
+        if breaker is not None and breaker.record(elapsed):
+            self._trip(handler, breaker)
+
+    def _trip(self, handler, breaker):
+        mode = self.budgetMode
+
+        if mode not in MODES:
+            self.log.warn('Unknown budget mode %r, using %r', mode, SKIP)
+            mode = SKIP
+
+        message = ('%s went over its %dms budget %d times in its last %d '
+                   'calls, or is stuck in them, %s it for %ds' % (
+                   handler.__class__.__name__, breaker.budget,
+                   breaker.threshold, breaker.window,
+                   'disabling' if mode == DISABLE else 'skipping',
+                   breaker.cooldown))
+
+        self.log.warn(message)
+
+        if mode == DISABLE:
+            self._disabled[handler.__class__] = (handler, breaker)
+            self.compmgr.disableComponent(handler)
+
+        try:
+            self.burp.issueAlert(message)
+        except Exception:
+            self.log.exception('Could not issue alert: %s', message)
+
+    def _enableCooledDown(self):
+        for cls, (handler, breaker) in self._disabled.items():
+            if breaker.allow() and self._disabled.pop(cls, None):
+                self.log.info('Enabling %s again', cls.__name__)
+                self.compmgr.enableComponent(handler)
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.export
+~~~~~~~~~~~~~~~
+
+This module exports HTTP messages to HAR, or to JSON Lines holding one
+HAR entry per line, optionally gzip compressed.
+
+Messages are written one at a time, as they are read, so memory use
+does not grow with the number of messages exported. A `progress`
+callback is called every so often with the position reached, which is
+also returned, so an export that was interrupted can be resumed from
+it::
+
+    >>> burp.exportProxyHistory('history.jsonl.gz', 'jsonl')
+    >>> burp.exportProxyHistory('history.jsonl.gz', 'jsonl', start=150000)
+
+JSON Lines exports are resumed by appending to the same file. HAR is a
+single JSON document, so resuming a HAR export writes a new document
+holding the remaining messages, next to the first one, i.e.,
+`history.part150000.har`.
+
+Messages that cannot be parsed are logged and skipped, so they do not
+stop the export.
+'''
+from base64 import b64encode
+from datetime import datetime
+from urlparse import parse_qsl
+import gzip
+import json
+import logging
+import os
+
+from .models import HttpRequest
+
+HAR = 'har'
+JSONL = 'jsonl'
+FORMATS = (HAR, JSONL)
+
+HAR_VERSION = '1.2'
+CREATOR = {'name': 'gds.burp', 'version': '1.0'}
+
+# how often, in messages, progress is reported
+PROGRESS_EVERY = 1000
+
+_SEPARATORS = (',', ':')
+
+
+def har_entry(request, started=None):
+    '''
+    Returns a HAR entry, as a dictionary, for an :class:`HttpRequest`.
+    Bodies are decoded, and base64 encoded if they are not UTF-8 text.
+
+    :param started: The `startedDateTime` of the entry, an ISO 8601
+    string. Burp does not keep the time messages were sent at, so this
+    defaults to the current time.
+    '''
+    entry = {
+        'startedDateTime': started or _now(),
+        'time': 0,
+        'request': _har_request(request),
+        'response': _har_response(request.response),
+        'cache': {},
+        'timings': {'send': 0, 'wait': 0, 'receive': 0},
+    }
+
+    comment = request.comment
+
+    if comment:
+        entry['comment'] = comment
+
+    return entry
+
+
+def dump_har(requests, fp, start=0, total=None, progress=None, _burp=None,
+             log=None):
+    '''
+    Writes an iterable of requests (:class:`HttpRequest`'s or
+    IHttpRequestResponse's) to the file object `fp` as a HAR document.
+    Returns the position reached, `start` plus the number of requests
+    read, including those skipped. The document is closed even if
+    writing it fails partway.
+
+    :param start: Position of the first request, for progress reports.
+    :param total: Total number of requests, for progress reports.
+    :param progress: Called with the position reached and `total`,
+    every :data:`PROGRESS_EVERY` requests and once done.
+    :param log: Logger that requests which cannot be exported are
+    reported to.
+    '''
+    started = _now()
+    fp.write('{"log":{"version":%s,"creator":%s,"entries":[' % (
+             json.dumps(HAR_VERSION), json.dumps(CREATOR)))
+
+    position = start
+    first = True
+
+    try:
+        for position, line in _entries(requests, start, total, progress,
+                                       started, _burp, log):
+            if line is None:
+                continue
+
+            if not first:
+                fp.write(',')
+
+            first = False
+            fp.write('\n')
+            fp.write(line)
+    finally:
+        fp.write('\n]}}\n')
+
+    return position
+
+
+def dump_jsonl(requests, fp, start=0, total=None, progress=None,
+               _burp=None, log=None):
+    '''
+    Writes an iterable of requests to the file object `fp` as JSON
+    Lines, one HAR entry per line. See :func:`dump_har`.
+    '''
+    started = _now()
+    position = start
+
+    for position, line in _entries(requests, start, total, progress,
+                                   started, _burp, log):
+        if line is not None:
+            fp.write(line)
+            fp.write('\n')
+
+    return position
+
+
+def export(requests, filename, format=HAR, start=0, total=None,
+           progress=None, compress=None, _burp=None, log=None):
+    '''
+    Writes an iterable of requests to `filename`, in `format`, one of
+    :data:`FORMATS`. Returns the position reached, see :func:`dump_har`.
+
+    :param start: Position of the first request. A JSON Lines export
+    with a `start` is appended to `filename`, to resume an earlier one.
+    A HAR export with a `start` never overwrites an existing
+    `filename`, it is written to :func:`part_filename` instead.
+    :param compress: Gzip compress the file, by default if `filename`
+    ends with `.gz`.
+    '''
+    if format not in FORMATS:
+        raise ValueError('Unknown format %r, expected one of: %s' % (
+                         format, ', '.join(FORMATS)))
+
+    log = log or logging.getLogger(__name__)
+
+    if compress is None:
+        compress = filename.endswith('.gz')
+
+    if format == HAR and start and os.path.exists(filename):
+        filename = part_filename(filename, start)
+
+        if os.path.exists(filename):
+            raise ValueError('%s already exists' % (filename, ))
+
+        log.info('Writing the items from %d on to %s', start, filename)
+
+    mode = 'ab' if format == JSONL and start else 'wb'
+    fp = gzip.open(filename, mode) if compress else open(filename, mode)
+
+    try:
+        dump = dump_har if format == HAR else dump_jsonl
+        return dump(requests, fp, start, total, progress, _burp, log)
+    finally:
+        fp.close()
+
+
+def part_filename(filename, start):
+    '''
+    Returns the name of the file holding the items from `start` on of a
+    resumed HAR export to `filename`, i.e., `history.part150000.har` for
+    `history.har`.
+    '''
+    base, ext = os.path.splitext(filename)
+
+    if ext == '.gz':
+        base, inner = os.path.splitext(base)
+        ext = inner + ext
+
+    return '%s.part%d%s' % (base, start, ext)
+
+
+def _entries(requests, start, total, progress, started, _burp, log):
+    log = log or logging.getLogger(__name__)
+    position = start
+
+    for request in requests:
+        position += 1
+
+        try:
+            if not isinstance(request, HttpRequest):
+                request = HttpRequest(request, _burp=_burp)
+
+            line = json.dumps(har_entry(request, started),
+                              separators=_SEPARATORS)
+        except Exception:
+            # resuming would only fail on it again, skip it
+            log.exception('Skipped item %d, which could not be exported',
+                          position - 1)
+            line = None
+
+        yield position, line
+
+        if progress is not None and position % PROGRESS_EVERY == 0:
+            progress(position, total)
+
+    if progress is not None:
+        progress(position, total)
+
+
+def _har_request(request):
+    headers = request.headers
+    body = request.body
+
+    har = {
+        'method': request.method,
+        'url': request.url.geturl(),
+        'httpVersion': request.version,
+        'cookies': _cookies(headers.getlist('cookie'), ';'),
+        'headers': _headers(headers),
+        'queryString': [{'name': _text(name), 'value': _text(value)}
+                        for name, value in
+                        parse_qsl(request.url.query, True)],
+        'headersSize': -1,
+        'bodySize': len(body or ''),
+    }
+
+    if body:
+        har['postData'] = {
+            'mimeType': _text(headers.get('content-type', '')),
+            'text': _text(body),
+        }
+
+    return har
+
+
+def _har_response(response):
+    if not response:
+        return {
+            'status': 0, 'statusText': '', 'httpVersion': '',
+            'cookies': [], 'headers': [],
+            'content': {'size': 0, 'mimeType': ''},
+            'redirectURL': '', 'headersSize': -1, 'bodySize': -1,
+        }
+
+    headers = response.headers
+    body = response.body or ''
+
+    try:
+        decoded = response.decoded_body
+    except ValueError:
+        # not decodable, or too large to be
+        decoded = body
+
+    content = {
+        'size': len(decoded),
+        'mimeType': _text(headers.get('content-type', '')),
+    }
+
+    if decoded:
+        try:
+            content['text'] = decoded.decode('utf-8')
+        except UnicodeDecodeError:
+            content['text'] = b64encode(decoded)
+            content['encoding'] = 'base64'
+
+    return {
+        'status': response.status_code,
+        'statusText': _text(response.reason),
+        'httpVersion': response.version,
+        'cookies': [cookie for value in headers.getlist('set-cookie')
+                    for cookie in _cookies([value.split(';', 1)[0]], ';')],
+        'headers': _headers(headers),
+        'content': content,
+        'redirectURL': _text(headers.get('location', '')),
+        'headersSize': -1,
+        'bodySize': len(body),
+    }
+
+
+def _headers(headers):
+    return [{'name': _text(name), 'value': _text(value)}
+            for name, value in headers.iterfields()]
+
+
+def _cookies(values, sep):
+    cookies = []
+
+    for value in values:
+        for pair in value.split(sep):
+            name, _, value = pair.strip().partition('=')
+
+            if name:
+                cookies.append({'name': _text(name), 'value': _text(value)})
+
+    return cookies
+
+
+def _text(value):
+    if isinstance(value, unicode):
+        return value
+
+    return (value or '').decode('utf-8', 'replace')
+
+
+def _now():
+    return datetime.utcnow().isoformat()[:23] + 'Z'
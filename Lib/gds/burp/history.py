@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.history
+~~~~~~~~~~~~~~~~
+
+This module contains a columnar index of the proxy history, so that
+console queries do not have to parse every item to find a few.
+
+The index holds the host, path, method, status code, MIME type and
+length of every item. It is built on first use, and afterwards each
+query fetches the history from Burp and only indexes the items added
+since the last one. The index is rebuilt when the history shrinks, or
+when its first or last indexed item is no longer where it was, i.e.,
+after items were deleted from the UI or another project was loaded.
+
+From the console::
+
+    >>> burp.history.where(host='*.example.com', status=(500, 599))
+    >>> burp.history.where(method='POST', path=r'^/api/', mime='*json')
+
+Only the items returned are wrapped in an :class:`HttpRequest`, and
+these are parsed lazily as usual.
+
+The same goes for indexing and slicing the history, and for the
+:class:`HistoryCursor`'s returned by :meth:`ProxyHistory.since`, which
+pick up where they left off::
+
+    >>> burp.history[-10:]
+    >>> new = burp.history.since(-1)
+    >>> list(new)  # only the items added since the last call
+'''
+from array import array
+from threading import Lock
+
+from .core import Component
+from .models import HttpRequest
+from .predicates import _Facts, _compile
+
+# query keywords, cheapest first, along with the column they are
+# answered from and the predicate their values are compiled as (see
+# gds.burp.predicates)
+QUERIES = (
+    ('status', 'status', 'match_status'),
+    ('method', 'methods', 'match_methods'),
+    ('host', 'hosts', 'match_hosts'),
+    ('mime', 'mimes', 'match_content_types'),
+    ('length', 'lengths', 'match_status'),  # inclusive ranges, like status
+    ('path', 'paths', 'match_paths'),
+)
+
+_NAMES = frozenset(name for name, _, _ in QUERIES)
+
+
+class _Interned(object):
+    '''
+    A column of strings with few distinct values, held as integer ids
+    into a table of the values, so that a predicate is tested once per
+    distinct value rather than once per item.
+    '''
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+        self.column = array('i')
+
+    def append(self, value):
+        idx = self.ids.get(value)
+
+        if idx is None:
+            idx = self.ids[value] = len(self.values)
+            self.values.append(value)
+
+        self.column.append(idx)
+
+    def matching(self, test):
+        return frozenset(idx for idx, value in enumerate(self.values)
+                         if test(value))
+
+
+class HistoryIndex(Component):
+    '''An index of the proxy history, item `n` of the index being item
+    `n` of the array returned by Burp's `getProxyHistory()`.
+
+    Burp only ever appends to the proxy history, save for items deleted
+    from the UI and projects loaded over it, which :meth:`refresh`
+    detects by comparing the first and last indexed items to the ones
+    now at their positions.
+    '''
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __repr__(self):
+        return '<HistoryIndex %d items, %d hosts>' % (
+            len(self), len(self.hosts.values))
+
+    def reset(self):
+        '''
+        Drops everything indexed so far.
+        '''
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.hosts = _Interned()
+        self.methods = _Interned()
+        self.mimes = _Interned()
+        self.status = _Interned()
+        self.paths = []
+        self.lengths = array('i')
+        self._items = ()
+
+    def refresh(self):
+        '''
+        Indexes the items added to the proxy history since the last call,
+        rebuilding the index if items were deleted or another project was
+        loaded. Returns the number of items indexed.
+        '''
+        with self._lock:
+            items = self.burp._check_and_callback(self.burp.getProxyHistory)
+
+            if len(items) < len(self):
+                self.log.debug('Proxy history shrank from %d to %d items, '
+                               'rebuilding its index', len(self),
+                               len(items))
+                self._clear()
+            elif len(self) and not (self._same(items, 0) and
+                                    self._same(items, len(self) - 1)):
+                self.log.debug('Proxy history changed under its index, '
+                               'rebuilding it')
+                self._clear()
+
+            start = len(self)
+
+            for idx in xrange(start, len(items)):
+                self._index(items[idx])
+
+            self._items = items
+
+        return len(items) - start
+
+    def _same(self, items, row):
+        # Burp may hand out new wrappers on every call, so an item that
+        # is not the same object is compared by what was indexed of it
+        if items[row] is self._items[row]:
+            return True
+
+        return self._facts(items[row], row) == self._row(row)
+
+    def _facts(self, item, row):
+        try:
+            facts = _Facts(item, False)
+            host = facts.match_hosts()
+            method = facts.match_methods()
+            path = facts.match_paths()
+            length = facts.max_size()
+            status = facts.match_status() if length else 0
+            mime = facts.match_content_types() if length else ''
+        except Exception:
+            self.log.exception('Could not index proxy history item %d', row)
+            host = method = path = mime = ''
+            status = length = 0
+
+        return host.lower(), method, path, mime, max(status, 0), length
+
+    def _row(self, row):
+        return (self.hosts.values[self.hosts.column[row]],
+                self.methods.values[self.methods.column[row]],
+                self.paths[row],
+                self.mimes.values[self.mimes.column[row]],
+                self.status.values[self.status.column[row]],
+                self.lengths[row])
+
+    def _index(self, item):
+        host, method, path, mime, status, length = \
+            self._facts(item, len(self))
+
+        # the lengths column is appended last, so a concurrent query
+        # never sees a partial row
+        self.hosts.append(host)
+        self.methods.append(method)
+        self.mimes.append(mime)
+        self.status.append(status)
+        self.paths.append(path)
+        self.lengths.append(length)
+
+    def select(self, **predicates):
+        '''
+        Returns the positions, in the proxy history, of the items that
+        match all of `predicates`.
+
+        :param status: A status code, an inclusive `(low, high)` tuple, or
+        a list of them. Items without a response have status 0.
+        :param length: A response length, tuple, or a list of them. This
+        is the length of the whole response, headers included.
+        :param method: A method, or a list of them.
+        :param host: A glob, i.e., `*.example.com`, or a list of them.
+        :param mime: A glob of the response's Content-Type, without its
+        parameters, i.e., `text/*`, or a list of them.
+        :param path: A regular expression searched for in the path, or a
+        list of them.
+        '''
+        for name in predicates:
+            if name not in _NAMES:
+                raise ValueError('Unknown query %r, expected one of: %s' % (
+                                 name, ', '.join(n for n, _, _ in QUERIES)))
+
+        self.refresh()
+        size = len(self)
+        rows = None
+
+        for name, attr, kind in QUERIES:
+            if name not in predicates:
+                continue
+
+            value = predicates[name]
+
+            if isinstance(value, tuple) and kind == 'match_status':
+                value = [value]
+
+            test = _compile(kind, value)
+            column = getattr(self, attr)
+
+            if isinstance(column, _Interned):
+                ids = column.matching(test)
+                column = column.column
+                test = ids.__contains__
+
+            if rows is None:
+                # first predicate, scan the whole column
+                rows = [row for row, cell in enumerate(column[:size])
+                        if test(cell)]
+            else:
+                rows = [row for row in rows if test(column[row])]
+
+            if not rows:
+                break
+
+        return range(size) if rows is None else rows
+
+    def where(self, **predicates):
+        '''
+        Returns a list of :class:`HttpRequest`'s for the items of the
+        proxy history that match all of `predicates`, see :meth:`select`.
+        '''
+        rows = self.select(**predicates)
+        items = self._items
+
+        return [HttpRequest(items[row], _burp=self.burp) for row in rows]
+
+
+class ProxyHistory(object):
+    '''The proxy history, as returned by `burp.history`.
+
+    The history is fetched from Burp on every access, so it is never
+    out of date. Indexing and slicing it only wraps the items asked for
+    in an :class:`HttpRequest`, so `burp.history[-10:]` parses ten items
+    however long the history is, :meth:`since` and iterating over it
+    return a :class:`HistoryCursor`, and :meth:`where` answers queries
+    from the :class:`HistoryIndex`.
+
+    :param burp: The :class:`BurpExtender`.
+    '''
+    def __init__(self, burp):
+        self.burp = burp
+
+    def __repr__(self):
+        return '<ProxyHistory %d items>' % (len(self), )
+
+    def __iter__(self):
+        return HistoryCursor(self)
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __getitem__(self, key):
+        items = self._fetch()
+
+        if isinstance(key, slice):
+            return [HttpRequest(items[idx], _burp=self.burp)
+                    for idx in xrange(*key.indices(len(items)))]
+
+        if key < 0:
+            key += len(items)
+
+        if not 0 <= key < len(items):
+            raise IndexError('history index out of range')
+
+        return HttpRequest(items[key], _burp=self.burp)
+
+    @property
+    def index(self):
+        '''
+        The :class:`HistoryIndex` of the proxy history.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return HistoryIndex(self.burp)
+
+    def since(self, cursor=0):
+        '''
+        Returns a :class:`HistoryCursor` over the items from position
+        `cursor` on.
+
+        :param cursor: A position in the history, negative positions
+        counting from its end, or a :class:`HistoryCursor` to resume
+        from.
+        '''
+        if isinstance(cursor, HistoryCursor):
+            cursor = cursor.position
+
+        return HistoryCursor(self, cursor)
+
+    def where(self, **predicates):
+        '''
+        Returns a list of :class:`HttpRequest`'s for the items that
+        match all of `predicates`, see :meth:`HistoryIndex.select`.
+        '''
+        return self.index.where(**predicates)
+
+    def _fetch(self):
+        return self.burp._check_and_callback(self.burp.getProxyHistory)
+
+
+class HistoryCursor(object):
+    '''An iterator over the proxy history that keeps its `position`, the
+    position of the next item it yields. Once it runs out of items,
+    iterating over it again yields the items added since, so it can be
+    kept around, i.e., in the console, to follow the history.
+
+    :param history: The :class:`ProxyHistory`.
+    :param position: Position of the first item, negative positions
+    counting from the end of the history.
+    '''
+    def __init__(self, history, position=0):
+        self.history = history
+        self.position = position
+        self._items = None
+
+    def __repr__(self):
+        return '<HistoryCursor at %d>' % (self.position, )
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        items = self._items
+
+        if items is None or self.position >= len(items):
+            # look for new items, once per run out
+            items = self._items = self.history._fetch()
+
+            if self.position < 0:
+                self.position = max(self.position + len(items), 0)
+
+            if self.position >= len(items):
+                self._items = None
+                raise StopIteration
+
+        request = HttpRequest(items[self.position], _burp=self.history.burp)
+        self.position += 1
+        return request
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.jsonpath
+~~~~~~~~~~~~~~~~~
+
+This module contains bounded JSON parsing for message bodies, and
+simple path queries over the parsed documents.
+
+Paths are made up of dotted keys and bracketed indexes, with `*`
+matching every key or item. For example::
+
+    >>> get(doc, 'data.items[*].id')
+    [1, 2, 3]
+    >>> get(doc, 'data.items[0]["display.name"]')
+    u'first'
+'''
+import json
+import re
+
+MAX_JSON_SIZE = 8 * 1024 * 1024
+MAX_JSON_DEPTH = 64
+
+_TOKENS = re.compile(r'[\[\]{}"\\]')
+_STEP = re.compile(r'''
+    \[(?P<index>-?\d+|\*)\]             # [0], [-1] or [*]
+    | \[(?P<quote>['"])(?P<key>.*?)(?P=quote)\]    # ["key"]
+    | \.?(?P<name>[^.\[\]]+)            # key or .key
+    ''', re.VERBOSE)
+
+_WILDCARD = object()
+_paths = {}
+_MAX_PATHS = 256
+
+
+def loads(data, charset=None, max_size=None, max_depth=None):
+    '''
+    Parses a JSON document, refusing documents larger than `max_size`
+    bytes or nested deeper than `max_depth` before parsing starts.
+
+    :param data: The JSON document.
+    :param charset: Charset of the document, defaults to UTF-8.
+    :param max_size: Defaults to :data:`MAX_JSON_SIZE`.
+    :param max_depth: Defaults to :data:`MAX_JSON_DEPTH`.
+    '''
+    if max_size is None:
+        max_size = MAX_JSON_SIZE
+
+    if max_depth is None:
+        max_depth = MAX_JSON_DEPTH
+
+    if len(data) > max_size:
+        raise ValueError('JSON document exceeds %d bytes' % (max_size, ))
+
+    _check_depth(data, max_depth)
+
+    if charset and isinstance(data, str):
+        data = data.decode(charset)
+
+    return json.loads(data)
+
+
+def get(doc, path, default=None):
+    '''
+    Returns the value at `path` in a parsed JSON document. If `path`
+    contains a wildcard, a list of every matching value is returned
+    instead.
+
+    :param doc: The parsed JSON document.
+    :param path: The path to look up, i.e., `data.items[*].id`.
+    :param default: Returned when nothing matches a path without
+    wildcards.
+    '''
+    steps = _compile(path)
+    values = [doc]
+
+    for step in steps:
+        matched = []
+
+        for value in values:
+            if step is _WILDCARD:
+                if isinstance(value, dict):
+                    matched.extend(value.itervalues())
+                elif isinstance(value, list):
+                    matched.extend(value)
+
+            elif isinstance(step, (int, long)):
+                if isinstance(value, list) and -len(value) <= step < len(value):
+                    matched.append(value[step])
+
+            elif isinstance(value, dict) and step in value:
+                matched.append(value[step])
+
+        values = matched
+
+    if _WILDCARD in steps:
+        return values
+
+    return values[0] if values else default
+
+
+def _check_depth(data, max_depth):
+    # only brackets, quotes and backslashes are looked at, so this
+    # is proportional to the structure of the document, not its size
+    depth = 0
+    in_string = False
+    escaped = -1
+
+    for match in _TOKENS.finditer(data):
+        token, pos = match.group(), match.start()
+
+        if in_string:
+            if pos == escaped:
+                continue
+            if token == '\\':
+                escaped = pos + 1
+            elif token == '"':
+                in_string = False
+
+        elif token == '"':
+            in_string = True
+
+        elif token in '[{':
+            depth += 1
+            if depth > max_depth:
+                raise ValueError('JSON document nested deeper than %d' % (
+                                 max_depth, ))
+
+        elif token in ']}':
+            depth -= 1
+
+
+def _compile(path):
+    steps = _paths.get(path)
+
+    if steps is None:
+        steps = []
+        pos = 0
+
+        while pos < len(path):
+            match = _STEP.match(path, pos)
+
+            if match is None:
+                raise ValueError('Invalid path %r at offset %d' % (path, pos))
+
+            index, key, name = match.group('index', 'key', 'name')
+
+            if index == '*' or name == '*':
+                steps.append(_WILDCARD)
+            elif index is not None:
+                steps.append(int(index))
+            elif key is not None:
+                steps.append(key)
+            else:
+                steps.append(name)
+
+            pos = match.end()
+
+        if len(_paths) >= _MAX_PATHS:
+            _paths.clear()
+
+        _paths[path] = steps
+
+    return steps
@@ -7,6 +7,7 @@ Listeners that implement new Burp Extender API's.
 '''
 from burp import IExtensionStateListener, IHttpListener, IScannerListener
 
+from .archive import Archive
 from .dispatchers import NewScanIssueDispatcher, PluginDispatcher
 
 import gds.burp.settings as settings
@@ -46,6 +47,12 @@ class SaveConfigurationOnUnload(IExtensionStateListener):
         self.saveExtensionSetting(settings.LOG_FORMAT[0],
                                   self.burp._handler.formatter._fmt)
 
+        # let observe-only handlers and scan issue handlers finish
+        # with what is queued
+        PluginDispatcher(self.burp).shutdown()
+        NewScanIssueDispatcher(self.burp).shutdown()
+        Archive(self.burp).close(30)
+
         self.burp.issueAlert('Burp extender unloaded...')
         self.log.debug('Shutting down Burp')
         return
@@ -54,19 +61,31 @@ class SaveConfigurationOnUnload(IExtensionStateListener):
 class PluginListener(IHttpListener):
     def __init__(self, burp):
         self.burp = burp
+        self.dispatcher = PluginDispatcher(self.burp)
+        self.archive = Archive(self.burp)
+        self.toolNames = {}
         self.burp.registerHttpListener(self)
 
     def processHttpMessage(self, toolFlag, messageIsRequest, messageInfo):
-        toolName = self.burp.getToolName(toolFlag)
+        toolName = self.toolNames.get(toolFlag)
+
+        if toolName is None:
+            toolName = self.toolNames[toolFlag] = \
+                self.burp.getToolName(toolFlag)
 
-        return PluginDispatcher(self.burp).processHttpMessage(
-            toolName, messageIsRequest, messageInfo)
+        self.dispatcher.processHttpMessage(toolName, messageIsRequest,
+                                           messageInfo)
+
+        # archived as the handlers left it
+        self.archive.record(toolName, messageIsRequest, messageInfo)
+        return
 
 
 class ScannerListener(IScannerListener):
     def __init__(self, burp):
         self.burp = burp
+        self.dispatcher = NewScanIssueDispatcher(self.burp)
         self.burp.registerScannerListener(self)
 
     def newScanIssue(self, issue):
-        return NewScanIssueDispatcher(self.burp).newScanIssue(issue)
+        return self.dispatcher.newScanIssue(issue)
@@ -11,17 +11,14 @@ Modified by DAS @ 30/06/2016
 
 '''
 from .base import MenuItem
-from ..models import HttpRequest
+from ..models import wrap_messages
 
 
 class ConsoleMenu(MenuItem):
     CAPTION = 'Assign to local variable `items` in console'
 
     def menuItemClicked(self, menuItemCaption, messageInfo):
-        requests = []
-
-        for message in messageInfo:
-            requests.append(HttpRequest(message, _burp=self._burp))
+        requests = wrap_messages(messageInfo, _burp=self._burp)
 
         self.burp.console.set('items', requests)
 
@@ -8,70 +8,90 @@ Burp's IHttpRequestResponse object's more... Pythonic.
 '''
 from java.net import URL
 try:
-    from burp import IHttpService, IScanIssue
+    from burp import IHttpRequestResponse, IHttpService, IScanIssue
 except ImportError:
+    class IHttpRequestResponse(object):pass
     class IHttpService(object):pass
     class IScanIssue(object):pass
 
+from array import array
 from Cookie import SimpleCookie
-from cStringIO import StringIO
-from cgi import FieldStorage, parse_header, parse_qs
+from cgi import parse_header, parse_qs
 from urlparse import urlparse
 
+from .bodies import split
+from .decoders import DEFAULT_CHUNK_SIZE, iter_decoded
 from .decorators import reify
-from .structures import CaseInsensitiveDict
-
-import json
+from . import jsonpath
+from .multipart import MultipartForm, MultipartParser, StringReader
+from .structures import HeaderDict
 
 CRLF = '\r\n'
 SP = chr(0x20)
 
+# header lines up to this size are shared by parse_messages and
+# wrap_messages
+POOLED_LINE_SIZE = 160
+
 
 class HttpRequest(object):
     '''The :class:`HttpRequest <HttpRequest>` object. Pass Burp's
     IHttpRequestResponse object to the constructor.
 
+    The request and response are not parsed until one of their
+    attributes (i.e., method, headers, body, response) is first
+    accessed.
+
+    The start-line, headers and body can be edited in place, i.e.,
+    `request.method = 'POST'` or `request.headers['X-Foo'] = 'bar'`.
+    Edits are kept on this object, and are written back to Burp in a
+    single call by :meth:`commit`.
+
     Optional init arguments:
     :param _burp: IBurpExtender implementation
+    :param deferred: If true, setting :attr:`raw` is not written back
+    to Burp until :meth:`commit` is called either.
     '''
-    def __init__(self, messageInfo=None, _burp=None):
+    # strings shared with other messages once parsed, see wrap_messages
+    _pool = None
+
+    # hash of the contents parsed, once the copy of them is dropped
+    _digest = None
+
+    # the URL Burp reports, until the request or service is changed
+    _url = None
+
+    def __init__(self, messageInfo=None, _burp=None, deferred=False):
         self._messageInfo = messageInfo
         self._burp = _burp
+        self._deferred = deferred
 
         self._host = None
         self._port = 80
         self._protocol = 'http'
-        self._url = ''
-
-        self.method = None
-        self._uri = None
-        self.version = None
-        self._headers = {}
-        self.body = None
-
-        if messageInfo is not None and hasattr(messageInfo, 'request'):
-            if messageInfo.getRequest():
-                self.method, self._uri, self.version, self._headers, self.body = \
-                    _parse_message(messageInfo.getRequest().tostring())
-
-        if hasattr(messageInfo, 'response'):
-            self.response = HttpResponse(getattr(messageInfo, 'response', None),
-                                         request=self)
-        else:
-            self.response = HttpResponse(None, request=self)
+        self._raw = None
+        self._pending = False
 
     def __contains__(self, item):
         return item in self.body if self.body else False
 
-    def __getstate__(self):
-        return {k: v if k not in ('_burp', '_messageInfo') else None
-                for k, v in self.__dict__.iteritems()}
+    def __reduce__(self):
+        # pickle the raw messages in the compact serialization format,
+        # everything else is parsed again lazily once loaded
+        from .serializers import dumps, loads
+        return loads, (dumps(self), )
 
     def __len__(self):
         return int(self.headers.get('content-length', len(self.body or '')))
 
     def __nonzero__(self):
-        return self.raw is not None
+        if self._raw is not None:
+            return True
+
+        if self._messageInfo:
+            return self._messageInfo.getRequest() is not None
+
+        return False
 
     def __repr__(self):
         return '<HttpRequest [%s]>' % (getattr(self.url, 'path', ''), )
@@ -102,6 +122,7 @@ class HttpRequest(object):
         '''
         if self._messageInfo is not None:
             self._messageInfo.setHost(host)
+            self._url = None
 
         return
 
@@ -130,6 +151,7 @@ class HttpRequest(object):
         '''
         if self._messageInfo is not None:
             self._messageInfo.setPort(port)
+            self._url = None
 
         return
 
@@ -158,22 +180,107 @@ class HttpRequest(object):
         '''
         if self._messageInfo is not None:
             self._messageInfo.setProtocol(protocol)
+            self._url = None
 
         return
 
     @reify
+    def _message(self):
+        '''
+        The parsed start-line, headers and body of this request, as a
+        tuple of (method, uri, version, headers, body).
+        The headers are a list of `(name, value)` fields until
+        :attr:`headers` is first accessed.
+        '''
+        raw = self.raw
+        if raw:
+            message = _split_message(raw, self._pool)
+
+            # Burp holds the contents, don't keep them twice
+            if not self._pending and self._messageInfo:
+                self._raw = None
+                self._digest = hash(raw)
+
+            return message
+
+        return None, None, None, HeaderDict(), None
+
+    @reify
+    def method(self):
+        '''
+        The HTTP method of this request.
+        '''
+        return self._message[0]
+
+    @reify
+    def uri(self):
+        '''
+        The Request-URI of this request, as sent on the request line.
+        '''
+        return self._message[1]
+
+    _uri = property(lambda self: self.uri)
+
+    @reify
+    def version(self):
+        '''
+        The HTTP version of this request.
+        '''
+        return self._message[2]
+
+    @reify
+    def body(self):
+        '''
+        The body of this request.
+        '''
+        return self._message[4]
+
+    @reify
+    def response(self):
+        '''
+        The :class:`HttpResponse <HttpResponse>` received for this
+        request.
+        '''
+        return HttpResponse(getattr(self._messageInfo, 'response', None),
+                            request=self)
+
+    @property
+    def service(self):
+        '''
+        The :class:`HttpService <HttpService>` this request is sent to.
+        Requests to the same host, port and protocol share one instance.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return _get_service(self.host, self.port, self.protocol)
+
+    @property
     def url(self):
         '''
-        The URL requested in this HTTP request.
+        The URL requested in this HTTP request, following any edits made
+        to the request-line or the service.
 
         Note: This is a **read-only** attribute.
 
         :returns: :class:`~urlparse.ParseResult` object.
         '''
-        if self._messageInfo is not None:
-            _url = self._messageInfo.getUrl()
-            if _url:
-                self._url = urlparse(_url.toString())
+        if self._pending or _is_edited(self, _REQUEST_FIELDS):
+            # Burp does not know about the new request-line yet
+            uri = self.uri or ''
+
+            if uri.startswith('/'):
+                uri = '%s://%s:%d%s' % (self.protocol, self.host,
+                                        self.port, uri)
+
+            return urlparse(uri)
+
+        if self._url is None:
+            url = None
+
+            if self._messageInfo is not None:
+                url = self._messageInfo.getUrl()
+
+            self._url = urlparse(url.toString()) if url else ''
 
         return self._url
 
@@ -197,20 +304,68 @@ class HttpRequest(object):
 
         Note: This is a **read-only** attribute.
         '''
-        self._headers = CaseInsensitiveDict(self._headers)
+        self._headers = _headers(self)
         return self._headers
 
+    @reify
+    def context(self):
+        '''
+        A dictionary for handlers to keep their own state for this
+        exchange. It is carried from the request phase into the
+        response phase, along with the parsed request.
+        '''
+        return {}
+
     @reify
     def parameters(self):
         '''
         Parameters parsed into a dictionary based on type (i.e., query,
-        body, etc.)
+        body, etc.) The contents of file uploads in a multipart body are
+        not read, see :meth:`iter_multipart` for those.
 
         Note: This is a **read-only** attribute.
         '''
         self._parameters = _parse_parameters(self)
         return self._parameters
 
+    @reify
+    def json(self):
+        '''
+        The body of this request parsed as JSON, for `application/json`
+        and `+json` content types. The body is parsed once, on first
+        access, and only if it is within the budgets set by
+        :data:`~gds.burp.jsonpath.MAX_JSON_SIZE` and
+        :data:`~gds.burp.jsonpath.MAX_JSON_DEPTH`. None if the body is
+        not JSON, is invalid, or is over budget.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return _parse_json(self.headers, self.body)
+
+    def json_get(self, path, default=None):
+        '''
+        Returns the value at `path` in the JSON body of this request,
+        i.e., `data.items[*].id`. See :func:`gds.burp.jsonpath.get`.
+        '''
+        return jsonpath.get(self.json, path, default)
+
+    def iter_multipart(self, **kwargs):
+        '''
+        Returns an iterator of the :class:`~gds.burp.multipart.MultipartPart`'s
+        in a multipart request body, parsed as the iterator advances.
+        The contents of a part are only read if its `file` or `value`
+        is accessed before moving on to the next part.
+
+        Keyword arguments are passed to :class:`~gds.burp.multipart.MultipartParser`.
+        '''
+        ctype, pdict = parse_header(self.headers.get('content-type', ''))
+
+        if not ctype.startswith('multipart/') or 'boundary' not in pdict:
+            return iter(())
+
+        return iter(MultipartParser(StringReader(self.body),
+                                    pdict['boundary'], **kwargs))
+
     @property
     def content_type(self):
         '''
@@ -242,12 +397,31 @@ class HttpRequest(object):
     @property
     def raw(self):
         '''
-        Returns the full request contents.
+        Returns the full request contents, including any edits made to
+        the start-line, headers or body.
+
+        The contents are copied out of Burp once and cached until the
+        request is parsed, or replaced via this attribute's setter. Once
+        parsed, they are copied out of Burp on each access instead.
         '''
-        if self._messageInfo:
-            return self._messageInfo.getRequest().tostring()
+        if _is_edited(self, _REQUEST_FIELDS):
+            self._raw = _serialize(
+                SP.join([self.method, self.uri, self.version]),
+                self.headers, self.body, self._message[4])
+            self._pending = True
+            _reparse(self, _REQUEST_CACHED)
 
-        return
+        if self._raw is None and self._messageInfo:
+            message = self._messageInfo.getRequest()
+            if message is None:
+                return
+
+            if '_message' in self.__dict__:
+                return message.tostring()
+
+            self._raw = message.tostring()
+
+        return self._raw
 
     @raw.setter
     def raw(self, message):
@@ -258,10 +432,102 @@ class HttpRequest(object):
         application.
         '''
         if self._messageInfo:
-            self._messageInfo.setRequest(message)
+            if self._deferred:
+                self._raw = _tostring(message)
+                self._pending = True
+            else:
+                self._messageInfo.setRequest(message)
+                self._raw = None
+
+            _reset(self, _REQUEST_CACHED)
 
         return
 
+    @property
+    def modified(self):
+        '''
+        True if this request was edited and the edits have not been
+        written back to Burp by :meth:`commit` yet.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._pending or _is_edited(self, _REQUEST_FIELDS)
+
+    def refresh(self):
+        '''
+        Drops the response parsed so far, and the parsed request as well
+        if Burp's copy of the request no longer matches it, i.e., when
+        reusing this request once the response has been received.
+        '''
+        _reset(self, ('response', ))
+
+        if self._pending or not self._messageInfo:
+            return
+
+        if self._raw is None and '_message' not in self.__dict__:
+            return
+
+        message = self._messageInfo.getRequest()
+
+        if message is not None:
+            message = message.tostring()
+
+            if self._raw is None and hash(message) == self._digest or \
+                    message == self._raw:
+                return
+
+        self._raw = None
+        _reset(self, _REQUEST_CACHED)
+
+    def commit(self):
+        '''
+        Writes the edits made to this request, and to its response if it
+        was accessed, back to Burp with a single call each. Returns True
+        if anything was written.
+        '''
+        written = False
+
+        if self._messageInfo and self.modified:
+            self._messageInfo.setRequest(self.raw)
+            self._pending = False
+            self._url = None
+            written = True
+
+        response = self.__dict__.get('response')
+
+        if response is not None and response.commit():
+            written = True
+
+        return written
+
+    def view(self, start=0, stop=None):
+        '''
+        Returns a :class:`memoryview` over the full request contents,
+        optionally sliced, without copying them.
+
+        :param start: Offset of the first byte in the view.
+        :param stop: Offset one past the last byte in the view.
+        '''
+        return _view(self.raw, start, stop)
+
+    @property
+    def head_view(self):
+        '''
+        Returns a :class:`memoryview` over the start-line and headers
+        of this request, without copying them.
+        '''
+        raw = self.raw
+        return _view(raw, 0, _body_offset(raw))
+
+    @property
+    def body_view(self):
+        '''
+        Returns a :class:`memoryview` over the body of this request,
+        without copying it.
+        '''
+        raw = self.raw
+        return _view(raw, _body_offset(raw))
+
     @property
     def comment(self):
         '''
@@ -310,28 +576,154 @@ class HttpRequest(object):
 
 
 class HttpResponse(object):
+    '''The :class:`HttpResponse <HttpResponse>` object. The response
+    is not parsed until one of its attributes is first accessed.
+    '''
     def __init__(self, message=None, request=None):
         self.request = request
-
-        self.version = None
-        self.status_code = None
-        self.reason = None
         self.encoding = None
-        self._headers = {}
-        self.body = None
+        self._raw_message = message
+        self._raw = None
+        self._pending = False
 
-        if message is not None:
-            self.version, self.status_code, self.reason, self._headers, self.body = \
-                _parse_message(message.tostring())
+    @reify
+    def _message(self):
+        '''
+        The parsed status-line, headers and body of this response, as a
+        tuple of (version, status_code, reason, headers, body).
+        The headers are a list of `(name, value)` fields until
+        :attr:`headers` is first accessed.
+        '''
+        raw = self.raw
+        if raw:
+            message = _split_message(raw, getattr(self.request, '_pool', None))
+
+            # Burp holds the contents, don't keep them twice
+            if not self._pending and self._burp_holds:
+                self._raw = None
+
+            return message
+
+        return None, None, None, HeaderDict(), None
+
+    @reify
+    def version(self):
+        '''
+        The HTTP version of this response.
+        '''
+        return self._message[0]
+
+    @reify
+    def status_code(self):
+        '''
+        The HTTP status code of this response.
+        '''
+        return self._message[1]
+
+    @reify
+    def reason(self):
+        '''
+        The HTTP reason phrase of this response.
+        '''
+        return self._message[2]
+
+    @reify
+    def body(self):
+        '''
+        The body of this response.
+        '''
+        return self._message[4]
+
+    @reify
+    def decoded_body(self):
+        '''
+        The body of this response with its chunked transfer coding and
+        gzip or deflate content codings removed. The body is decoded
+        once, on first access, up to :data:`~gds.burp.decoders.MAX_DECODED_SIZE`
+        bytes.
+
+        Raises a :class:`ValueError`, every time it is accessed, if the
+        body uses a coding that is not supported (i.e., `br`), is
+        malformed, or decodes to more than `MAX_DECODED_SIZE` bytes.
+        Use :meth:`decode_body` to choose the limit, or fall back to
+        :attr:`body` when decoding fails.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self.decode_body()
+
+    @reify
+    def json(self):
+        '''
+        The decoded body of this response parsed as JSON, for
+        `application/json` and `+json` content types. See
+        :attr:`HttpRequest.json`.
+
+        Note: This is a **read-only** attribute.
+        '''
+        try:
+            body = self.decoded_body
+        except ValueError:
+            return
+
+        return _parse_json(self.headers, body)
+
+    def json_get(self, path, default=None):
+        '''
+        Returns the value at `path` in the JSON body of this response,
+        i.e., `data.items[*].id`. See :func:`gds.burp.jsonpath.get`.
+        '''
+        return jsonpath.get(self.json, path, default)
+
+    def decode_body(self, max_size=None):
+        '''
+        Returns the body of this response with its transfer and content
+        codings removed.
+
+        :param max_size: Maximum size of the decoded body. A
+        :class:`ValueError` is raised if it is exceeded.
+        '''
+        return ''.join(self.iter_decoded_body(max_size))
+
+    def iter_decoded_body(self, max_size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        '''
+        Returns a generator of the decoded body of this response, in
+        pieces of at most `chunk_size` bytes, without holding all of it
+        in memory.
+
+        :param max_size: Maximum size of the decoded body. A
+        :class:`ValueError` is raised if it is exceeded.
+        :param chunk_size: Maximum size of each piece generated.
+        '''
+        return iter_decoded(self.body,
+                            self.headers.get('transfer-encoding', ''),
+                            self.headers.get('content-encoding', ''),
+                            max_size, chunk_size)
 
     def __contains__(self, item):
         return item in self.body if self.body else False
 
+    def __getstate__(self):
+        self._message
+        state = dict(self.__dict__, _raw_message=None)
+
+        # the copy of the contents is dropped once parsed
+        if self._raw is None:
+            state['_raw'] = self.raw
+
+        return state
+
     def __len__(self):
         return int(self.headers.get('content-length', len(self.body or '')))
 
     def __nonzero__(self):
-        return self.raw is not None
+        if self._raw is not None or self._raw_message is not None:
+            return True
+
+        if self.request is not None and self.request._messageInfo:
+            return self.request._messageInfo.getResponse() is not None
+
+        return False
 
     def __repr__(self):
         return '<HttpResponse [%s]>' % (self.status_code, )
@@ -345,7 +737,11 @@ class HttpResponse(object):
 
         :returns: :class:`~Cookie.SimpleCookie` object.
         '''
-        self._cookies = SimpleCookie(self.headers.get('set-cookie', ''))
+        self._cookies = SimpleCookie()
+
+        for cookie in self.headers.getlist('set-cookie'):
+            self._cookies.load(cookie)
+
         return self._cookies
 
     @reify
@@ -356,7 +752,7 @@ class HttpResponse(object):
 
         Note: This is a **read-only** attribute.
         '''
-        self._headers = CaseInsensitiveDict(self._headers)
+        self._headers = _headers(self)
         return self._headers
 
     @property
@@ -371,12 +767,46 @@ class HttpResponse(object):
     @property
     def raw(self):
         '''
-        Returns the full response contents.
+        Returns the full response contents, including any edits made to
+        the status-line, headers or body.
+
+        The contents are copied out of Burp once and cached until the
+        response is parsed, or replaced via this attribute's setter. Once
+        parsed, they are copied out of Burp on each access instead.
         '''
-        if self.request._messageInfo:
-            return self.request._messageInfo.getResponse().tostring()
+        if _is_edited(self, _RESPONSE_FIELDS):
+            self._raw = _serialize(
+                SP.join([self.version, str(self.status_code), self.reason]
+                        if self.reason else
+                        [self.version, str(self.status_code)]),
+                self.headers, self.body, self._message[4])
+            self._raw_message = None
+            self._pending = True
+            _reparse(self, _RESPONSE_CACHED)
 
-        return
+        if self._raw is None:
+            message = self._raw_message
+
+            if message is None and self._burp_holds:
+                message = self.request._messageInfo.getResponse()
+
+            if message is None:
+                return
+
+            self._raw_message = None
+
+            if '_message' in self.__dict__ and self._burp_holds:
+                return message.tostring()
+
+            self._raw = message.tostring()
+
+        return self._raw
+
+    @property
+    def _burp_holds(self):
+        # whether the contents can be copied out of Burp again
+        return self.request is not None and \
+            bool(self.request._messageInfo)
 
     @raw.setter
     def raw(self, message):
@@ -388,10 +818,324 @@ class HttpResponse(object):
         by the invoking Burp tool.
         '''
         if self.request._messageInfo:
+            if self.request._deferred:
+                self._raw_message = None
+                self._raw = _tostring(message)
+                self._pending = True
+                _reset(self, _RESPONSE_CACHED)
+                return
+
+            self._raw_message = self._raw = None
+            _reset(self, _RESPONSE_CACHED)
             return self.request._messageInfo.setResponse(message)
 
         return
 
+    @property
+    def modified(self):
+        '''
+        True if this response was edited and the edits have not been
+        written back to Burp by :meth:`commit` yet.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._pending or _is_edited(self, _RESPONSE_FIELDS)
+
+    def commit(self):
+        '''
+        Writes the edits made to this response back to Burp with a
+        single call. Returns True if anything was written.
+        '''
+        if self.request is None or not self.request._messageInfo or \
+                not self.modified:
+            return False
+
+        self.request._messageInfo.setResponse(self.raw)
+        self._pending = False
+        return True
+
+    def view(self, start=0, stop=None):
+        '''
+        Returns a :class:`memoryview` over the full response contents,
+        optionally sliced, without copying them.
+
+        :param start: Offset of the first byte in the view.
+        :param stop: Offset one past the last byte in the view.
+        '''
+        return _view(self.raw, start, stop)
+
+    @property
+    def head_view(self):
+        '''
+        Returns a :class:`memoryview` over the status-line and headers
+        of this response, without copying them.
+        '''
+        raw = self.raw
+        return _view(raw, 0, _body_offset(raw))
+
+    @property
+    def body_view(self):
+        '''
+        Returns a :class:`memoryview` over the body of this response,
+        without copying it.
+        '''
+        raw = self.raw
+        return _view(raw, _body_offset(raw))
+
+
+class CompactHttpRequest(object):
+    '''A memory-light stand-in for :class:`HttpRequest <HttpRequest>`,
+    for holding on to large numbers of items (i.e., the entire proxy
+    history) in the console.
+
+    Only the service, method, URI and status code are kept. They are
+    read from the start-lines of the request and response on first
+    access, and the service is shared with every other request to the
+    same host, port and protocol. Use :meth:`expand` to get the full
+    :class:`HttpRequest <HttpRequest>`.
+
+    Optional init arguments:
+    :param _burp: IBurpExtender implementation
+    '''
+    __slots__ = ['_messageInfo', '_burp', '_service', '_method', '_uri',
+        '_status_code', ]
+
+    def __init__(self, messageInfo=None, _burp=None):
+        self._messageInfo = messageInfo
+        self._burp = _burp
+        self._service = None
+        self._method = None
+        self._uri = None
+        self._status_code = None
+
+    def __repr__(self):
+        return '<CompactHttpRequest [%s %s]>' % (self.method, self.uri, )
+
+    def _parse_request_line(self):
+        line = _start_line(getattr(self._messageInfo, 'request', None))
+
+        if line:
+            method, _, request_line = line.partition(SP)
+            self._method = intern(method)
+            self._uri = request_line.rpartition(SP)[0]
+
+    @property
+    def service(self):
+        '''
+        The shared :class:`HttpService <HttpService>` of this request.
+        '''
+        if self._service is None and self._messageInfo is not None:
+            self._service = _get_service(self._messageInfo.getHost(),
+                                         self._messageInfo.getPort(),
+                                         self._messageInfo.getProtocol())
+
+        return self._service
+
+    @property
+    def host(self):
+        return getattr(self.service, 'host', None)
+
+    @property
+    def port(self):
+        return getattr(self.service, 'port', None)
+
+    @property
+    def protocol(self):
+        return getattr(self.service, 'protocol', None)
+
+    @property
+    def method(self):
+        '''
+        The HTTP method of this request.
+        '''
+        if self._method is None:
+            self._parse_request_line()
+
+        return self._method
+
+    @property
+    def uri(self):
+        '''
+        The request-uri of this request.
+        '''
+        if self._uri is None:
+            self._parse_request_line()
+
+        return self._uri
+
+    @property
+    def status_code(self):
+        '''
+        The HTTP status code of the response, or None if there is no
+        response.
+        '''
+        if self._status_code is None:
+            line = _start_line(getattr(self._messageInfo, 'response', None))
+
+            if line:
+                status = line.partition(SP)[2].partition(SP)[0]
+                if status.isdigit():
+                    self._status_code = int(status)
+
+        return self._status_code
+
+    def expand(self):
+        '''
+        Returns the full :class:`HttpRequest <HttpRequest>` for this item.
+        '''
+        return HttpRequest(self._messageInfo, _burp=self._burp)
+
+
+class HttpRequestResponse(IHttpRequestResponse):
+    '''A detached IHttpRequestResponse, holding copies of the raw
+    request and response. Used for messages loaded from disk and for
+    snapshots of Burp's messages.
+
+    Messages read back from an archive or a serialized stream may hold
+    the head and body of each message apart instead, so that their body
+    is shared with the other messages carrying it, see :meth:`from_parts`.
+    '''
+    __slots__ = ['_request', '_response', 'comment', 'highlight',
+        'httpService', ]
+
+    def __init__(self, request=None, response=None, httpService=None,
+                 comment=None, highlight=None):
+        self._request = _tostring(request)
+        self._response = _tostring(response)
+        self.httpService = httpService or HttpService()
+        self.comment = comment
+        self.highlight = highlight
+
+    @classmethod
+    def from_parts(cls, request_parts, response_parts, httpService=None,
+                   comment=None, highlight=None):
+        '''
+        Returns a detached message from `(head, body)` tuples of its
+        request and response, either of which may be None. The tuples
+        are held as they are, and only joined when the messages are
+        read, so messages built from the same body string share it.
+        '''
+        messageInfo = cls(None, None, httpService, comment, highlight)
+        messageInfo._request = request_parts
+        messageInfo._response = response_parts
+        return messageInfo
+
+    @property
+    def request_parts(self):
+        '''
+        The head and body of the request, as a tuple, or None.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return _parts(self._request)
+
+    @property
+    def response_parts(self):
+        '''
+        The head and body of the response, as a tuple, or None.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return _parts(self._response)
+
+    def __repr__(self):
+        return '<HttpRequestResponse [%s]>' % (
+            _start_line(self.getRequest()), )
+
+    @classmethod
+    def copy(cls, messageInfo):
+        '''
+        Returns a detached copy of `messageInfo`.
+        '''
+        if isinstance(messageInfo, HttpRequestResponse):
+            # detached messages are strings, which can be shared
+            copied = cls(None, None, messageInfo.httpService,
+                         messageInfo.comment, messageInfo.highlight)
+            copied._request = messageInfo._request
+            copied._response = messageInfo._response
+            return copied
+
+        return cls(messageInfo.getRequest(), messageInfo.getResponse(),
+                   _get_service(messageInfo.getHost(),
+                                messageInfo.getPort(),
+                                messageInfo.getProtocol()),
+                   messageInfo.getComment(), messageInfo.getHighlight())
+
+    request = property(lambda self: self.getRequest())
+    response = property(lambda self: self.getResponse())
+
+    def getRequest(self):
+        if self._request is not None:
+            return array('b', _joined(self._request))
+
+    def setRequest(self, message):
+        self._request = _tostring(message)
+
+    def getResponse(self):
+        if self._response is not None:
+            return array('b', _joined(self._response))
+
+    def setResponse(self, message):
+        self._response = _tostring(message)
+
+    def getComment(self):
+        return self.comment
+
+    def setComment(self, comment):
+        self.comment = comment
+
+    def getHighlight(self):
+        return self.highlight
+
+    def setHighlight(self, color):
+        self.highlight = color
+
+    def getHttpService(self):
+        return self.httpService
+
+    def setHttpService(self, httpService):
+        self.httpService = httpService
+
+    def getHost(self):
+        return self.httpService.getHost()
+
+    def setHost(self, host):
+        self.httpService = _get_service(host, self.getPort(),
+                                        self.getProtocol())
+
+    def getPort(self):
+        return self.httpService.getPort()
+
+    def setPort(self, port):
+        self.httpService = _get_service(self.getHost(), port,
+                                        self.getProtocol())
+
+    def getProtocol(self):
+        return self.httpService.getProtocol()
+
+    def setProtocol(self, protocol):
+        self.httpService = _get_service(self.getHost(), self.getPort(),
+                                        protocol)
+
+    def getStatusCode(self):
+        line = _start_line(self.getResponse())
+
+        if line:
+            status = line.partition(SP)[2].partition(SP)[0]
+            if status.isdigit():
+                return int(status)
+
+        return 0
+
+    def getUrl(self):
+        line = _start_line(self.getRequest()) or ''
+        uri = line.partition(SP)[2].rpartition(SP)[0]
+
+        if uri.startswith('/'):
+            return URL(self.getProtocol(), self.getHost(), self.getPort(), uri)
+
+        return URL(uri)
+
 
 class HttpService(IHttpService):
     __slots__ = ['host', 'port', 'protocol', ]
@@ -502,99 +1246,399 @@ class ScanIssue(IScanIssue):
         return getattr(self, 'protocol', u'http')
 
 
-def _parse_message(message):
-    is_response = False
-    pos = idx = 0
+def parse_messages(messageInfos, _burp=None):
+    '''
+    Returns a list of :class:`HttpRequest`'s for a sequence of Burp's
+    IHttpRequestResponse objects, with their requests and responses
+    parsed up front.
 
-    idx = message.find(CRLF, pos)
+    Each message is copied out of Burp once. Hosts and short header
+    lines are shared across the whole batch: a header line seen before
+    is not split again, and the messages share its name and value. The
+    :class:`~gds.burp.structures.HeaderDict` of a message is only built
+    when its `headers` are first accessed. Messages that fail to parse
+    are left to be parsed (and raise) when first accessed.
 
-    if idx != -1:
-        start_line = message[pos:idx]
+    Optional init arguments:
+    :param _burp: IBurpExtender implementation
+    '''
+    pool = {}
+    requests = []
 
-        if start_line.startswith('HTTP/'):
-            is_response = True
+    for messageInfo in messageInfos:
+        request = HttpRequest(messageInfo, _burp=_burp)
+        service = _get_service(messageInfo.getHost(), messageInfo.getPort(),
+                               messageInfo.getProtocol())
 
-        _idx = start_line.find(SP)
+        request._host = service.host
+        request._port = service.port
+        request._protocol = service.protocol
 
-        if _idx != -1:
-            if is_response:
-                version = start_line[0:_idx]
-            else:
-                method = start_line[0:_idx]
+        # each message is copied out of Burp once, straight into the
+        # parser, rather than through the request's cached copy
+        response = request.response = HttpResponse(None, request=request)
 
-            _pos = _idx + 1
+        try:
+            request._message = _parse_array(messageInfo.getRequest(), pool)
+            response._message = _parse_array(messageInfo.getResponse(), pool)
+        except ValueError:
+            pass
 
-        if is_response:
-            _idx = start_line.find(SP, _pos)
+        requests.append(request)
 
-            status = start_line[_pos:_idx]
-            if not status.isdigit():
-                raise ValueError('status code %r is not a number' % (status, ))
+    return requests
 
-            status = int(status)
 
-            _pos = _idx + 1
-            reason = start_line[_pos:]
+def wrap_messages(messageInfos, _burp=None):
+    '''
+    Returns a list of :class:`HttpRequest`'s for a sequence of Burp's
+    IHttpRequestResponse objects, without parsing any of them.
 
-        else:
-            # work out the http version by looking in reverse
-            _ridx = start_line.rfind(SP)
-            version = start_line[_ridx + 1:]
-            if not version.startswith('HTTP/'):
-                raise ValueError('Invalid HTTP version: %r' % (version, ))
+    Like :func:`parse_messages`, short header lines are shared across
+    the whole batch, but each request and response is only parsed when
+    first accessed, so that a large selection costs little until it is
+    used.
 
-            # request-uri will be everything in-between.
-            # some clients might not encode space into a plus or %20
-            uri = start_line[_pos:_ridx]
-            if not uri or uri.isspace():
-                raise ValueError('Invalid URI: %r' % (uri, ))
+    Optional init arguments:
+    :param _burp: IBurpExtender implementation
+    '''
+    pool = {}
+    requests = []
 
-        pos = idx + 2
-    else:
+    for messageInfo in messageInfos:
+        request = HttpRequest(messageInfo, _burp=_burp)
+        request._pool = pool
+        requests.append(request)
+
+    return requests
+
+
+_services = {}
+
+
+def _get_service(host, port, protocol):
+    '''
+    Returns the shared :class:`HttpService <HttpService>` for the given
+    host, port and protocol, creating it if needed.
+    '''
+    key = (host, port, protocol)
+    service = _services.get(key)
+
+    if service is None:
+        service = _services.setdefault(
+            key, HttpService(host=host, port=port, protocol=protocol))
+
+    return service
+
+
+def _parts(message):
+    if message is None or isinstance(message, tuple):
+        return message
+
+    return split(message)
+
+
+def _joined(message):
+    if isinstance(message, tuple):
+        return ''.join(message)
+
+    return message
+
+
+def _tostring(message):
+    if message is None or isinstance(message, str):
+        return message
+
+    if isinstance(message, unicode):
+        return message.encode('latin-1')
+
+    return message.tostring()
+
+
+def _start_line(message, limit=8192):
+    '''
+    Returns the start-line of a raw HTTP message (a Java byte[]), only
+    copying the first `limit` bytes out of it.
+    '''
+    if message is None:
+        return
+
+    head = message[:limit].tostring()
+    idx = head.find(CRLF)
+
+    if idx == -1:
+        return head
+
+    return head[:idx]
+
+
+def _body_offset(message):
+    '''
+    Returns the offset at which the body of a raw HTTP message begins.
+    '''
+    if not message:
+        return 0
+
+    idx = message.find(CRLF + CRLF)
+
+    if idx == -1:
+        return len(message)
+
+    return idx + 4
+
+
+# attributes holding the parsed start-line, in the order they are
+# returned by _parse_message, and every attribute derived from them
+_REQUEST_FIELDS = ('method', 'uri', 'version')
+_RESPONSE_FIELDS = ('version', 'status_code', 'reason')
+
+_REQUEST_CACHED = ('_message', 'method', 'uri', 'version', 'headers',
+                   'body', 'cookies', 'parameters', 'json', '_url')
+_RESPONSE_CACHED = ('_message', 'version', 'status_code', 'reason',
+                    'headers', 'body', 'decoded_body', 'json', 'cookies')
+
+
+def _is_edited(message, fields):
+    '''
+    Returns True if the start-line, headers or body of a parsed
+    :class:`HttpRequest` or :class:`HttpResponse` differ from what was
+    parsed.
+    '''
+    state = message.__dict__
+    parsed = state.get('_message')
+
+    if parsed is None:
+        return False
+
+    for idx, name in enumerate(fields):
+        if name in state and state[name] is not parsed[idx] and \
+                state[name] != parsed[idx]:
+            return True
+
+    headers = state.get('headers')
+
+    if headers is not None and \
+            (headers is not parsed[3] or headers.modified):
+        return True
+
+    body = state.get('body', parsed[4])
+    return body is not parsed[4] and body != parsed[4]
+
+
+def _headers(message):
+    '''
+    Returns the :class:`HeaderDict` of a parsed :class:`HttpRequest` or
+    :class:`HttpResponse`, building it from the header fields split out
+    of the message the first time.
+    '''
+    parsed = message._message
+    headers = parsed[3]
+
+    if not isinstance(headers, HeaderDict):
+        headers = HeaderDict.from_fields(headers)
+        message._message = parsed[:3] + (headers, ) + parsed[4:]
+
+    return headers
+
+
+def _reset(message, names):
+    '''
+    Drops the reified attributes of `message`, so that they are parsed
+    again from its new contents.
+    '''
+    state = message.__dict__
+
+    for name in names:
+        state.pop(name, None)
+
+
+def _reparse(message, names):
+    '''
+    Drops the reified attributes of `message` once its edits have been
+    serialized, like :func:`_reset`, but keeps its :class:`HeaderDict`,
+    which handlers may hold on to. The headers are brought in line with
+    the ones serialized (i.e., an updated Content-Length), and no longer
+    count as modified.
+    '''
+    headers = message.__dict__.get('headers')
+    _reset(message, names)
+
+    if headers is None:
+        return
+
+    parsed = message._message
+    fields = parsed[3]
+
+    if isinstance(fields, HeaderDict):
+        fields = list(fields.iterfields())
+
+    headers.clear()
+
+    for key, value in fields:
+        headers.add(key, value)
+
+    headers.modified = False
+    message._message = parsed[:3] + (headers, ) + parsed[4:]
+    message.headers = message._headers = headers
+
+
+def _serialize(start_line, headers, body, parsed_body):
+    '''
+    Returns a raw HTTP message. If the body changed, its Content-Length
+    header is updated to match it, or added when there was none, unless
+    the body is chunked.
+    '''
+    body = body or ''
+    fix_length = body is not parsed_body and \
+        'transfer-encoding' not in headers
+
+    lines = [start_line]
+    length = None
+
+    for key, value in headers.iterfields():
+        if fix_length and key.lower() == 'content-length':
+            if length is None:
+                length = '%s: %d' % (key, len(body))
+                lines.append(length)
+            continue
+
+        lines.append(': '.join((key, value)))
+
+    if fix_length and length is None and (body or parsed_body):
+        lines.append('Content-Length: %d' % (len(body), ))
+
+    lines.append('')
+    lines.append(body)
+    return CRLF.join(lines)
+
+
+def _view(message, start=0, stop=None):
+    if message is None:
+        return
+
+    return memoryview(message)[start:stop]
+
+
+def _parse_array(message, pool=None):
+    '''
+    Parses a raw HTTP message held in a Java byte[], without keeping
+    the copy of it that is made along the way.
+    '''
+    if message is not None:
+        message = message.tostring()
+
+    if message:
+        return _split_message(message, pool)
+
+    return None, None, None, HeaderDict(), None
+
+
+def _parse_message(message, pool=None):
+    parsed = _split_message(message, pool)
+    return parsed[:3] + (HeaderDict.from_fields(parsed[3]), parsed[4])
+
+
+def _split_message(message, pool=None):
+    '''
+    Splits a raw HTTP message into its start-line, a list of its header
+    fields as `(name, value)` pairs, and its body. The fields are made
+    into a :class:`HeaderDict` by the message's `headers`, on first
+    access.
+    '''
+    idx = message.find(CRLF)
+
+    if idx == -1:
         raise ValueError('Could not parse start-line from message')
 
-    headers = CaseInsensitiveDict()
+    start_line = message[:idx]
+    is_response = start_line.startswith('HTTP/')
 
-    while (idx != -1):
-        idx = message.find(CRLF, pos)
+    if is_response:
+        version, _, status_line = start_line.partition(SP)
+        status, _, reason = status_line.partition(SP)
+        version = intern(version)
+        reason = intern(reason)
 
-        if idx == pos:
-            # we've reached the end of the request headers
-            # advance 4 bytes (2 * CRLF)
-            pos = idx + 2
-            break
+        if not status.isdigit():
+            raise ValueError('status code %r is not a number' % (status, ))
 
-        if idx != -1:
-            header = message[pos:idx]
-            _idx = header.find(':')
+        status = int(status)
 
-            if _idx != -1:
-                name = header[:_idx].strip()
-                value = header[_idx + 1:].strip()
+    else:
+        method, _, request_line = start_line.partition(SP)
+        method = intern(method)
 
-                has_value = headers.get(name)
+        # work out the http version by looking in reverse
+        # request-uri will be everything in-between.
+        # some clients might not encode space into a plus or %20
+        uri, _, version = request_line.rpartition(SP)
+        version = intern(version)
 
-                if has_value and has_value != value:
-                    value = ', '.join([has_value, value])
+        if not version.startswith('HTTP/'):
+            raise ValueError('Invalid HTTP version: %r' % (version, ))
 
-                headers[name] = value
-            else:
-                raise ValueError('Error parsing header: %r' % (header, ))
+        if not uri or uri.isspace():
+            raise ValueError('Invalid URI: %r' % (uri, ))
 
-            pos = idx + 2
-        else:
-            # looks like we reached the end of the message before EOL
-            break
+    # find the end of the headers up front and tokenize them in a
+    # single pass, rather than searching for each CRLF in turn
+    end = message.find(CRLF + CRLF, idx)
 
-    if idx < len(message):
-        body = message[pos:]
+    if end == -1:
+        # looks like we reached the end of the message before EOL
+        header_lines = message[idx + 2:].split(CRLF)
+        body = ''
     else:
-        raise ValueError('Parsed past message body??')
+        header_lines = message[idx + 2:end].split(CRLF)
+        body = message[end + 4:]
+
+    fields = []
+
+    for header in header_lines:
+        # header lines seen before in the batch are not split again,
+        # and share their name and value with the earlier message
+        if pool is not None:
+            field = pool.get(header)
+
+            if field is not None:
+                fields.append(field)
+                continue
+
+        name, sep, value = header.partition(':')
+
+        if sep:
+            # header names are interned, so that the many messages kept
+            # in the console share a single copy of each of them
+            field = (intern(name.strip()), value.strip())
+
+            if pool is not None and len(header) <= POOLED_LINE_SIZE:
+                pool[header] = field
+
+            fields.append(field)
+        elif header:
+            raise ValueError('Error parsing header: %r' % (header, ))
 
     if not is_response:
-        return method, uri, version, headers, body
+        return method, uri, version, fields, body
     else:
-        return version, status, reason, headers, body
+        return version, status, reason, fields, body
+
+
+def _is_json(ctype):
+    return ctype in ('application/json', 'text/json') or \
+        ctype.endswith('+json')
+
+
+def _parse_json(headers, body):
+    ctype, pdict = parse_header(headers.get('content-type', ''))
+
+    if not body or not _is_json(ctype):
+        return
+
+    try:
+        return jsonpath.loads(body, pdict.get('charset'))
+    except (LookupError, ValueError):
+        return
 
 
 def _parse_parameters(request):
@@ -610,20 +1654,14 @@ def _parse_parameters(request):
         parameters['body'] = parse_qs(request.body, keep_blank_values=True)
 
     elif ctype.startswith('multipart/'):
-        parameters['body'] = FieldStorage(
-            fp=StringIO(request.body),
-            headers=request.headers,
-            environ={
-                'REQUEST_METHOD': request.method,
-                'QUERY_STRING': request.url.query,
-                },
-            keep_blank_values=True)
-
-    elif ctype in ('application/json', ):
-        try:
-            parameters['body'] = json.loads(request.body)
-        except (NameError, TypeError):
-            pass
+        if 'boundary' in pdict:
+            parameters['body'] = MultipartForm(MultipartParser(
+                StringReader(request.body), pdict['boundary']),
+                skip_files=True)
+
+    elif _is_json(ctype):
+        if request.json is not None:
+            parameters['body'] = request.json
 
     elif ctype == 'application/x-amf':
         pass
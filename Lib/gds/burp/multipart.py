@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.multipart
+~~~~~~~~~~~~~~~~~~
+
+This module contains a streaming parser for multipart/form-data
+bodies.
+
+Parts are generated one at a time, as the body is read. The contents
+of a part are only read into memory (or, past `spool_size` bytes, a
+temporary file) when its :attr:`~MultipartPart.file` or
+:attr:`~MultipartPart.value` is accessed; parts that are passed over
+are skipped without being stored anywhere.
+
+The temporary files are closed, and removed, by :meth:`MultipartForm.close`
+or, for parts taken from a :class:`MultipartParser`, by
+:meth:`MultipartPart.close`::
+
+    >>> with request.parameters['body'] as form:
+    ...     form.getfirst('name')
+'''
+from cgi import parse_header
+from collections import OrderedDict
+from tempfile import SpooledTemporaryFile
+
+from .structures import HeaderDict
+
+CRLF = '\r\n'
+
+MAX_HEADER_SIZE = 64 * 1024
+READ_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+
+
+class MultipartPart(object):
+    '''A single part of a multipart body.
+
+    :attr name: The field name from the Content-Disposition header.
+    :attr filename: The file name from the Content-Disposition header,
+    or None if the part is not a file upload.
+    :attr headers: The part headers.
+    '''
+    def __init__(self, parser, headers):
+        self._parser = parser
+        self._file = None
+
+        self.headers = headers
+        self.type = headers.get('content-type', 'text/plain')
+
+        _, params = parse_header(headers.get('content-disposition', ''))
+        self.name = params.get('name')
+        self.filename = params.get('filename')
+
+    def __repr__(self):
+        return '<MultipartPart [%s]>' % (self.name, )
+
+    @property
+    def file(self):
+        '''
+        A file object with the contents of this part, or None if the
+        part was passed over before being read.
+        '''
+        if self._parser is not None:
+            self._parser._read_part(self)
+
+        return self._file
+
+    @property
+    def value(self):
+        '''
+        The contents of this part, read into memory.
+        '''
+        fp = self.file
+
+        if fp is None:
+            return
+
+        fp.seek(0)
+        return fp.read()
+
+    def close(self):
+        '''
+        Closes the file holding the contents of this part, if they were
+        read.
+        '''
+        if self._file is not None:
+            self._file.close()
+
+
+class MultipartParser(object):
+    '''Iterable of the :class:`MultipartPart`'s in a multipart body.
+
+    :param fp: A file-like object to read the body from.
+    :param boundary: The boundary parameter of the Content-Type header.
+    :param spool_size: Size past which the contents of a part are
+    written to a temporary file rather than kept in memory.
+    :param read_size: Number of bytes read from `fp` at a time.
+    '''
+    def __init__(self, fp, boundary, spool_size=SPOOL_SIZE,
+                 read_size=READ_SIZE):
+        self.fp = fp
+        self.spool_size = spool_size
+        self.read_size = read_size
+
+        self._delimiter = CRLF + '--' + boundary
+        # the first boundary need not be preceded by a CRLF
+        self._buffer = CRLF
+        self._found = False
+        self._eof = False
+
+    def __iter__(self):
+        if not self._skip_to_delimiter():
+            return
+
+        while True:
+            self._fill(2)
+
+            if self._buffer.startswith('--'):
+                # close-delimiter, the rest is epilogue
+                return
+
+            # ignore any transport padding after the boundary
+            if self._read_until(CRLF, MAX_HEADER_SIZE) is None:
+                return
+
+            self._fill(2)
+
+            if self._buffer.startswith(CRLF):
+                self._buffer = self._buffer[2:]
+                head = ''
+            else:
+                head = self._read_until(CRLF + CRLF, MAX_HEADER_SIZE)
+                if head is None:
+                    return
+
+            part = MultipartPart(self, _parse_headers(head))
+
+            yield part
+
+            if part._parser is not None:
+                # the part was passed over, skip its contents
+                part._parser = None
+                self._found = self._skip_to_delimiter()
+
+            if not self._found:
+                return
+
+    def _read(self):
+        data = '' if self._eof else self.fp.read(self.read_size)
+
+        if not data:
+            self._eof = True
+            return False
+
+        self._buffer += data
+        return True
+
+    def _fill(self, size):
+        while len(self._buffer) < size and self._read():
+            pass
+
+    def _read_until(self, marker, limit):
+        while True:
+            idx = self._buffer.find(marker)
+
+            if idx != -1:
+                data = self._buffer[:idx]
+                self._buffer = self._buffer[idx + len(marker):]
+                return data
+
+            if len(self._buffer) > limit:
+                raise ValueError('Multipart headers exceed %d bytes' % (
+                                 limit, ))
+
+            if not self._read():
+                return
+
+    def _skip_to_delimiter(self, sink=None):
+        '''
+        Consume everything up to and including the next delimiter,
+        writing what came before it to `sink`. Returns False if the
+        body ended before a delimiter was found.
+        '''
+        keep = len(self._delimiter) - 1
+
+        while True:
+            idx = self._buffer.find(self._delimiter)
+
+            if idx != -1:
+                if sink is not None:
+                    sink.write(self._buffer[:idx])
+
+                self._buffer = self._buffer[idx + len(self._delimiter):]
+                return True
+
+            if len(self._buffer) > keep:
+                # hold on to enough of the buffer to match a delimiter
+                # that is split between two reads
+                if sink is not None:
+                    sink.write(self._buffer[:-keep])
+
+                self._buffer = self._buffer[-keep:]
+
+            if not self._read():
+                if sink is not None:
+                    sink.write(self._buffer)
+
+                self._buffer = ''
+                return False
+
+    def _read_part(self, part):
+        sink = SpooledTemporaryFile(max_size=self.spool_size)
+        self._found = self._skip_to_delimiter(sink)
+        sink.seek(0)
+
+        part._file = sink
+        part._parser = None
+
+
+class MultipartForm(object):
+    '''A read-only, :class:`cgi.FieldStorage`-like view of the fields in
+    a multipart body. The body is parsed when the form is first used.
+
+    :param parser: A :class:`MultipartParser`.
+    :param skip_files: If true, the contents of file uploads are not
+    read, and their :attr:`~MultipartPart.value` is None.
+
+    The form can be used as a context manager, which closes it on exit.
+    '''
+    def __init__(self, parser, skip_files=False):
+        self._parser = parser
+        self._skip_files = skip_files
+        self._fields = None
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __getitem__(self, name):
+        parts = self.fields[name]
+        return parts[0] if len(parts) == 1 else parts
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return '<MultipartForm %r>' % (self.keys(), )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        '''
+        Closes the files holding the contents of the parts read so far.
+        '''
+        for parts in (self._fields or {}).itervalues():
+            for part in parts:
+                part.close()
+
+    @property
+    def fields(self):
+        '''
+        An ordered dictionary of field names to lists of
+        :class:`MultipartPart`'s.
+        '''
+        if self._fields is None:
+            fields = OrderedDict()
+
+            for part in self._parser:
+                if part.filename is None or not self._skip_files:
+                    part.file
+
+                fields.setdefault(part.name, []).append(part)
+
+            self._fields = fields
+
+        return self._fields
+
+    def keys(self):
+        return self.fields.keys()
+
+    def getfirst(self, name, default=None):
+        if name in self.fields:
+            return self.fields[name][0].value
+
+        return default
+
+    def getlist(self, name):
+        return [part.value for part in self.fields.get(name, ())]
+
+    def getvalue(self, name, default=None):
+        if name not in self.fields:
+            return default
+
+        values = self.getlist(name)
+        return values[0] if len(values) == 1 else values
+
+
+class StringReader(object):
+    '''Minimal file-like object that reads from a string in place,
+    without copying it first.
+    '''
+    def __init__(self, data):
+        self.data = data or ''
+        self.pos = 0
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.data) - self.pos
+
+        data = self.data[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+
+def _parse_headers(head):
+    headers = HeaderDict()
+
+    for header in head.split(CRLF) if head else ():
+        name, sep, value = header.partition(':')
+
+        if sep:
+            headers.add(name.strip(), value.strip())
+
+    return headers
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.predicates
+~~~~~~~~~~~~~~~~~~~
+
+This module compiles the traffic predicates that request and response
+handlers declare, so the dispatcher can call only the handlers that
+want a message without parsing it for each of them.
+
+Components declare predicates as class attributes, all of them
+optional::
+
+    class LogJsonErrors(Component):
+        implements(IProxyResponseHandler)
+
+        match_hosts = ['*.example.com']      # globs, case-insensitive
+        match_paths = [r'^/api/']            # regexes, searched for
+        match_methods = ['GET', 'POST']
+        match_content_types = ['application/json', 'text/*']
+        match_status = [(400, 599)]          # codes or inclusive ranges
+        max_size = 1024 * 1024               # bytes, of the message
+
+A handler is called when every predicate it declares matches. Content
+types, status and size refer to the request for request handlers and
+to the response for response handlers; status is ignored for requests.
+'''
+from fnmatch import translate
+import re
+
+CRLF = '\r\n'
+
+MAX_HEAD_SIZE = 8192
+
+_CONTENT_TYPE = re.compile(r'^content-type:[ \t]*([^;\r\n]*)', re.I | re.M)
+
+# cheapest first, so most messages are turned down early
+_KINDS = ('max_size', 'match_hosts', 'match_methods', 'match_paths',
+          'match_status', 'match_content_types')
+
+
+def declares_predicates(component):
+    '''
+    Returns True if `component` declares any traffic predicates.
+    '''
+    return any(getattr(component, kind, None) is not None
+               for kind in _KINDS)
+
+
+class Matcher(object):
+    '''A single matcher for the predicates of a list of handlers.
+
+    Each distinct predicate is tested at most once per message, against
+    facts read from the start line and headers only.
+
+    :param components: The handler components, in dispatch order.
+    '''
+    def __init__(self, components):
+        self.size = len(components)
+        self._all = (1 << self.size) - 1
+        self._tests = []
+
+        for kind in _KINDS:
+            free = 0
+            tests = {}
+
+            for idx, component in enumerate(components):
+                value = getattr(component, kind, None)
+
+                if value is None:
+                    free |= 1 << idx
+                    continue
+
+                key = _key(kind, value)
+
+                if key not in tests:
+                    tests[key] = [_compile(kind, value), 0]
+
+                tests[key][1] |= 1 << idx
+
+            if tests:
+                self._tests.append((kind, free,
+                                    [tuple(test) for test in tests.values()]))
+
+    def __repr__(self):
+        return '<Matcher %d handlers, %s>' % (
+            self.size, ', '.join(kind for kind, _, _ in self._tests))
+
+    def match(self, messageInfo, messageIsRequest):
+        '''
+        Returns a bitmask of the handlers whose predicates all match
+        the message, bit `n` standing for the `n`-th handler.
+
+        :param messageInfo: The IHttpRequestResponse being dispatched.
+        :param messageIsRequest: Whether the request or the response is
+        being dispatched.
+        '''
+        facts = _Facts(messageInfo, messageIsRequest)
+        mask = self._all
+
+        for kind, free, tests in self._tests:
+            value = facts.get(kind)
+
+            if value is None:
+                # not applicable, i.e., status of a request
+                continue
+
+            allowed = free
+
+            for test, bits in tests:
+                if allowed & bits != bits and test(value):
+                    allowed |= bits
+
+            mask &= allowed
+
+            if not mask:
+                break
+
+        return mask
+
+    def select(self, messageInfo, messageIsRequest, *handlers):
+        '''
+        Returns the lists in `handlers` with only the entries whose
+        predicates match the message. The lists together must be in
+        the order of the components the matcher was created with.
+        '''
+        mask = self.match(messageInfo, messageIsRequest)
+        selected = []
+
+        for entries in handlers:
+            selected.append([entry for idx, entry in enumerate(entries)
+                             if mask >> idx & 1])
+            mask >>= len(entries)
+
+        return selected
+
+
+class _Facts(object):
+    '''
+    The parts of a message that predicates test, each read on first
+    use only.
+    '''
+    def __init__(self, messageInfo, messageIsRequest):
+        self.messageInfo = messageInfo
+        self.messageIsRequest = messageIsRequest
+        self._request = None
+        self._head = None
+
+    def get(self, kind):
+        return getattr(self, kind)()
+
+    def _message(self):
+        if self.messageIsRequest:
+            return self.messageInfo.getRequest()
+
+        return self.messageInfo.getResponse()
+
+    def _requestLine(self):
+        if self._request is None:
+            self._request = _head(self.messageInfo.getRequest(),
+                                  MAX_HEAD_SIZE).split(CRLF, 1)[0].split()
+
+        return self._request
+
+    def _headers(self):
+        if self._head is None:
+            self._head = _head(self._message(), MAX_HEAD_SIZE)
+
+        return self._head
+
+    def max_size(self):
+        message = self._message()
+        return len(message) if message is not None else 0
+
+    def match_hosts(self):
+        return self.messageInfo.getHost() or ''
+
+    def match_methods(self):
+        line = self._requestLine()
+        return line[0] if line else ''
+
+    def match_paths(self):
+        line = self._requestLine()
+
+        if len(line) < 2:
+            return ''
+
+        uri = line[1]
+
+        if not uri.startswith('/'):
+            # absolute-form, as sent to a proxy
+            idx = uri.find('/', uri.find('//') + 2)
+            uri = uri[idx:] if idx != -1 else '/'
+
+        return uri.split('?', 1)[0]
+
+    def match_status(self):
+        if self.messageIsRequest:
+            return
+
+        parts = self._headers().split(CRLF, 1)[0].split(None, 2)
+
+        try:
+            return int(parts[1])
+        except (IndexError, ValueError):
+            return -1
+
+    def match_content_types(self):
+        match = _CONTENT_TYPE.search(self._headers())
+        return match.group(1).strip().lower() if match else ''
+
+
+def _head(message, limit):
+    '''
+    Returns the start line and headers of a raw HTTP message, only
+    copying the first `limit` bytes out of it.
+    '''
+    if message is None:
+        return ''
+
+    head = message[:limit]
+
+    if not isinstance(head, str):
+        head = head.tostring()
+
+    idx = head.find(CRLF + CRLF)
+    return head[:idx] if idx != -1 else head
+
+
+def _key(kind, value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(value))
+
+    return value
+
+
+def _compile(kind, value):
+    '''
+    Returns a function testing a fact of the message against the
+    predicate `value` declared for `kind`.
+    '''
+    if kind == 'max_size':
+        return lambda size: size <= value
+
+    if isinstance(value, (basestring, int, long)):
+        value = [value]
+
+    if kind == 'match_hosts':
+        pattern = re.compile('|'.join(translate(glob) for glob in value),
+                             re.I)
+        return lambda host: pattern.match(host) is not None
+
+    if kind == 'match_paths':
+        pattern = re.compile('|'.join('(?:%s)' % (regex, )
+                                      for regex in value))
+        return lambda path: pattern.search(path) is not None
+
+    if kind == 'match_methods':
+        methods = frozenset(method.upper() for method in value)
+        return lambda method: method in methods
+
+    if kind == 'match_status':
+        ranges = []
+
+        for status in value:
+            if isinstance(status, (int, long)):
+                ranges.append((status, status))
+            else:
+                low, high = status
+                ranges.append((low, high))
+
+        return lambda code: any(low <= code <= high for low, high in ranges)
+
+    if kind == 'match_content_types':
+        pattern = re.compile('|'.join(translate(ctype.lower())
+                                      for ctype in value))
+        return lambda ctype: pattern.match(ctype) is not None
+
+    raise ValueError('Unknown predicate: %r' % (kind, ))
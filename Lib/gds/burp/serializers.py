@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.serializers
+~~~~~~~~~~~~~~~~~~~~
+
+This module implements a compact, versioned binary format for saving
+HTTP messages to disk, i.e., to snapshot `items` from the console and
+hand them over to offline analysis.
+
+Only the raw request and response, the HTTP service, comment and
+highlight are written. Everything else is parsed again, lazily, by the
+:class:`~gds.burp.models.HttpRequest`'s that are loaded.
+
+A stream starts with a 5 byte header, the magic `GDSM` followed by the
+format version, and is followed by one record per message::
+
+    flags (1), port (2), host length (4), request head length (4),
+    request body length (4), response head length (4), response body
+    length (4), comment length (4), highlight length (4),
+    host, request head, request body, response head, response body,
+    comment, highlight
+
+A body that was written or referred to recently is written as its 20
+byte SHA-1 digest instead, and flagged as such, so that identical
+bodies are stored once per file, or nearly. Recently means among the
+least recently used bodies of up to :data:`WINDOW` bytes in all, which
+is all a reader has to hold on to. Loaded messages share a single copy
+of each body.
+
+Strings are UTF-8 encoded and integers are big-endian. Version 1
+streams, which hold each request and response whole, and version 2
+streams, which have 2 byte host and comment lengths, a 1 byte
+highlight length, and refer to any body written before, can still be
+loaded.
+
+Scan issues are serialized by :func:`dumps_issue`, with the messages
+attached to them in the format above.
+'''
+from collections import OrderedDict
+from struct import Struct
+from urlparse import urlparse
+import cPickle
+
+from .bodies import DEFAULT_MAX_SIZE, MIN_SIZE, digest, split
+from .models import HttpRequest, HttpRequestResponse, ScanIssue, \
+    _get_service
+
+MAGIC = 'GDSM'
+VERSION = 3
+VERSIONS = (1, 2, 3)
+
+# bytes of the most recently used bodies that may be referred to
+WINDOW = DEFAULT_MAX_SIZE
+
+_HEADER = Struct('>4sB')
+_RECORDS = {
+    1: Struct('>BHHIIHB'),
+    2: Struct('>BHHIIIIHB'),
+    3: Struct('>BHIIIIIII'),
+}
+_RECORD = _RECORDS[VERSION]
+
+_HTTPS = 1
+_HAS_REQUEST = 2
+_HAS_RESPONSE = 4
+_REQUEST_BODY_REF = 8
+_RESPONSE_BODY_REF = 16
+
+_ISSUE_FIELDS = ('confidence', 'issueBackground', 'issueDetail',
+                 'issueName', 'issueType', 'remediationBackground',
+                 'remediationDetail', 'severity')
+
+
+def dumps(request):
+    '''
+    Returns a single request (an :class:`HttpRequest` or an
+    IHttpRequestResponse) serialized as a string.
+    '''
+    return ''.join([_HEADER.pack(MAGIC, VERSION), _pack(request)])
+
+
+def loads(data, _burp=None):
+    '''
+    Returns the :class:`HttpRequest` serialized in `data` by
+    :func:`dumps`.
+    '''
+    version = _check_header(data[:_HEADER.size])
+    request, _ = _unpack(data, _HEADER.size, _burp, version)
+    return request
+
+
+def dump(requests, fp):
+    '''
+    Writes an iterable of requests (:class:`HttpRequest`'s or
+    IHttpRequestResponse's) to the file object `fp`. Returns the number
+    of requests written.
+    '''
+    fp.write(_HEADER.pack(MAGIC, VERSION))
+    written = _Window(WINDOW)
+    count = 0
+
+    for request in requests:
+        fp.write(_pack(request, written))
+        count += 1
+
+    return count
+
+
+def load(fp, _burp=None):
+    '''
+    Returns a generator of the :class:`HttpRequest`'s read from the file
+    object `fp`, which must have been written by :func:`dump`.
+    '''
+    version = _check_header(fp.read(_HEADER.size))
+    struct = _RECORDS[version]
+    bodies = _Window(WINDOW if version > 2 else None)
+
+    while True:
+        record = fp.read(struct.size)
+
+        if not record:
+            return
+
+        if len(record) < struct.size:
+            raise ValueError('Truncated record')
+
+        payload = fp.read(sum(struct.unpack(record)[2:]))
+        request, _ = _unpack(record + payload, 0, _burp, version, bodies)
+
+        yield request
+
+
+def dumps_issue(issue):
+    '''
+    Returns a scan issue (a :class:`~gds.burp.models.ScanIssue` or an
+    IScanIssue) and the messages attached to it serialized as a string.
+    '''
+    service = issue.getHttpService()
+
+    fields = dict((name, getattr(issue, 'get%s%s' % (name[0].upper(),
+                                                     name[1:]))())
+                  for name in _ISSUE_FIELDS)
+
+    fields['url'] = unicode(issue.getUrl())
+    fields['service'] = (service.getHost(), service.getPort(),
+                         service.getProtocol())
+    fields['httpMessages'] = [dumps(message)
+                              for message in issue.getHttpMessages() or ()]
+
+    return cPickle.dumps(fields, 2)
+
+
+def loads_issue(data, _burp=None):
+    '''
+    Returns the :class:`~gds.burp.models.ScanIssue` serialized in
+    `data` by :func:`dumps_issue`.
+    '''
+    fields = cPickle.loads(data)
+    service = _get_service(*fields.pop('service'))
+
+    fields['httpMessages'] = [loads(message, _burp)._messageInfo
+                              for message in fields.pop('httpMessages')]
+    fields['url'] = urlparse(fields['url'])
+
+    return ScanIssue(httpService=service, host=service.host,
+                     port=service.port, protocol=service.protocol, **fields)
+
+
+def _check_header(header):
+    if len(header) < _HEADER.size:
+        raise ValueError('Truncated header')
+
+    magic, version = _HEADER.unpack(header)
+
+    if magic != MAGIC:
+        raise ValueError('Not a serialized message: %r' % (magic, ))
+
+    if version not in VERSIONS:
+        raise ValueError('Unsupported format version: %d' % (version, ))
+
+    return version
+
+
+def _fields(request):
+    if isinstance(request, HttpRequest):
+        messageInfo = request._messageInfo
+        response = request.__dict__.get('response')
+
+        if messageInfo is None or request.modified or \
+                response is not None and response.modified:
+            # with the edits not written back to Burp yet
+            return (request.protocol, request.host or '', request.port,
+                    _split(request.raw), _split(request.response.raw),
+                    request.comment, request.highlight)
+    else:
+        messageInfo = request
+
+    if isinstance(messageInfo, HttpRequestResponse):
+        # already held as head and body
+        message = messageInfo.request_parts
+        response = messageInfo.response_parts
+    else:
+        message = _split(messageInfo.getRequest())
+        response = _split(messageInfo.getResponse())
+
+    return (messageInfo.getProtocol(), messageInfo.getHost(),
+            messageInfo.getPort(), message, response,
+            messageInfo.getComment(), messageInfo.getHighlight())
+
+
+def _split(message):
+    if message is None:
+        return
+
+    if not isinstance(message, str):
+        message = message.tostring()
+
+    return split(message)
+
+
+def _pack(request, written=None):
+    protocol, host, port, message, response, comment, highlight = \
+        _fields(request)
+
+    flags = 0
+
+    if protocol == 'https':
+        flags |= _HTTPS
+
+    if message is not None:
+        flags |= _HAS_REQUEST
+
+    if response is not None:
+        flags |= _HAS_RESPONSE
+
+    message_head, message_body = message or ('', '')
+    response_head, response_body = response or ('', '')
+
+    if written is not None:
+        message_body, ref = _reference(message_body, written)
+        flags |= ref and _REQUEST_BODY_REF
+
+        response_body, ref = _reference(response_body, written)
+        flags |= ref and _RESPONSE_BODY_REF
+
+    host = _encode(host)
+    comment = _encode(comment)
+    highlight = _encode(highlight)
+
+    return ''.join([
+        _RECORD.pack(flags, port, len(host), len(message_head),
+                     len(message_body), len(response_head),
+                     len(response_body), len(comment), len(highlight)),
+        host, message_head, message_body, response_head, response_body,
+        comment, highlight])
+
+
+class _Window(object):
+    '''The bodies a stream may refer to, the most recently written or
+    referred to first, up to `size` bytes in all, or any number of them
+    if `size` is None. Readers hold the bodies, writers only their size,
+    and both drop the same ones.
+    '''
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        '''
+        Returns the `(length, body)` of `key`, or None, making it the
+        most recently used.
+        '''
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self._entries[key] = entry
+
+        return entry
+
+    def add(self, key, body, keep=True):
+        length = len(body)
+
+        if self.size is not None and length > self.size:
+            return
+
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self.used -= entry[0]
+
+        self._entries[key] = (length, body if keep else None)
+        self.used += length
+
+        while self.size is not None and self.used > self.size:
+            self.used -= self._entries.popitem(last=False)[1][0]
+
+
+def _reference(body, written):
+    '''
+    Returns the digest of `body` and True if it can be referred to,
+    else `body` and False, remembering it was written.
+    '''
+    if len(body) < MIN_SIZE:
+        return body, False
+
+    key = digest(body)
+
+    if written.get(key) is not None:
+        return key, True
+
+    written.add(key, body, False)
+    return body, False
+
+
+def _unpack(data, pos, _burp=None, version=VERSION, bodies=None):
+    struct = _RECORDS[version]
+    lengths = struct.unpack_from(data, pos)
+    flags, port = lengths[:2]
+
+    pos += struct.size
+    fields = []
+
+    for length in lengths[2:]:
+        fields.append(data[pos:pos + length])
+        pos += length
+
+    if pos > len(data):
+        raise ValueError('Truncated record')
+
+    if version == 1:
+        host, message, response, comment, highlight = fields
+        message = split(message) if flags & _HAS_REQUEST else None
+        response = split(response) if flags & _HAS_RESPONSE else None
+    else:
+        host, message_head, message_body, response_head, response_body, \
+            comment, highlight = fields
+
+        message = response = None
+
+        if flags & _HAS_REQUEST:
+            message = message_head, _dereference(
+                message_body, flags & _REQUEST_BODY_REF, bodies)
+
+        if flags & _HAS_RESPONSE:
+            response = response_head, _dereference(
+                response_body, flags & _RESPONSE_BODY_REF, bodies)
+
+    messageInfo = HttpRequestResponse.from_parts(
+        message, response,
+        _get_service(host.decode('utf-8'), port,
+                     u'https' if flags & _HTTPS else u'http'),
+        comment.decode('utf-8') or None,
+        highlight.decode('utf-8') or None)
+
+    return HttpRequest(messageInfo, _burp=_burp), pos
+
+
+def _dereference(body, is_reference, bodies):
+    if is_reference:
+        entry = bodies.get(body) if bodies is not None else None
+
+        if entry is None:
+            raise ValueError('Reference to a body not seen before')
+
+        return entry[1]
+
+    if bodies is not None and len(body) >= MIN_SIZE:
+        bodies.add(digest(body), body)
+
+    return body
+
+
+def _encode(value):
+    if not value:
+        return ''
+
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+
+    return str(value)
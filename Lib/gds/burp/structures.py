@@ -14,7 +14,13 @@ class CaseInsensitiveDict(OrderedDict):
     """Case-insensitive Dictionary
 
     For example, ``headers['content-encoding']`` will return the
-    value of a ``'Content-Encoding'`` response header."""
+    value of a ``'Content-Encoding'`` response header.
+
+    The lowercase index of keys is built on the first lookup, and kept
+    up to date from then on as keys are added and removed, so lookups
+    never have to rebuild it."""
+
+    _lower_keys = None
 
     def __repr__(self):
         return super(CaseInsensitiveDict, self).__repr__()
@@ -25,40 +31,218 @@ class CaseInsensitiveDict(OrderedDict):
 
     @property
     def lower_keys(self):
-        if not hasattr(self, '_lower_keys') or not self._lower_keys:
-            self._lower_keys = dict((k.lower(), k) for k in self.iterkeys())
+        if self._lower_keys is None:
+            self._lower_keys = dict((_lower(key), key)
+                                    for key in self.iterkeys())
         return self._lower_keys
 
-    def _clear_lower_keys(self):
-        if hasattr(self, '_lower_keys'):
-            self._lower_keys.clear()
-
     def __setitem__(self, key, value):
         if key in self:
             del self[key]
 
         super(CaseInsensitiveDict, self).__setitem__(key, value)
-        self._clear_lower_keys()
+        self.lower_keys[_lower(key)] = key
 
     def __delitem__(self, key):
+        lower = key.lower()
+        lower_keys = self.lower_keys
         super(CaseInsensitiveDict, self).__delitem__(
-            self.lower_keys.get(key.lower(), key))
-        self._lower_keys.clear()
+            lower_keys.get(lower, key))
+        del lower_keys[lower]
 
     def __contains__(self, key):
         return key.lower() in self.lower_keys
 
     def __getitem__(self, key):
         # We allow fall-through here, so values default to None
-        if key in self:
-            return super(CaseInsensitiveDict, self).__getitem__(
-                self.lower_keys[key.lower()])
+        key = self.lower_keys.get(key.lower())
+        if key is not None:
+            return super(CaseInsensitiveDict, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        key = self.lower_keys.get(key.lower())
+        if key is not None:
+            return super(CaseInsensitiveDict, self).__getitem__(key)
+        return default
+
+    def clear(self):
+        super(CaseInsensitiveDict, self).clear()
+        self._lower_keys = None
+
+
+class HeaderDict(CaseInsensitiveDict):
+    """Case-insensitive Dictionary of HTTP headers
+
+    Headers that are repeated in a message (i.e., ``Set-Cookie`` or
+    ``Via``) keep each of their values, in the order they were added.
+    ``headers['via']`` returns the values joined by a comma, while
+    ``headers.getlist('via')`` returns them as a list, and
+    ``headers.iterfields()`` yields each name and value pair with the
+    name cased as it was added.
+
+    Only repeated headers have their values kept apart, so that the
+    many headers seen once cost no more than their value, and repeated
+    headers are only joined when looked up.
+
+    ``modified`` is set once headers are added, changed or removed,
+    so a message knows whether it has to be written again."""
+
+    # created on the first repeated header, by lowercase name: every
+    # value, and every name once one differs in case from the first
+    _values = None
+    _names = None
+
+    def __init__(self, *args, **kwargs):
+        super(HeaderDict, self).__init__(*args, **kwargs)
+        self.modified = False
+
+    def __str__(self):
+        return '\r\n'.join(
+            ': '.join(field) for field in self.iterfields())
+
+    def __getitem__(self, key):
+        value = super(HeaderDict, self).__getitem__(key)
+
+        if value is not None and self._values:
+            values = self._values.get(key.lower())
+
+            if values is not None:
+                return ', '.join(values)
+
+        return value
 
     def get(self, key, default=None):
         if key in self:
             return self[key]
         return default
 
+    def __setitem__(self, key, value):
+        super(HeaderDict, self).__setitem__(key, value)
+        self._forget(key.lower())
+        self.modified = True
+
+    def __delitem__(self, key):
+        super(HeaderDict, self).__delitem__(key)
+        self._forget(key.lower())
+        self.modified = True
+
+    def clear(self):
+        super(HeaderDict, self).clear()
+        self._values = self._names = None
+        self.modified = True
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Returns the headers for a sequence of ``(name, value)``
+        pairs, i.e., as parsed from a message, with ``modified`` unset.
+        Unlike :meth:`add`, the lowercase index of names is left to be
+        built on the first lookup."""
+        headers = cls()
+
+        # the index is needed while filling in the headers, as inserting
+        # into an OrderedDict checks if the key is already in it
+        headers._lower_keys = first = {}
+
+        for key, value in fields:
+            lower = key.lower()
+            name = first.get(lower)
+
+            if name is None:
+                OrderedDict.__setitem__(headers, key, value)
+                first[lower] = key
+            else:
+                headers._append(lower, name, key, value)
+
+        headers._lower_keys = None
+        headers.modified = False
+        return headers
+
+    def add(self, key, value):
+        """Add a value for header `key`, keeping any values it already
+        has."""
+        lower = _lower(key)
+        lower_keys = self.lower_keys
+        first = lower_keys.get(lower)
+        self.modified = True
+
+        if first is None:
+            OrderedDict.__setitem__(self, key, value)
+            lower_keys[lower] = key
+        else:
+            self._append(lower, first, key, value)
+
+    def getlist(self, key):
+        """Return every value of header `key`, or an empty list."""
+        lower = key.lower()
+        values = self._values.get(lower) if self._values else None
+
+        if values is not None:
+            return list(values)
+
+        key = self.lower_keys.get(lower)
+
+        if key is None:
+            return []
+
+        return [OrderedDict.__getitem__(self, key)]
+
+    def iterfields(self):
+        """Yield a ``(name, value)`` pair for every value of every
+        header, in order, with each name cased as it was added."""
+        repeated = self._values or {}
+        cased = self._names or {}
+
+        for key in self.iterkeys():
+            lower = key.lower()
+            values = repeated.get(lower)
+
+            if values is None:
+                yield key, OrderedDict.__getitem__(self, key)
+                continue
+
+            names = cased.get(lower)
+
+            if names is None:
+                for value in values:
+                    yield key, value
+            else:
+                for field in zip(names, values):
+                    yield field
+
+    def _append(self, lower, first, key, value):
+        # adds another value of the header first added as `first`
+        if self._values is None:
+            self._values = {}
+
+        values = self._values.get(lower)
+
+        if values is None:
+            values = self._values[lower] = [
+                OrderedDict.__getitem__(self, first)]
+
+        # the names of repeated headers are only kept once they differ
+        # from the first one, which is the common case
+        names = self._names.get(lower) if self._names else None
+
+        if names is None and key != first:
+            if self._names is None:
+                self._names = {}
+
+            names = self._names[lower] = [first] * len(values)
+
+        if names is not None:
+            names.append(key)
+
+        values.append(value)
+
+    def _forget(self, lower):
+        if self._values is not None:
+            self._values.pop(lower, None)
+
+        if self._names is not None:
+            self._names.pop(lower, None)
+
+
 class LookupDict(dict):
     """Dictionary lookup object."""
 
@@ -76,3 +260,9 @@ class LookupDict(dict):
 
     def get(self, key, default=None):
         return self.__dict__.get(key, default)
+
+
+def _lower(key):
+    # header names repeat across messages, share their lowercase
+    lower = key.lower()
+    return intern(lower) if type(lower) is str else lower
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+'''
+gds.burp.workers
+~~~~~~~~~~~~~~~~
+
+This module contains a small, bounded pool of worker threads used to
+run work off of Burp's own threads, and a bounded delivery queue with
+a choice of what to do once it is full.
+
+Jython has no global interpreter lock, so the workers run in parallel
+on as many cores as are available.
+'''
+from Queue import Queue, Empty, Full
+from collections import deque
+from struct import Struct
+from tempfile import TemporaryFile
+from threading import Condition, Lock, Thread
+
+import logging
+import time
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 1000
+
+# what DeliveryQueue.put does once the queue is full
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+SPILL = 'spill'
+POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+_STOP = object()
+_LENGTH = Struct('>I')
+
+
+def _remaining(deadline):
+    # seconds left until `deadline`, or None to wait forever
+    if deadline is None:
+        return None
+
+    return max(deadline - time.time(), 0)
+
+
+class WorkerPool(object):
+    '''A fixed number of daemon threads consuming a bounded queue.
+
+    When the queue is full, :meth:`submit` runs the work on the calling
+    thread instead of dropping it, which slows the producer down to the
+    rate the workers can keep up with.
+
+    :param workers: Number of worker threads.
+    :param queue_size: Maximum number of pending calls.
+    :param name: Prefix of the worker thread names.
+    :param log: Logger that exceptions raised by the work are written
+    to.
+    '''
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 name='gds-burp-worker', log=None):
+        self.name = name
+        self.log = log or logging.getLogger(__name__)
+
+        self._queue = Queue(max(queue_size, 1))
+        self._lock = Lock()
+        self._threads = []
+        self._closed = False
+
+        self.submitted = 0
+        self.ranInline = 0
+
+        for idx in xrange(max(workers, 1)):
+            thread = Thread(target=self._run, name='%s-%d' % (name, idx))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __repr__(self):
+        return '<WorkerPool [%s] %d threads, %d pending>' % (
+            self.name, len(self._threads), self.pending)
+
+    @property
+    def pending(self):
+        '''
+        Number of calls waiting for a worker.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._queue.qsize()
+
+    @property
+    def closed(self):
+        '''
+        True once :meth:`shutdown` has been called.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._closed
+
+    def submit(self, func, *args):
+        '''
+        Calls `func` with `args` on one of the workers, or on the calling
+        thread if the queue is full or the pool has been shut down.
+
+        :param func: The callable to run.
+        '''
+        with self._lock:
+            self.submitted += 1
+
+            # checked under the lock, so nothing is queued behind the
+            # workers' stop markers, where it would never run
+            if not self._closed:
+                try:
+                    self._queue.put_nowait((func, args))
+                    return
+                except Full:
+                    pass
+
+            self.ranInline += 1
+
+        self._call(func, args)
+
+    def shutdown(self, wait=True, timeout=None):
+        '''
+        Stops the workers once the calls already queued have run.
+        Returns the number of workers still running, after `timeout`
+        seconds, if `wait` is true.
+
+        :param wait: If true, block until the workers have stopped.
+        :param timeout: Maximum number of seconds to wait, in all, or
+        None to wait for as long as it takes.
+        '''
+        with self._lock:
+            if self._closed:
+                return 0
+
+            self._closed = True
+
+        deadline = None if timeout is None else time.time() + timeout
+
+        for _ in self._threads:
+            # the queue may be full, block until there is room
+            try:
+                self._queue.put((_STOP, ()), True, _remaining(deadline))
+            except Full:
+                break
+
+        if not wait:
+            return 0
+
+        for thread in self._threads:
+            thread.join(_remaining(deadline))
+
+        return sum(1 for thread in self._threads if thread.isAlive())
+
+    def _call(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            self.log.exception('Error in worker call %r%r', func, args)
+
+    def _run(self):
+        while True:
+            func, args = self._queue.get()
+
+            if func is _STOP:
+                return
+
+            self._call(func, args)
+
+
+class DeliveryQueue(object):
+    '''A bounded queue of items handed, in order, to `target` by a
+    number of daemon threads.
+
+    Once `maxsize` items are waiting, :meth:`put` applies `policy`:
+
+    * `block` waits for room, slowing the producer down;
+    * `drop-oldest` drops the oldest waiting item to make room;
+    * `spill` writes the item to a temporary file, using `dumps`, and
+      reads it back with `loads` once the items before it are handed
+      over. The file is written and read without holding the queue's
+      lock, so producers never wait on each other's disk I/O, although
+      items put at the same time by different threads may be written
+      in either order.
+
+    :param target: Called with each item.
+    :param workers: Number of threads. Items are handed over in order,
+    but with more than one thread they may be handled out of order.
+    :param maxsize: Maximum number of items held in memory.
+    :param policy: One of :data:`POLICIES`.
+    :param directory: Where the spill file is created, defaults to the
+    system temporary directory.
+    :param dumps: Turns an item into a string, for `spill`.
+    :param loads: Turns a string back into an item, for `spill`.
+    :param name: Prefix of the thread names.
+    :param log: Logger that exceptions raised by `target` are written
+    to.
+    '''
+    def __init__(self, target, workers=1, maxsize=DEFAULT_QUEUE_SIZE,
+                 policy=BLOCK, directory=None, dumps=None, loads=None,
+                 name='gds-burp-delivery', log=None):
+        if policy not in POLICIES:
+            raise ValueError('Unknown policy %r, expected one of: %s' % (
+                             policy, ', '.join(POLICIES)))
+
+        if policy == SPILL and (dumps is None or loads is None):
+            raise ValueError('The spill policy needs dumps and loads')
+
+        self.target = target
+        self.maxsize = max(maxsize, 1)
+        self.policy = policy
+        self.directory = directory or None
+        self.name = name
+        self.log = log or logging.getLogger(__name__)
+
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+
+        self._dumps = dumps
+        self._loads = loads
+        self._items = deque()
+        self._cond = Condition(Lock())
+        self._unfinished = 0
+        self._closed = False
+
+        # guarded by _cond: items being written, and items written but
+        # not yet taken by a worker
+        self._spilling = 0
+        self._spillCount = 0
+
+        # guarded by _spillLock: the file, and the items left in it
+        self._spill = None
+        self._spillLock = Lock()
+        self._spillOffset = 0
+        self._spillRecords = 0
+
+        self._threads = []
+
+        for idx in xrange(max(workers, 1)):
+            thread = Thread(target=self._run, name='%s-%d' % (name, idx))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __len__(self):
+        return len(self._items) + self._spilling + self._spillCount
+
+    def __repr__(self):
+        return '<DeliveryQueue [%s] %s, %d pending, %d dropped, ' \
+            '%d spilled>' % (self.name, self.policy, len(self),
+                             self.dropped, self.spilled)
+
+    @property
+    def closed(self):
+        '''
+        True once :meth:`shutdown` has been called.
+
+        Note: This is a **read-only** attribute.
+        '''
+        return self._closed
+
+    def put(self, item):
+        '''
+        Queues `item` to be handed to `target`. Raises a
+        :class:`ValueError` once the queue has been shut down.
+        '''
+        spill = False
+
+        with self._cond:
+            if self._closed:
+                raise ValueError('%s is shut down' % (self.name, ))
+
+            full = len(self._items) >= self.maxsize
+
+            if self.policy == SPILL and \
+                    (full or self._spilling or self._spillCount):
+                # once anything is spilled, newer items follow it to
+                # disk, so that they are handed over in order
+                self._spilling += 1
+                spill = True
+
+            else:
+                if full and self.policy == BLOCK:
+                    while len(self._items) >= self.maxsize and \
+                            not self._closed:
+                        self._cond.wait()
+
+                elif full:
+                    self._items.popleft()
+                    self._unfinished -= 1
+                    self.dropped += 1
+
+                self._items.append(item)
+
+            self._unfinished += 1
+            self._cond.notify_all()
+
+        if spill:
+            self._write(item)
+
+    def flush(self, timeout=None):
+        '''
+        Waits until every item queued so far has been handled. Returns
+        False if `timeout` seconds passed first.
+        '''
+        with self._cond:
+            if timeout is None:
+                while self._unfinished:
+                    self._cond.wait()
+            else:
+                deadline = time.time() + timeout
+
+                while self._unfinished:
+                    remaining = deadline - time.time()
+
+                    if remaining <= 0:
+                        return False
+
+                    self._cond.wait(remaining)
+
+        return True
+
+    def shutdown(self, timeout=None):
+        '''
+        Hands over the items still queued, then stops the threads.
+        Returns the number of items left undelivered after `timeout`
+        seconds.
+        '''
+        self.flush(timeout)
+
+        with self._cond:
+            self._closed = True
+            left = len(self)
+            idle = not self._unfinished
+            self._cond.notify_all()
+
+        # the workers keep reading what is left, if anything
+        if idle:
+            with self._spillLock:
+                if self._spill is not None:
+                    self._spill.close()
+                    self._spill = None
+
+        if not left:
+            for thread in self._threads:
+                thread.join(timeout)
+
+        return left
+
+    def _get(self):
+        with self._cond:
+            while not self._items and not self._spillCount:
+                if self._closed and not self._spilling:
+                    raise Empty
+
+                self._cond.wait()
+
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+
+            self._spillCount -= 1
+
+        return self._read()
+
+    def _done(self):
+        with self._cond:
+            self._unfinished -= 1
+            self.delivered += 1
+            self._cond.notify_all()
+
+    def _write(self, item):
+        try:
+            data = self._dumps(item)
+
+            with self._spillLock:
+                if self._spill is None:
+                    self._spill = TemporaryFile(prefix='gds-burp-',
+                                                suffix='.spill',
+                                                dir=self.directory)
+
+                self._spill.seek(0, 2)
+                self._spill.write(_LENGTH.pack(len(data)))
+                self._spill.write(data)
+                self._spillRecords += 1
+
+        except Exception:
+            with self._cond:
+                self._spilling -= 1
+                self._unfinished -= 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._spilling -= 1
+            self._spillCount += 1
+            self.spilled += 1
+            self._cond.notify_all()
+
+    def _read(self):
+        with self._spillLock:
+            self._spill.seek(self._spillOffset)
+            length, = _LENGTH.unpack(self._spill.read(_LENGTH.size))
+            data = self._spill.read(length)
+            self._spillRecords -= 1
+
+            if self._spillRecords:
+                self._spillOffset += _LENGTH.size + length
+            else:
+                # everything on disk was read back, start over
+                self._spill.seek(0)
+                self._spill.truncate()
+                self._spillOffset = 0
+
+        return self._loads(data)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._get()
+            except Empty:
+                return
+            except Exception:
+                self.log.exception('Could not read back a spilled item')
+                self._done()
+                continue
+
+            try:
+                self.target(item)
+            except Exception:
+                self.log.exception('Error delivering %r', item)
+            finally:
+                self._done()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+'''
+Throughput and memory of parsing a batch of requests with their
+responses, one of:
+
+  single   an HttpRequest per message, parsed one at a time
+  bulk     parse_messages(), which shares hosts and short header lines
+           across the batch
+
+Both read the method and status code of every message, and with
+`--headers` their headers as well. Run each in its own process. See
+common.py for how to compare two revisions.
+'''
+import time
+
+import common
+
+MODES = ('single', 'bulk')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 ' \
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+
+def request(idx):
+    return 'GET /app/page/%d HTTP/1.1\r\nHost: app%d.corp.example.com\r\n' \
+        'User-Agent: %s\r\nAccept: text/html,application/xhtml+xml\r\n' \
+        'Accept-Language: en-US,en;q=0.9\r\n' \
+        'Accept-Encoding: gzip, deflate\r\nConnection: keep-alive\r\n' \
+        'Cookie: s=%d\r\n\r\n' % (idx, idx % 5, USER_AGENT, idx)
+
+
+def response(idx):
+    return 'HTTP/1.1 200 OK\r\nServer: nginx\r\n' \
+        'Content-Type: text/html; charset=utf-8\r\n' \
+        'Cache-Control: no-cache, no-store\r\nX-Frame-Options: DENY\r\n' \
+        'Via: 1.1 proxy.corp\r\nContent-Length: 12\r\n' \
+        'Date: Mon, 01 Jan 2024 00:00:%02d GMT\r\n\r\nhello world!' % (
+            idx % 60, )
+
+
+def main():
+    parser = common.parser(__doc__, 10000)
+    parser.add_argument('mode', choices=MODES)
+    parser.add_argument('--headers', action='store_true',
+                        help='read the headers of every message too')
+    args = common.parse_args(parser)
+
+    from gds.burp import models
+
+    if args.mode == 'bulk' and not hasattr(models, 'parse_messages'):
+        parser.exit(1, 'No parse_messages in %s\n' % (args.lib, ))
+
+    # every message holds its own copies, as Burp's do
+    items = [common.FakeMessageInfo(
+             request(idx), response(idx),
+             ''.join(list('app%d.corp.example.com' % (idx % 5, ))))
+             for idx in xrange(args.number)]
+
+    before = common.memory_used()
+    start = time.time()
+
+    if args.mode == 'bulk':
+        parsed = models.parse_messages(items)
+    else:
+        parsed = [models.HttpRequest(item) for item in items]
+
+    for item in parsed:
+        item.method
+        item.response.status_code
+
+        if args.headers:
+            item.headers
+            item.response.headers
+
+    elapsed = time.time() - start
+    used = common.memory_used() - before
+
+    print '%-6s %6.0f msg/s %6d bytes/message' % (
+        args.mode, len(parsed) / elapsed, used / len(parsed))
+
+
+if __name__ == '__main__':
+    main()
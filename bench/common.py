@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+'''
+Helpers shared by the benchmarks.
+
+Run a benchmark from the top of the repository with Jython, or with
+CPython 2.7 given stand-ins for the `java` and `burp` packages on the
+`PYTHONPATH`::
+
+    $ jython bench/headers.py
+
+Each benchmark measures the `gds.burp` in `Lib`. To compare with
+another revision, check it out elsewhere and point `--lib` at its `Lib`
+directory::
+
+    $ git worktree add /tmp/baseline <revision>
+    $ jython bench/headers.py --lib /tmp/baseline/Lib
+'''
+from array import array
+import argparse
+import gc
+import os
+import sys
+import time
+
+LIB = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'Lib')
+
+HEADERS = [
+    'Host: intranet.corp.example.com',
+    'User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+    'AppleWebKit/537.36',
+    'Accept: text/html,application/xhtml+xml',
+    'Accept-Language: en-US,en;q=0.9',
+    'Accept-Encoding: gzip, deflate, br',
+    'Connection: keep-alive',
+    'Cookie: SESSION=abcdef0123456789; _ga=GA1.2.3; _gid=GA1.2.4',
+] + [
+    'Via: 1.1 proxy%d.corp.example.com' % (idx, ) for idx in range(6)
+] + [
+    'X-Forwarded-For: 10.0.%d.1' % (idx, ) for idx in range(4)
+] + [
+    'X-Corp-Header-%d: value-%d' % (idx, idx) for idx in range(30)
+]
+
+SET_COOKIES = ['Set-Cookie: c%d=%s; Path=/; HttpOnly; Secure' % (
+               idx, 'x' * 32) for idx in range(12)]
+
+
+def parser(description, number):
+    '''
+    Returns an :class:`argparse.ArgumentParser` taking `--lib` and
+    `--number`, the number of messages, defaulting to `number`.
+    '''
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--lib', default=LIB,
+                        help='the Lib directory holding the gds.burp to '
+                        'measure (default: %(default)s)')
+    parser.add_argument('-n', '--number', type=int, default=number,
+                        help='number of messages (default: %(default)s)')
+    return parser
+
+
+def parse_args(parser):
+    '''
+    Parses the command line and puts the `--lib` directory first on
+    `sys.path`, so that `gds.burp` is imported from there.
+    '''
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(args.lib))
+    return args
+
+
+def corporate_request(path='/portal/home?x=1'):
+    '''
+    Returns a request with 47 headers, i.e., repeated Via and
+    X-Forwarded-For headers added by corporate proxies.
+    '''
+    return 'GET %s HTTP/1.1\r\n%s\r\n\r\n' % (path, '\r\n'.join(HEADERS))
+
+
+def corporate_response(body='x' * 4096):
+    '''
+    Returns a response with 54 headers, 12 of them Set-Cookie.
+    '''
+    return 'HTTP/1.1 200 OK\r\n%s\r\n\r\n%s' % (
+        '\r\n'.join(HEADERS[5:] + SET_COOKIES), body)
+
+
+class FakeMessageInfo(object):
+    '''
+    An IHttpRequestResponse handing out copies of its messages, as Burp
+    does.
+    '''
+    def __init__(self, request, response=None, host='example.com',
+                 port=80, protocol='http'):
+        self._request = array('b', request)
+        self._response = array('b', response) if response else None
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+
+    # Jython exposes getters of Java objects as properties too
+    request = property(lambda self: self.getRequest())
+    response = property(lambda self: self.getResponse())
+
+    def getRequest(self):
+        return array('b', self._request)
+
+    def getResponse(self):
+        if self._response is not None:
+            return array('b', self._response)
+
+    def setRequest(self, message):
+        self._request = array('b', message)
+
+    def setResponse(self, message):
+        self._response = array('b', message)
+
+    def getHost(self):
+        return self.host
+
+    def getPort(self):
+        return self.port
+
+    def getProtocol(self):
+        return self.protocol
+
+    def getHttpService(self):
+        return self
+
+    def getComment(self):
+        return None
+
+    def getHighlight(self):
+        return None
+
+
+def rate(func, number):
+    '''
+    Returns how many times per second `func` runs, calling it `number`
+    times.
+    '''
+    start = time.time()
+
+    for _ in xrange(number):
+        func()
+
+    return number / (time.time() - start)
+
+
+def memory_used():
+    '''
+    Returns the bytes of heap in use on Jython, else the resident set
+    size of the process, after a garbage collection.
+    '''
+    gc.collect()
+
+    try:
+        from java.lang import Runtime, System
+    except ImportError:
+        pass
+    else:
+        if hasattr(Runtime, 'getRuntime'):
+            System.gc()
+            runtime = Runtime.getRuntime()
+            return runtime.totalMemory() - runtime.freeMemory()
+
+    with open('/proc/self/statm') as fp:
+        return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
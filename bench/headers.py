@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+'''
+Parsing throughput of header-heavy corporate traffic: a request with 47
+headers and a response with 54, 12 of them Set-Cookie, and a 4KB body.
+See common.py for how to compare two revisions.
+'''
+import common
+
+
+def main():
+    args = common.parse_args(common.parser(__doc__, 5000))
+
+    from gds.burp.models import _parse_message
+
+    request = common.corporate_request()
+    response = common.corporate_response()
+
+    def parse():
+        _parse_message(request)
+        _parse_message(response)
+
+    print '%.0f msg/s' % (2 * common.rate(parse, args.number), )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+'''
+Memory held per message by a list of wrapped proxy history items, after
+reading the method, status code and host of each, for one kind of
+wrapper:
+
+  request    HttpRequest
+  unparsed   HttpRequest, reading the host only, so nothing is parsed
+  compact    CompactHttpRequest
+
+The messages are a short request and a response with a 2KB body, or
+with `--corporate` the header-heavy messages of headers.py. Run each
+kind in its own process. See common.py for how to compare two
+revisions.
+'''
+import common
+
+KINDS = ('request', 'unparsed', 'compact')
+
+
+def main():
+    parser = common.parser(__doc__, 20000)
+    parser.add_argument('kind', choices=KINDS)
+    parser.add_argument('--corporate', action='store_true',
+                        help='use header-heavy messages')
+    args = common.parse_args(parser)
+
+    from gds.burp import models
+
+    if args.kind == 'compact' and not hasattr(models, 'CompactHttpRequest'):
+        parser.exit(1, 'No CompactHttpRequest in %s\n' % (args.lib, ))
+
+    if args.corporate:
+        request = common.corporate_request('/portal/%d')
+        response = common.corporate_response('x' * 2000)
+    else:
+        request = 'GET /portal/%d HTTP/1.1\r\nHost: example.com\r\n' \
+            'Accept: */*\r\nCookie: a=b\r\n\r\n'
+        response = 'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n' \
+            'Set-Cookie: a=1\r\nContent-Length: 2000\r\n\r\n' + 'x' * 2000
+
+    items = [common.FakeMessageInfo(request.replace('%d', str(idx)),
+                                    response, 'h%d.example.com' % (idx % 20, ))
+             for idx in xrange(args.number)]
+
+    before = common.memory_used()
+
+    if args.kind == 'compact':
+        wrapped = [models.CompactHttpRequest(item) for item in items]
+        [(r.method, r.status_code, r.host) for r in wrapped]
+    elif args.kind == 'unparsed':
+        wrapped = [models.HttpRequest(item) for item in items]
+        [r.host for r in wrapped]
+    else:
+        wrapped = [models.HttpRequest(item) for item in items]
+        [(r.method, r.response.status_code, r.host) for r in wrapped]
+
+    used = common.memory_used() - before
+    print '%-10s %6d bytes/message' % (args.kind, used / len(wrapped))
+
+
+if __name__ == '__main__':
+    main()
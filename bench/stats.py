@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+'''
+Cost of keeping per-handler stats, measured as the rate at which Burp
+Proxy requests go through ten inline handlers that do nothing, one of:
+
+  off      stats disabled, the default
+  every    stats enabled, every call timed (stats_sample = 1)
+  sampled  stats enabled, one call in 16 timed (stats_sample = 16)
+
+Run each in its own process. See common.py for how to compare two
+revisions.
+'''
+import logging
+import os
+import tempfile
+
+import common
+
+MODES = {
+    'off': 'stats = false\n',
+    'every': 'stats = true\nstats_sample = 1\n',
+    'sampled': 'stats = true\nstats_sample = 16\n',
+}
+
+HANDLERS = 10
+
+
+def main():
+    parser = common.parser(__doc__, 20000)
+    parser.add_argument('mode', choices=sorted(MODES))
+    args = common.parse_args(parser)
+
+    from gds.burp.api import IProxyRequestHandler
+    from gds.burp.config import Configuration
+    from gds.burp.core import Component, ComponentManager
+    from gds.burp.dispatchers import PluginDispatcher
+
+    names = ['NoopHandler%d' % (idx, ) for idx in xrange(HANDLERS)]
+
+    for name in names:
+        # what implements() would declare in a class statement
+        type(name, (Component, ), {
+            '__module__': __name__,
+            '_implements': [IProxyRequestHandler],
+            'processRequest': lambda self, request: None,
+        })
+
+    fd, filename = tempfile.mkstemp(suffix='.ini')
+    os.write(fd, '[handlers]\nproxy.request = %s\n[dispatch]\n%s' % (
+             ', '.join(names), MODES[args.mode]))
+    os.close(fd)
+
+    class Burp(ComponentManager):
+        def __init__(self):
+            ComponentManager.__init__(self)
+            self.config = Configuration(filename)
+
+        def componentActivated(self, component):
+            component.burp = self
+            component.config = self.config
+            component.log = logging.getLogger('bench')
+
+    try:
+        dispatcher = PluginDispatcher(Burp())
+        items = [common.FakeMessageInfo(common.corporate_request('/%d' % (
+                 idx, ))) for idx in xrange(args.number)]
+        items = iter(items)
+
+        rate = common.rate(
+            lambda: dispatcher.processHttpMessage('Proxy', True, next(items)),
+            args.number)
+    finally:
+        os.remove(filename)
+
+    print '%-8s %8.0f msg/s  %6.2f us/handler call' % (
+        args.mode, rate, 1e6 / rate / HANDLERS)
+
+
+if __name__ == '__main__':
+    main()
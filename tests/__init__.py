@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for gds.burp, run from the top of the repository with Jython::
+
+    $ jython -m unittest discover -t . -s tests
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'Lib'))
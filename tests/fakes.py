@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+'''
+Stand-ins for the parts of Burp the tests need.
+'''
+from gds.burp.config import Configuration
+from gds.burp.core import ComponentManager
+from gds.burp.models import HttpRequestResponse, _get_service
+
+import logging
+
+
+def message(path='/', body='', status=200, response_body='hello',
+            host='example.com', headers=''):
+    '''
+    Returns a detached IHttpRequestResponse for a request to `path`.
+    '''
+    request = '%s %s HTTP/1.1\r\nHost: %s\r\n%s\r\n%s' % (
+        'POST' if body else 'GET', path, host, headers, body)
+    response = 'HTTP/1.1 %d OK\r\nContent-Type: text/plain\r\n' \
+        'Content-Length: %d\r\n\r\n%s' % (status, len(response_body),
+                                           response_body)
+
+    return HttpRequestResponse(request, response,
+                               _get_service(host, 80, 'http'))
+
+
+class FakeBurp(ComponentManager):
+    '''
+    Enough of the :class:`BurpExtender` for components, and for the
+    views of the proxy history.
+
+    :param filename: The configuration file.
+    :param items: The proxy history.
+    '''
+    def __init__(self, filename, items=()):
+        ComponentManager.__init__(self)
+        self.config = Configuration(filename)
+        self.log = logging.getLogger('tests')
+        self.items = list(items)
+        self.fetches = 0
+
+    def componentActivated(self, component):
+        component.burp = self
+        component.config = self.config
+        component.log = self.log
+
+    def getProxyHistory(self):
+        return self.items
+
+    def _check_and_callback(self, method, *args):
+        # Burp hands out a copy of its array
+        self.fetches += 1
+        return list(method(*args))
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from gds.burp.archive import Archive, prepare
+
+from .fakes import FakeBurp, message
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.ini')
+        os.write(fd, '[archive]\n'
+                     'enabled = true\n'
+                     'path = :memory:\n'
+                     'tools = Proxy\n')
+        os.close(fd)
+
+        self.burp = FakeBurp(self.filename)
+        self.archive = Archive(self.burp)
+
+    def tearDown(self):
+        self.archive.close(5)
+        os.remove(self.filename)
+
+    def record(self, *messages, **kwargs):
+        for messageInfo in messages:
+            self.archive.record(kwargs.get('tool', 'Proxy'), False,
+                                messageInfo)
+
+        self.assertTrue(self.archive.flush(5))
+
+    def test_where(self):
+        self.record(message('/a'), message('/b', status=500),
+                    message('/c', body='x=1', host='other.example.com'))
+        self.record(message('/d'), tool='Repeater')
+
+        self.assertEqual(self.archive.count(), 3)
+
+        found = self.archive.where(status=(500, 599))
+        self.assertEqual([item.url.path for item in found], ['/b'])
+        self.assertEqual(found[0].status_code, 500)
+
+        found = self.archive.where(host='other.*', method='post')
+        self.assertEqual([item.url.path for item in found], ['/c'])
+        self.assertEqual((found[0].host, found[0].port, found[0].protocol),
+                         ('other.example.com', 80, 'http'))
+
+        # anything else is loaded from the archive
+        self.assertEqual(found[0].body, 'x=1')
+        self.assertEqual(found[0].response.status_code, 200)
+
+    def test_search(self):
+        self.record(message('/a', body='password=hunter2'),
+                    message('/b', response_body='access denied'),
+                    message('/c', body='user=admin'))
+
+        self.assertEqual([item.url.path for item in
+                          self.archive.search('password')], ['/a'])
+        self.assertEqual([item.url.path for item in
+                          self.archive.search('"access denied"')], ['/b'])
+        self.assertEqual(self.archive.search('nothing'), [])
+
+    def test_bodies_are_stored_once(self):
+        body = 'x' * 1000
+        self.record(*[message('/%d' % (idx, ), response_body=body)
+                      for idx in range(3)])
+
+        stats = self.archive.stats()
+        self.assertEqual((stats['bodies'], stats['references']), (1, 3))
+        self.assertEqual(stats['saved'], 2000)
+
+        first, second = [item.expand()._messageInfo.response_parts[1]
+                         for item in self.archive.where(limit=2)]
+        self.assertEqual(first, body)
+        self.assertTrue(first is second)
+
+
+class MigrationTest(unittest.TestCase):
+    def test_renamed_columns(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE messages (id INTEGER PRIMARY KEY, '
+                     'time REAL NOT NULL, tool TEXT NOT NULL, '
+                     'protocol TEXT NOT NULL, host TEXT NOT NULL, '
+                     'port INTEGER NOT NULL, method TEXT, url TEXT, '
+                     'status INTEGER, mime TEXT, request BLOB, '
+                     'response BLOB, request_body TEXT, '
+                     'response_body TEXT)')
+        conn.execute("INSERT INTO messages VALUES (1, 0, 'Proxy', 'http', "
+                     "'example.com', 80, 'GET', 'http://example.com/', "
+                     "200, 'text/plain', '', '', NULL, 'abc')")
+
+        prepare(conn)
+        prepare(conn)
+
+        self.assertEqual(conn.execute('SELECT request_hash, response_hash '
+                                      'FROM messages').fetchall(),
+                         [(None, 'abc')])
+
+    def test_added_columns(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE messages (id INTEGER PRIMARY KEY, '
+                     'time REAL NOT NULL, tool TEXT NOT NULL, '
+                     'protocol TEXT NOT NULL, host TEXT NOT NULL, '
+                     'port INTEGER NOT NULL, method TEXT, url TEXT, '
+                     'status INTEGER, mime TEXT, request BLOB, '
+                     'response BLOB)')
+
+        prepare(conn)
+
+        columns = [row[1] for row in
+                   conn.execute('PRAGMA table_info(messages)').fetchall()]
+        self.assertEqual(columns[-2:], ['request_hash', 'response_hash'])
+
+
+if __name__ == '__main__':
+    unittest.main()
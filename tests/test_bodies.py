@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp.bodies import BodyStore, digest, split
+from gds.burp.models import HttpRequestResponse
+
+
+class BodyStoreTest(unittest.TestCase):
+    def test_identical_bodies_are_shared(self):
+        store = BodyStore(1024, 4)
+        first = store.intern('x' * 100)
+        second = store.intern(''.join(['x'] * 100))
+
+        self.assertTrue(first is second)
+        self.assertEqual(store.stats()['saved'], 100)
+        self.assertEqual(store.ratio, 2.0)
+
+    def test_small_bodies_are_passed_through(self):
+        store = BodyStore(1024, 64)
+        store.intern('x' * 10)
+
+        self.assertEqual(len(store), 0)
+
+    def test_oversized_body_is_not_stored(self):
+        store = BodyStore(100, 4)
+        body = 'x' * 101
+
+        self.assertTrue(store.intern(body) is body)
+        self.assertEqual((len(store), store.size), (0, 0))
+
+    def test_evicts_down_to_nothing(self):
+        store = BodyStore(100, 4)
+        store.intern('a' * 60)
+        store.intern('b' * 60)
+
+        self.assertFalse(digest('a' * 60) in store)
+        self.assertEqual((len(store), store.size, store.evicted), (1, 60, 1))
+
+        store.max_size = 50
+        store.intern('c' * 40)
+
+        self.assertEqual((len(store), store.size), (1, 40))
+
+    def test_explicit_key(self):
+        store = BodyStore(1024, 4)
+        store.intern('x' * 10, 'key')
+
+        self.assertEqual(store.get('key'), 'x' * 10)
+
+
+class PartsTest(unittest.TestCase):
+    def test_split(self):
+        self.assertEqual(split('GET / HTTP/1.1\r\n\r\nbody'),
+                         ('GET / HTTP/1.1\r\n\r\n', 'body'))
+        self.assertEqual(split('HTTP/1.1 200 OK'), ('HTTP/1.1 200 OK', ''))
+
+    def test_copies_are_plain_and_parts_are_joined(self):
+        body = 'x' * 100
+        message = HttpRequestResponse.from_parts(
+            ('GET / HTTP/1.1\r\n\r\n', body), None)
+
+        self.assertEqual(message.getRequest().tostring(),
+                         'GET / HTTP/1.1\r\n\r\n' + body)
+        self.assertTrue(message.request_parts[1] is body)
+        self.assertEqual(message.getResponse(), None)
+
+        copied = HttpRequestResponse('GET / HTTP/1.1\r\n\r\n' + body)
+        self.assertTrue(isinstance(copied._request, str))
+        self.assertEqual(copied.request_parts[1], body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp.budgets import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_trips_after_threshold_overruns(self):
+        breaker = CircuitBreaker(10, threshold=2, window=3, cooldown=1)
+
+        self.assertFalse(breaker.record(20, 0))
+        self.assertFalse(breaker.record(5, 0))
+        self.assertTrue(breaker.record(30, 100))
+
+        self.assertTrue(breaker.isOpen)
+        self.assertEqual(breaker.trips, 1)
+        self.assertFalse(breaker.allow(500))
+
+    def test_overruns_leave_the_window(self):
+        breaker = CircuitBreaker(10, threshold=2, window=2)
+
+        for elapsed in (20, 5, 20, 5, 20, 5):
+            self.assertFalse(breaker.record(elapsed, 0))
+
+        self.assertFalse(breaker.isOpen)
+
+    def test_closes_after_cooldown(self):
+        breaker = CircuitBreaker(10, threshold=1, window=1, cooldown=1)
+        self.assertTrue(breaker.record(20, 100))
+
+        self.assertFalse(breaker.allow(1099))
+        self.assertTrue(breaker.allow(1100))
+        self.assertFalse(breaker.isOpen)
+
+        # the calls before the trip are forgotten
+        self.assertFalse(breaker.record(5, 1200))
+
+    def test_stuck_calls_trip(self):
+        breaker = CircuitBreaker(10, threshold=2, window=5, cooldown=1)
+        first = breaker.begin(0)
+        second = breaker.begin(5)
+
+        # neither call has returned, but both are over budget
+        self.assertEqual(breaker.begin(20), None)
+        self.assertTrue(breaker.isOpen)
+
+        # still stuck after the cool-down
+        self.assertTrue(breaker.allow(1020))
+        self.assertEqual(breaker.begin(1020), None)
+        self.assertEqual(breaker.trips, 2)
+
+        breaker.end(first)
+        breaker.end(second)
+        self.assertTrue(breaker.allow(2020))
+        self.assertEqual(breaker.begin(2020), 2020)
+
+
+if __name__ == '__main__':
+    unittest.main()
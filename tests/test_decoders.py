@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from StringIO import StringIO
+import gzip
+import unittest
+import zlib
+
+from gds.burp.decoders import iter_decoded
+from gds.burp.models import HttpRequest
+
+from .fakes import message
+
+TEXT = 'hello, world\n' * 1000
+
+
+def gzipped(data):
+    fp = StringIO()
+
+    with gzip.GzipFile(fileobj=fp, mode='wb', filename='a.txt') as zfp:
+        zfp.write(data)
+
+    return fp.getvalue()
+
+
+def chunked(data, size=100):
+    chunks = ['%x\r\n%s\r\n' % (len(data[idx:idx + size]),
+                                data[idx:idx + size])
+              for idx in range(0, len(data), size)]
+    return ''.join(chunks) + '0\r\n\r\n'
+
+
+def decoded(*args, **kwargs):
+    return ''.join(iter_decoded(*args, **kwargs))
+
+
+class DecodersTest(unittest.TestCase):
+    def test_chunked_gzip(self):
+        body = chunked(gzipped(TEXT))
+
+        self.assertEqual(decoded(body, 'chunked', 'gzip'), TEXT)
+
+    def test_deflate_with_zlib_header(self):
+        self.assertEqual(decoded(zlib.compress(TEXT), '', 'deflate'), TEXT)
+
+    def test_deflate_without_zlib_header(self):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        body = compressor.compress(TEXT) + compressor.flush()
+
+        self.assertEqual(decoded(body, '', 'deflate'), TEXT)
+
+    def test_pieces_are_bounded(self):
+        pieces = list(iter_decoded(gzipped(TEXT), '', 'gzip',
+                                   chunk_size=1000))
+
+        self.assertEqual(max(len(piece) for piece in pieces), 1000)
+        self.assertEqual(''.join(pieces), TEXT)
+
+    def test_size_cap(self):
+        bomb = gzipped('\x00' * (1024 * 1024))
+
+        self.assertRaises(ValueError, decoded, bomb, '', 'gzip',
+                          max_size=64 * 1024)
+        self.assertEqual(len(decoded(bomb, '', 'gzip')), 1024 * 1024)
+
+    def test_unsupported_coding(self):
+        self.assertRaises(ValueError, decoded, 'x', '', 'br')
+
+    def test_decoded_body_raises(self):
+        response = HttpRequest(message(
+            '/', response_body='x')).response
+        response.headers['Content-Encoding'] = 'br'
+
+        self.assertRaises(ValueError, getattr, response, 'decoded_body')
+        self.assertEqual(response.body, 'x')
+        self.assertEqual(response.json, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+from threading import Event, Lock
+import os
+import tempfile
+import time
+import unittest
+
+from gds.burp.api import IObserveOnlyHandler, IIntruderRequestBatchHandler, \
+    IIntruderRequestHandler, INewScanIssueHandler
+from gds.burp.core import Component, implements
+from gds.burp.dispatchers import NewScanIssueDispatcher, PluginDispatcher
+from gds.burp.models import _get_service
+from gds.burp.stats import DispatchStats
+
+from .fakes import FakeBurp, message
+
+_seen = []
+_lock = Lock()
+
+
+def _observe(handler, request):
+    with _lock:
+        _seen.append((handler.__class__.__name__, request,
+                      request.headers.get('x-seen')))
+
+    # would show up in the other handlers' copies if they were shared
+    request.headers['X-Seen'] = handler.__class__.__name__
+
+
+class _Observer(object):
+    implements(IIntruderRequestHandler, IObserveOnlyHandler)
+
+    def processRequest(self, request):
+        _observe(self, request)
+
+
+class SnapshotObserverA(_Observer, Component):
+    pass
+
+
+class SnapshotObserverB(_Observer, Component):
+    pass
+
+
+class _BatchHandler(object):
+    implements(IIntruderRequestBatchHandler)
+
+    def processRequests(self, batch):
+        for request in batch:
+            _observe(self, request)
+
+
+class SnapshotBatchHandlerA(_BatchHandler, Component):
+    pass
+
+
+class SnapshotBatchHandlerB(_BatchHandler, Component):
+    pass
+
+
+class ObserverTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.ini')
+        os.write(fd, '[handlers]\n'
+                     'intruder.request = SnapshotObserverA, SnapshotObserverB\n'
+                     'intruder.request.batch = SnapshotBatchHandlerA, '
+                     'SnapshotBatchHandlerB\n')
+        os.close(fd)
+
+        self.burp = FakeBurp(self.filename)
+        self.dispatcher = PluginDispatcher(self.burp)
+        del _seen[:]
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+        os.remove(self.filename)
+
+    def test_each_observer_gets_its_own_snapshot(self):
+        messageInfo = message('/a')
+        self.dispatcher.processHttpMessage('Intruder', True, messageInfo)
+        self.dispatcher.shutdown()
+
+        self.assertEqual(sorted(name for name, _, _ in _seen),
+                         ['SnapshotBatchHandlerA', 'SnapshotBatchHandlerB',
+                          'SnapshotObserverA', 'SnapshotObserverB'])
+        self.assertEqual(len(set(id(request) for _, request, _ in _seen)), 4)
+        self.assertEqual([seen for _, _, seen in _seen], [None] * 4)
+        self.assertFalse('X-Seen' in messageInfo.getRequest().tostring())
+
+    def test_no_pool_or_batchers_after_shutdown(self):
+        self.dispatcher.shutdown()
+        self.assertEqual(self.dispatcher.pool, None)
+
+        # run on the calling thread instead
+        self.dispatcher.processHttpMessage('Intruder', True, message('/a'))
+        self.assertEqual(len(_seen), 4)
+        self.assertEqual(self.dispatcher.batchers, {})
+
+    def test_no_stats_by_default(self):
+        self.dispatcher.processHttpMessage('Intruder', True, message('/a'))
+        self.dispatcher.shutdown()
+
+        self.assertEqual(len(DispatchStats(self.burp)), 0)
+
+    def test_stats_enabled_in_config(self):
+        with open(self.filename, 'a') as ini:
+            ini.write('[dispatch]\nstats = true\n')
+
+        self.burp.config.parse_if_needed(force=True)
+        self.dispatcher.processHttpMessage('Intruder', True, message('/a'))
+        self.dispatcher.shutdown()
+
+        self.assertEqual(len(DispatchStats(self.burp)), 4)
+
+
+class SlowRequestHandler(Component):
+    implements(IIntruderRequestHandler)
+
+    budget = 1000
+    calls = []
+
+    def processRequest(self, request):
+        self.calls.append(request)
+        time.sleep(0.01)
+
+
+class BudgetTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.ini')
+        os.write(fd, '[handlers]\n'
+                     'intruder.request = SlowRequestHandler\n'
+                     '[budgets]\n'
+                     'threshold = 1\n'
+                     'window = 1\n'
+                     'cooldown = 0\n'
+                     'mode = disable\n')
+        os.close(fd)
+
+        self.burp = FakeBurp(self.filename)
+        self.dispatcher = PluginDispatcher(self.burp)
+        del SlowRequestHandler.calls[:]
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+        os.remove(self.filename)
+
+    def configure(self, text):
+        with open(self.filename, 'a') as ini:
+            ini.write(text)
+
+        self.burp.config.parse_if_needed(force=True)
+
+    def test_budget_class_attribute(self):
+        self.dispatcher.processHttpMessage('Intruder', True, message('/a'))
+
+        breaker = self.dispatcher.breakers[SlowRequestHandler]
+        self.assertEqual((breaker.budget, breaker.trips), (1000, 0))
+
+    def test_disabled_and_enabled_again(self):
+        self.configure('budget.SlowRequestHandler = 1\n')
+
+        self.dispatcher.processHttpMessage('Intruder', True, message('/a'))
+
+        self.assertEqual(self.dispatcher.breakers[SlowRequestHandler].budget,
+                         1)
+        self.assertFalse(self.burp.isEnabled(SlowRequestHandler))
+
+        # the cool-down has passed, so it is called again
+        self.dispatcher.processHttpMessage('Intruder', True, message('/b'))
+
+        self.assertEqual([request.url.path for request in
+                          SlowRequestHandler.calls], ['/a', '/b'])
+        self.assertEqual(self.dispatcher.breakers[SlowRequestHandler].trips,
+                         2)
+
+
+class _Issue(object):
+    def __init__(self, name, detail=None):
+        self.name = name
+        self.detail = detail
+
+    def __getattr__(self, name):
+        # the other fields of an IScanIssue
+        return lambda: None
+
+    def getIssueName(self):
+        return self.name
+
+    def getIssueDetail(self):
+        return self.detail
+
+    def getUrl(self):
+        return 'http://example.com/'
+
+    def getHttpService(self):
+        return _get_service('example.com', 80, 'http')
+
+    def getHttpMessages(self):
+        return []
+
+
+class SlowIssueHandler(Component):
+    implements(INewScanIssueHandler)
+
+    gate = Event()
+    issues = []
+
+    def newScanIssue(self, issue):
+        if issue.getIssueName() == 'first':
+            self.gate.wait(5)
+
+        self.issues.append(issue.getIssueName())
+
+
+class NewScanIssueTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.ini')
+        os.write(fd, '[issues]\n'
+                     'async = true\n'
+                     'policy = spill\n'
+                     'queue_size = 1\n')
+        os.close(fd)
+
+        self.burp = FakeBurp(self.filename)
+        self.dispatcher = NewScanIssueDispatcher(self.burp)
+        SlowIssueHandler.gate.clear()
+        del SlowIssueHandler.issues[:]
+
+    def tearDown(self):
+        SlowIssueHandler.gate.set()
+        self.dispatcher.shutdown()
+        os.remove(self.filename)
+
+    def test_unpicklable_issue_is_delivered_inline(self):
+        self.dispatcher.newScanIssue(_Issue('first'))
+        self.dispatcher.newScanIssue(_Issue('second'))
+
+        # the queue is full, and a lock cannot be spilled
+        self.dispatcher.newScanIssue(_Issue('unpicklable', Lock()))
+        self.assertEqual(SlowIssueHandler.issues, ['unpicklable'])
+
+        SlowIssueHandler.gate.set()
+        self.dispatcher.shutdown()
+
+        self.assertEqual(sorted(SlowIssueHandler.issues),
+                         ['first', 'second', 'unpicklable'])
+
+
+if __name__ == '__main__':
+    unittest.main()
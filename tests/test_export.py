@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from StringIO import StringIO
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from gds.burp.export import HAR, JSONL, dump_har, export, part_filename
+
+from .fakes import message
+
+
+class _Quiet(object):
+    def exception(self, *args, **kwargs):
+        pass
+
+    info = exception
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.items = [message('/%d' % (idx, )) for idx in range(5)]
+        # does not parse
+        self.items[2] = message('/2', headers='Host a\r\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def urls(self, document):
+        return [entry['request']['url'] for entry in document['log']['entries']]
+
+    def test_skips_items_that_do_not_parse(self):
+        filename = self.path('history.jsonl')
+        position = export(self.items, filename, JSONL, log=_Quiet())
+
+        self.assertEqual(position, 5)
+
+        with open(filename) as fp:
+            urls = [json.loads(line)['request']['url'] for line in fp]
+
+        self.assertEqual(urls, ['http://example.com:80/%d' % (idx, )
+                                for idx in (0, 1, 3, 4)])
+
+    def test_har_is_closed_when_writing_fails(self):
+        def items():
+            yield self.items[0]
+            yield self.items[1]
+            raise IOError('Burp went away')
+
+        fp = StringIO()
+        self.assertRaises(IOError, dump_har, items(), fp, log=_Quiet())
+
+        self.assertEqual(len(self.urls(json.loads(fp.getvalue()))), 2)
+
+    def test_resuming_har_does_not_truncate(self):
+        filename = self.path('history.har')
+        export(self.items[:2], filename, HAR)
+        export(self.items[3:], filename, HAR, start=3)
+
+        with open(filename) as fp:
+            self.assertEqual(len(self.urls(json.load(fp))), 2)
+
+        with open(self.path('history.part3.har')) as fp:
+            self.assertEqual(len(self.urls(json.load(fp))), 2)
+
+        self.assertRaises(ValueError, export, self.items[3:], filename,
+                          HAR, start=3)
+
+    def test_part_filename(self):
+        self.assertEqual(part_filename('a/history.har.gz', 10),
+                         'a/history.part10.har.gz')
+        self.assertEqual(part_filename('history', 10), 'history.part10')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from gds.burp.history import HistoryIndex, ProxyHistory
+
+from .fakes import FakeBurp, message
+
+
+class ProxyHistoryTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.ini')
+        os.close(fd)
+
+        self.burp = FakeBurp(self.filename,
+                             [message('/%d' % (idx, )) for idx in range(10)])
+        self.history = ProxyHistory(self.burp)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def paths(self, requests):
+        return [request.url.path for request in requests]
+
+    def test_length_follows_burp(self):
+        # the index is fresh, and nothing tells it about the new item
+        self.history.where(method='GET')
+        self.burp.items.append(message('/10'))
+
+        self.assertEqual(len(self.history), 11)
+        self.assertEqual(self.history[-1].url.path, '/10')
+
+        del self.burp.items[:5]
+        self.assertEqual(len(self.history), 6)
+
+    def test_indexing_and_slicing(self):
+        self.assertEqual(self.history[0].url.path, '/0')
+        self.assertEqual(self.history[-2].url.path, '/8')
+        self.assertEqual(self.paths(self.history[-3:]), ['/7', '/8', '/9'])
+        self.assertEqual(self.paths(self.history[::-4]), ['/9', '/5', '/1'])
+        self.assertEqual(self.history[20:], [])
+        self.assertRaises(IndexError, lambda: self.history[10])
+        self.assertRaises(IndexError, lambda: self.history[-11])
+
+    def test_cursor_resumes(self):
+        cursor = self.history.since(-2)
+        self.assertEqual(self.paths(cursor), ['/8', '/9'])
+        self.assertEqual(list(cursor), [])
+
+        self.burp.items.append(message('/10'))
+        self.assertEqual(self.paths(cursor), ['/10'])
+        self.assertEqual(cursor.position, 11)
+
+        self.burp.items.append(message('/11'))
+        self.assertEqual(self.paths(self.history.since(cursor)), ['/11'])
+
+    def test_where(self):
+        self.burp.items.append(message('/x', status=500))
+
+        self.assertEqual(self.paths(self.history.where(status=(500, 599))),
+                         ['/x'])
+
+    def test_where_after_delete_then_append(self):
+        self.assertEqual(len(self.history.where(method='GET')), 10)
+
+        # as many items deleted as added, so the length does not change
+        del self.burp.items[:2]
+        self.burp.items.append(message('/x', status=500))
+        self.burp.items.append(message('/y'))
+
+        self.assertEqual(self.paths(self.history.where(status=(500, 599))),
+                         ['/x'])
+        self.assertEqual(self.paths(self.history.where(path='^/[0-9]$')),
+                         ['/%d' % (idx, ) for idx in range(2, 10)])
+        self.assertEqual(len(HistoryIndex(self.burp)), 10)
+
+    def test_where_after_project_loaded(self):
+        self.assertEqual(len(self.history.where(host='*')), 10)
+
+        self.burp.items[:] = [message('/%d' % (idx, ), host='other.example')
+                              for idx in range(12)]
+
+        self.assertEqual(len(self.history.where(host='other.*')), 12)
+        self.assertEqual(self.history.where(host='example.*'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
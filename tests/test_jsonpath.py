@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp import jsonpath
+from gds.burp.jsonpath import MAX_JSON_DEPTH, MAX_JSON_SIZE, get, loads
+from gds.burp.models import HttpRequest
+
+from .fakes import message
+
+
+def nested(depth):
+    return '[' * depth + ']' * depth
+
+
+class LoadsTest(unittest.TestCase):
+    def test_depth_limit(self):
+        self.assertEqual(MAX_JSON_DEPTH, 64)
+
+        doc = loads(nested(MAX_JSON_DEPTH))
+        for _ in xrange(MAX_JSON_DEPTH - 1):
+            doc = doc[0]
+        self.assertEqual(doc, [])
+
+        self.assertRaises(ValueError, loads, nested(MAX_JSON_DEPTH + 1))
+        self.assertRaises(ValueError, loads, '{"a": %s}' % (
+                          nested(MAX_JSON_DEPTH), ))
+
+    def test_depth_ignores_strings(self):
+        data = '{"a": "%s", "b": "\\"[[", "c": [1]}' % (
+            '[' * (MAX_JSON_DEPTH + 1), )
+
+        self.assertEqual(loads(data)['c'], [1])
+        self.assertEqual(loads(data)['b'], '"[[')
+
+    def test_size_limit(self):
+        self.assertEqual(MAX_JSON_SIZE, 8 * 1024 * 1024)
+
+        data = '"%s"' % ('a' * (MAX_JSON_SIZE - 2), )
+        self.assertEqual(len(loads(data)), MAX_JSON_SIZE - 2)
+
+        data = '"%s"' % ('a' * (MAX_JSON_SIZE - 1), )
+        self.assertRaises(ValueError, loads, data)
+
+    def test_explicit_limits(self):
+        self.assertRaises(ValueError, loads, '[1, 2, 3]', max_size=8)
+        self.assertRaises(ValueError, loads, '[[1]]', max_depth=1)
+        self.assertEqual(loads('[[1]]', max_depth=2), [[1]])
+
+    def test_request_over_budget(self):
+        headers = 'Content-Type: application/json\r\n'
+        request = HttpRequest(message('/', body=nested(MAX_JSON_DEPTH + 1),
+                                      headers=headers))
+        self.assertEqual(request.json, None)
+
+        request = HttpRequest(message('/', body='{"a": [1, 2]}',
+                                      headers=headers))
+        self.assertEqual(request.json_get('a[*]'), [1, 2])
+
+
+class GetTest(unittest.TestCase):
+    doc = {'data': {'items': [{'id': 1, 'display.name': u'first'},
+                              {'id': 2}, {'id': 3}]},
+           'meta': {'a': 1, 'b': 2}}
+
+    def test_keys_and_indexes(self):
+        self.assertEqual(get(self.doc, 'data.items[0].id'), 1)
+        self.assertEqual(get(self.doc, 'data.items[-1].id'), 3)
+        self.assertEqual(get(self.doc, 'data.items[0]["display.name"]'),
+                         u'first')
+        self.assertEqual(get(self.doc, "data.items[0]['display.name']"),
+                         u'first')
+
+    def test_missing(self):
+        self.assertEqual(get(self.doc, 'data.items[3].id'), None)
+        self.assertEqual(get(self.doc, 'data.missing', 'x'), 'x')
+        self.assertEqual(get(self.doc, 'meta[0]'), None)
+
+    def test_wildcards(self):
+        self.assertEqual(get(self.doc, 'data.items[*].id'), [1, 2, 3])
+        self.assertEqual(get(self.doc, 'data.items.*.id'), [1, 2, 3])
+        self.assertEqual(sorted(get(self.doc, 'meta.*')), [1, 2])
+        self.assertEqual(get(self.doc, 'data.items[*]["display.name"]'),
+                         [u'first'])
+
+        # a wildcard path always returns a list
+        self.assertEqual(get(self.doc, 'missing[*]', 'x'), [])
+        self.assertEqual(get(self.doc, 'data.items[*].id.*'), [])
+
+    def test_invalid_path(self):
+        self.assertRaises(ValueError, get, self.doc, 'data[')
+
+    def test_compiled_paths_are_bounded(self):
+        for idx in xrange(jsonpath._MAX_PATHS + 1):
+            get(self.doc, 'data.items[%d]' % (idx, ))
+
+        self.assertTrue(len(jsonpath._paths) <= jsonpath._MAX_PATHS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp.models import HttpRequest, parse_messages, wrap_messages
+from gds.burp.structures import HeaderDict
+
+from .fakes import message
+
+
+class ParsedCopyTest(unittest.TestCase):
+    def test_raw_copy_dropped_once_parsed(self):
+        request = HttpRequest(message('/a', response_body='hi'))
+        request.method
+        request.response.status_code
+
+        self.assertEqual((request._raw, request.response._raw), (None, None))
+        self.assertEqual(request.response._raw_message, None)
+        self.assertTrue(request.raw.startswith('GET /a HTTP/1.1'))
+        self.assertTrue(request.response.raw.endswith('\r\n\r\nhi'))
+
+    def test_refresh_after_copy_dropped(self):
+        messageInfo = message('/a')
+        request = HttpRequest(messageInfo)
+        request.method
+        request.refresh()
+
+        self.assertTrue('_message' in vars(request))
+
+        messageInfo.setRequest('POST /b HTTP/1.1\r\nHost: a\r\n\r\n')
+        request.refresh()
+
+        self.assertEqual(request.method, 'POST')
+
+
+class SerializeTest(unittest.TestCase):
+    def test_content_length_added_with_a_body(self):
+        request = HttpRequest(message('/'))
+        request.headers
+        request.body = 'a=1'
+
+        self.assertTrue(request.raw.endswith(
+            'Content-Length: 3\r\n\r\na=1'))
+
+    def test_content_length_updated(self):
+        request = HttpRequest(message('/', body='a=1',
+                                      headers='Content-Length: 3\r\n'))
+        request.headers
+        request.body = 'a=12'
+
+        self.assertEqual(request.raw.count('Content-Length'), 1)
+        self.assertTrue('Content-Length: 4\r\n' in request.raw)
+
+    def test_chunked_body_keeps_its_headers(self):
+        request = HttpRequest(message(
+            '/', body='0\r\n\r\n', headers='Transfer-Encoding: chunked\r\n'))
+        request.headers
+        request.body = '1\r\nx\r\n0\r\n\r\n'
+
+        self.assertFalse('Content-Length' in request.raw)
+
+    def test_repeated_headers_keep_their_casing(self):
+        request = HttpRequest(message(
+            '/', headers='X-Id: 1\r\nx-id: 2\r\nX-ID: 3\r\n'))
+        request.headers
+        request.body = 'a=1'
+
+        self.assertTrue('X-Id: 1\r\nx-id: 2\r\nX-ID: 3\r\n' in request.raw)
+        self.assertEqual(request.headers.getlist('x-id'), ['1', '2', '3'])
+
+
+class EditTest(unittest.TestCase):
+    def test_headers_held_across_serialization(self):
+        request = HttpRequest(message('/', body='a=1',
+                                      headers='Content-Length: 3\r\n'))
+        headers = request.headers
+        request.body = 'a=12'
+        request.raw
+
+        self.assertTrue(request.headers is headers)
+        self.assertEqual(headers['content-length'], '4')
+        self.assertFalse(headers.modified)
+
+        # still written once serialized
+        headers['X-Foo'] = 'bar'
+        self.assertTrue('X-Foo: bar\r\n' in request.raw)
+        self.assertTrue(request.headers is headers)
+
+    def test_url_follows_edits(self):
+        request = HttpRequest(message('/a'))
+        self.assertEqual((request.uri, request.url.path), ('/a', '/a'))
+
+        request.uri = '/b?x=1'
+        self.assertEqual((request.url.path, request.url.query),
+                         ('/b', 'x=1'))
+
+        request.commit()
+        self.assertEqual(request.url.path, '/b')
+
+        request.host = 'other.example.com'
+        self.assertEqual(request.url.hostname, 'other.example.com')
+
+
+class WrapMessagesTest(unittest.TestCase):
+    def test_messages_are_parsed_on_first_access(self):
+        requests = wrap_messages([message('/a'), message('/b')])
+
+        self.assertFalse('_message' in vars(requests[0]))
+        self.assertEqual(requests[1].method, 'GET')
+        self.assertFalse('_message' in vars(requests[0]))
+
+    def test_parsed_messages_share_strings(self):
+        first, second = wrap_messages([message('/a'), message('/b')])
+
+        self.assertTrue(first.response.headers['content-type'] is
+                        second.response.headers['content-type'])
+        self.assertTrue(first.headers['host'] is second.headers['host'])
+
+
+class ParseMessagesTest(unittest.TestCase):
+    def test_header_lines_shared_across_the_batch(self):
+        first, second = parse_messages([message('/a'), message('/b')])
+
+        self.assertEqual((first.method, second.response.status_code),
+                         ('GET', 200))
+        self.assertTrue(first._message[3][0] is second._message[3][0])
+        self.assertEqual(first.response._raw_message, None)
+
+    def test_headers_built_on_first_access(self):
+        request, = parse_messages([message('/a', headers='X-A: 1\r\n')])
+
+        self.assertFalse(isinstance(request._message[3], HeaderDict))
+        self.assertEqual(request.headers['x-a'], '1')
+        self.assertTrue(request._message[3] is request.headers)
+        self.assertFalse(request.modified)
+
+
+if __name__ == '__main__':
+    unittest.main()
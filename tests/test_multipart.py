@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp.models import HttpRequest
+from gds.burp.multipart import MultipartForm, MultipartParser, StringReader
+
+from .fakes import message
+
+BOUNDARY = 'xYzZY'
+
+BODY = '\r\n'.join([
+    '--' + BOUNDARY,
+    'Content-Disposition: form-data; name="name"',
+    '',
+    'value',
+    '--' + BOUNDARY,
+    'Content-Disposition: form-data; name="upload"; filename="a.txt"',
+    'Content-Type: text/plain',
+    '',
+    'line one\r\n--xYz not a boundary',
+    '--' + BOUNDARY + '--',
+    ''])
+
+
+def parse(body, read_size=64 * 1024, **kwargs):
+    return MultipartForm(MultipartParser(StringReader(body), BOUNDARY,
+                                         read_size=read_size), **kwargs)
+
+
+class MultipartParserTest(unittest.TestCase):
+    def test_boundaries_split_across_reads(self):
+        for read_size in range(1, len(BOUNDARY) + 8):
+            form = parse(BODY, read_size)
+
+            self.assertEqual(form.keys(), ['name', 'upload'])
+            self.assertEqual(form.getfirst('name'), 'value')
+            self.assertEqual(form.getfirst('upload'),
+                             'line one\r\n--xYz not a boundary')
+
+    def test_missing_final_boundary(self):
+        body = BODY[:BODY.index('--' + BOUNDARY + '--')]
+        form = parse(body, 5)
+
+        self.assertEqual(form.keys(), ['name', 'upload'])
+        self.assertEqual(form.getfirst('upload'),
+                         'line one\r\n--xYz not a boundary\r\n')
+
+    def test_skip_files(self):
+        form = parse(BODY, skip_files=True)
+
+        self.assertEqual(form.getfirst('name'), 'value')
+        self.assertEqual(form.getfirst('upload'), None)
+
+    def test_close(self):
+        with parse(BODY) as form:
+            sink = form['name'].file
+
+        self.assertTrue(sink.closed)
+
+    def test_request_parameters_skip_files(self):
+        request = HttpRequest(message(
+            '/', body=BODY, headers='Content-Type: multipart/form-data; '
+                                    'boundary=%s\r\n' % (BOUNDARY, )))
+
+        form = request.parameters['body']
+
+        self.assertEqual(form.getfirst('name'), 'value')
+        self.assertEqual(form.getfirst('upload'), None)
+        self.assertEqual(
+            [part.value for part in request.iter_multipart()][1],
+            'line one\r\n--xYz not a boundary')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp.predicates import Matcher, _Facts
+
+from .fakes import message
+
+
+class Handler(object):
+    def __init__(self, **predicates):
+        self.__dict__.update(predicates)
+
+
+class FactsTest(unittest.TestCase):
+    def test_request(self):
+        facts = _Facts(message('/api/users?id=1', body='x=1',
+                               host='API.example.com'), True)
+
+        self.assertEqual(facts.match_hosts(), 'API.example.com')
+        self.assertEqual(facts.match_methods(), 'POST')
+        self.assertEqual(facts.match_paths(), '/api/users')
+        self.assertEqual(facts.match_status(), None)
+
+    def test_response(self):
+        facts = _Facts(message(status=404), False)
+
+        self.assertEqual(facts.match_status(), 404)
+        self.assertEqual(facts.match_content_types(), 'text/plain')
+
+    def test_absolute_form(self):
+        facts = _Facts(message('http://example.com/a/b?c'), True)
+        self.assertEqual(facts.match_paths(), '/a/b')
+
+
+class MatcherTest(unittest.TestCase):
+    def test_host_glob(self):
+        matcher = Matcher([Handler(match_hosts=['*.example.com']),
+                           Handler(match_hosts='other.com')])
+
+        self.assertEqual(matcher.match(message(host='www.EXAMPLE.com'),
+                                       True), 0b01)
+        self.assertEqual(matcher.match(message(host='other.com'), True),
+                         0b10)
+        self.assertEqual(matcher.match(message(host='example.org'), True),
+                         0)
+
+    def test_method(self):
+        matcher = Matcher([Handler(match_methods=['post']),
+                           Handler(match_methods=['GET', 'POST'])])
+
+        self.assertEqual(matcher.match(message(), True), 0b10)
+        self.assertEqual(matcher.match(message(body='x=1'), True), 0b11)
+
+    def test_status_range(self):
+        matcher = Matcher([Handler(match_status=[(400, 499), 500]),
+                           Handler(match_status=200)])
+
+        self.assertEqual(matcher.match(message(status=404), False), 0b01)
+        self.assertEqual(matcher.match(message(status=500), False), 0b01)
+        self.assertEqual(matcher.match(message(status=503), False), 0)
+        self.assertEqual(matcher.match(message(), False), 0b10)
+
+        # status is ignored for requests
+        self.assertEqual(matcher.match(message(status=503), True), 0b11)
+
+    def test_handler_without_predicates(self):
+        matcher = Matcher([Handler(match_hosts='*.example.com',
+                                   match_methods='GET'),
+                           Handler(),
+                           Handler(match_methods='POST')])
+
+        self.assertEqual(matcher.match(message(host='a.example.com'), True),
+                         0b011)
+        self.assertEqual(matcher.match(message(host='other.com'), True),
+                         0b010)
+        self.assertEqual(matcher.match(message(body='x=1'), True), 0b110)
+
+    def test_shared_predicates(self):
+        # handlers declaring the same predicate share one test
+        matcher = Matcher([Handler(match_paths=[r'^/api/']),
+                           Handler(match_paths=(r'^/api/', )),
+                           Handler(max_size=10)])
+
+        self.assertEqual(len(matcher._tests[1][2]), 1)
+        self.assertEqual(matcher.match(message('/api/x'), True), 0b011)
+        self.assertEqual(matcher.match(message('/x'), True), 0)
+
+    def test_select(self):
+        matcher = Matcher([Handler(match_methods='GET'), Handler(),
+                           Handler(match_methods='POST')])
+
+        self.assertEqual(matcher.select(message(), True, ['a', 'b'], ['c']),
+                         [['a', 'b'], []])
+
+
+if __name__ == '__main__':
+    unittest.main()
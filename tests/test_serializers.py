@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from StringIO import StringIO
+import cPickle
+import unittest
+
+from gds.burp import serializers
+from gds.burp.models import HttpRequest
+from gds.burp.serializers import MAGIC, dump, dumps, load, loads
+
+from .fakes import message
+
+
+def _stream(version, *records):
+    '''
+    Returns a stream of the given format version, one record for each
+    `(flags, port, fields)`.
+    '''
+    struct = serializers._RECORDS[version]
+    data = [serializers._HEADER.pack(MAGIC, version)]
+
+    for flags, port, fields in records:
+        data.append(struct.pack(flags, port, *[len(f) for f in fields]))
+        data.extend(fields)
+
+    return StringIO(''.join(data))
+
+
+class RoundTripTest(unittest.TestCase):
+    def paths(self, requests):
+        return [request.url.path for request in requests]
+
+    def test_dump_and_load(self):
+        body = 'x' * 100
+        fp = StringIO()
+        written = dump([message('/a', response_body=body),
+                        message('/b', body='a=1', response_body=body),
+                        HttpRequest(message('/c', host='other.example'))],
+                       fp)
+        fp.seek(0)
+
+        requests = list(load(fp))
+
+        self.assertEqual(written, 3)
+        self.assertEqual(self.paths(requests), ['/a', '/b', '/c'])
+        self.assertEqual(requests[1].body, 'a=1')
+        self.assertEqual(requests[2].host, 'other.example')
+        self.assertEqual(requests[0].response.body, body)
+
+        # the body is written once, and shared once loaded
+        self.assertEqual(fp.getvalue().count(body), 1)
+        self.assertTrue(requests[0]._messageInfo.response_parts[1] is
+                        requests[1]._messageInfo.response_parts[1])
+
+    def test_long_host_and_comment(self):
+        messageInfo = message('/a', host='h' * 70000)
+        messageInfo.setComment(u'c' * 70000)
+
+        request = loads(dumps(messageInfo))
+
+        self.assertEqual(len(request.host), 70000)
+        self.assertEqual(request.comment, u'c' * 70000)
+
+    def test_bodies_referred_to_within_the_window(self):
+        window = serializers.WINDOW
+        serializers.WINDOW = 250
+
+        try:
+            bodies = ['%d' % (idx, ) * 100 for idx in range(3)]
+            fp = StringIO()
+            dump([message('/', response_body=body)
+                  for body in bodies + bodies[::-1]], fp)
+            fp.seek(0)
+
+            self.assertEqual([request.response.body for request in load(fp)],
+                             bodies + bodies[::-1])
+        finally:
+            serializers.WINDOW = window
+
+        # only the first body dropped out of the window, to be written
+        # again
+        data = fp.getvalue()
+        self.assertEqual([data.count(body) for body in bodies], [2, 1, 1])
+
+    def test_pickle_keeps_edits(self):
+        request = HttpRequest(message('/a'))
+        request.headers['X-Foo'] = 'bar'
+
+        copy = cPickle.loads(cPickle.dumps(request, 2))
+
+        self.assertEqual(copy.headers['x-foo'], 'bar')
+
+    def test_version_1(self):
+        fp = _stream(1, (
+            serializers._HAS_REQUEST | serializers._HAS_RESPONSE, 80,
+            ['example.com', 'GET /a HTTP/1.1\r\nHost: example.com\r\n\r\n',
+             'HTTP/1.1 200 OK\r\n\r\nhello', 'note', 'red']))
+
+        request, = load(fp)
+
+        self.assertEqual(request.url.path, '/a')
+        self.assertEqual(request.response.body, 'hello')
+        self.assertEqual((request.comment, request.highlight),
+                         ('note', 'red'))
+
+    def test_version_2(self):
+        body = 'x' * 100
+        head = 'GET / HTTP/1.1\r\nHost: example.com\r\n\r\n'
+        response = 'HTTP/1.1 200 OK\r\n\r\n'
+        flags = serializers._HAS_REQUEST | serializers._HAS_RESPONSE
+
+        fp = _stream(2,
+                     (flags | serializers._HTTPS, 443,
+                      ['example.com', head, '', response, body, '', '']),
+                     (flags | serializers._RESPONSE_BODY_REF, 80,
+                      ['example.com', head, '', response,
+                       serializers.digest(body), '', '']))
+
+        first, second = load(fp)
+
+        self.assertEqual((first.protocol, second.protocol),
+                         ('https', 'http'))
+        self.assertEqual(second.response.body, body)
+        self.assertTrue(first._messageInfo.response_parts[1] is
+                        second._messageInfo.response_parts[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from gds.burp.stats import HandlerStats
+
+
+class HandlerStatsTest(unittest.TestCase):
+    def test_one_call_in_sample_is_timed(self):
+        stats = HandlerStats('Proxy', 'Handler', 4)
+        timed = [stats.begin() for _ in range(8)]
+
+        self.assertEqual(timed, [True, False, False, False] * 2)
+
+        stats.end(2.0)
+        stats.end(4.0, True)
+
+        for _ in range(6):
+            stats.end(error=True)
+
+        row = stats.row()
+        self.assertEqual((row['calls'], row['errors']), (8, 7))
+        self.assertEqual((row['mean'], row['total'], row['max']),
+                         (3.0, 24.0, 4.0))
+
+    def test_reset(self):
+        stats = HandlerStats('Proxy', 'Handler')
+        stats.record(1.0, True)
+        stats.reset()
+
+        row = stats.row()
+        self.assertEqual((row['calls'], row['errors'], row['p50']),
+                         (0, 0, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pickle
+import unittest
+
+from gds.burp.structures import HeaderDict
+
+
+class HeaderDictTest(unittest.TestCase):
+    def setUp(self):
+        self.headers = HeaderDict.from_fields([
+            ('Host', 'example.com'), ('Via', '1'), ('via', '2'),
+            ('Content-Type', 'text/plain')])
+
+    def test_lookups(self):
+        self.assertEqual(self.headers['HOST'], 'example.com')
+        self.assertEqual(self.headers['via'], '1, 2')
+        self.assertEqual(self.headers.get('missing', 'x'), 'x')
+        self.assertTrue('content-type' in self.headers)
+        self.assertFalse(self.headers.modified)
+
+    def test_only_repeated_headers_keep_lists(self):
+        self.assertEqual(self.headers._values.keys(), ['via'])
+        self.assertEqual(self.headers.getlist('host'), ['example.com'])
+        self.assertEqual(self.headers.getlist('VIA'), ['1', '2'])
+        self.assertEqual(self.headers.getlist('missing'), [])
+
+    def test_fields_keep_their_casing(self):
+        self.assertEqual(list(self.headers.iterfields()), [
+            ('Host', 'example.com'), ('Via', '1'), ('via', '2'),
+            ('Content-Type', 'text/plain')])
+
+    def test_index_follows_edits(self):
+        self.headers['content-type'] = 'text/html'
+        self.headers.add('X-New', 'a')
+        self.headers.add('x-new', 'b')
+        del self.headers['VIA']
+
+        self.assertEqual(self.headers.keys(),
+                         ['Host', 'content-type', 'X-New'])
+        self.assertEqual(self.headers['x-new'], 'a, b')
+        self.assertEqual(self.headers.getlist('via'), [])
+        self.assertTrue(self.headers.modified)
+
+    def test_pickle(self):
+        headers = pickle.loads(pickle.dumps(self.headers, 2))
+
+        self.assertEqual(headers.getlist('via'), ['1', '2'])
+        self.assertEqual(str(headers), str(self.headers))
+
+
+if __name__ == '__main__':
+    unittest.main()
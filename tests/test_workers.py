@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from threading import Event, Thread
+import unittest
+
+from gds.burp.workers import SPILL, DeliveryQueue, WorkerPool
+
+
+class DeliveryQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.gate = Event()
+        self.delivered = []
+
+    def target(self, item):
+        self.gate.wait(5)
+        self.delivered.append(item)
+
+    def test_spilled_items_are_delivered_in_order(self):
+        queue = DeliveryQueue(self.target, maxsize=2, policy=SPILL,
+                              dumps=str, loads=int)
+        items = range(50)
+
+        for item in items:
+            queue.put(item)
+
+        self.gate.set()
+        self.assertEqual(queue.shutdown(5), 0)
+        self.assertEqual(self.delivered, items)
+        self.assertTrue(queue.spilled > 0)
+
+    def test_spill_io_does_not_hold_the_lock(self):
+        writing, written = Event(), Event()
+
+        def dumps(item):
+            if item == 'slow':
+                writing.set()
+                written.wait(5)
+            return item
+
+        queue = DeliveryQueue(self.target, maxsize=1, policy=SPILL,
+                              dumps=dumps, loads=str)
+        queue.put('first')
+        queue.put('second')
+
+        slow = Thread(target=queue.put, args=('slow', ))
+        slow.start()
+        self.assertTrue(writing.wait(5))
+
+        other = Thread(target=queue.put, args=('other', ))
+        other.start()
+        other.join(1)
+
+        self.assertFalse(other.is_alive())
+
+        written.set()
+        self.gate.set()
+        slow.join(5)
+
+        self.assertEqual(queue.shutdown(5), 0)
+        self.assertEqual(sorted(self.delivered),
+                         ['first', 'other', 'second', 'slow'])
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def test_shutdown_is_bounded(self):
+        started, gate = Event(), Event()
+
+        def hang():
+            started.set()
+            gate.wait(5)
+
+        pool = WorkerPool(workers=1, queue_size=1)
+        pool.submit(hang)
+        self.assertTrue(started.wait(5))
+        pool.submit(gate.wait, 5)
+
+        # the worker hangs and the queue is full
+        self.assertEqual(pool.shutdown(timeout=0.2), 1)
+        gate.set()
+
+    def test_submit_after_shutdown_runs_inline(self):
+        ran = []
+        pool = WorkerPool(workers=2)
+        self.assertEqual(pool.shutdown(timeout=5), 0)
+
+        pool.submit(ran.append, 'late')
+
+        self.assertEqual(ran, ['late'])
+        self.assertEqual(pool.ranInline, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()